@@ -0,0 +1,546 @@
+#!/usr/bin/python3
+
+from array import array
+from json import dump, load
+from graph import Graph, _bounding_box, count_neighbors, neighbor_offsets
+try:
+    import numpy
+except ImportError:
+    numpy = None
+__author__ = 'Kellan Childers'
+
+# Array typecodes in order of size, with the number of ids each one can hold.
+_TYPECODES = (('B', 1 << 8), ('H', 1 << 16), ('I', 1 << 32))
+
+
+def typecode_for(count):
+    """Find the smallest array typecode able to store a number of distinct ids.
+
+    :param count: the number of distinct ids that need storing
+    :return: an array typecode
+    """
+    for typecode, limit in _TYPECODES:
+        if count <= limit:
+            return typecode
+    raise OverflowError("Too many distinct values to store in an array")
+
+
+def numpy_count_neighbors(mask, connectivity=8):
+    """Count the set neighbors of every cell of a NumPy mask using shifted slices.
+
+    :param mask: a two-dimensional array of 0 or 1, indexed as mask[y][x]
+    :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+    :return: an array of counts with the same shape as mask
+    """
+    height, width = mask.shape
+    padded = numpy.pad(mask.astype(numpy.uint8), 1)
+    counts = numpy.zeros((height, width), dtype=numpy.uint8)
+    for dx, dy in neighbor_offsets(connectivity):
+        counts += padded[1+dy:1+dy+height, 1+dx:1+dx+width]
+    return counts
+
+
+def flat_offsets(width, connectivity=8):
+    """Get the offsets to the neighbors of a cell in a flat array indexed by y*width + x.
+
+    :param width: the width of the graph the array holds
+    :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+    :return: a tuple of (dx, dy, offset) triples
+    """
+    key = (width, connectivity)
+    if key not in _flat_offsets:
+        _flat_offsets[key] = tuple((dx, dy, dy*width + dx) for dx, dy in neighbor_offsets(connectivity))
+    return _flat_offsets[key]
+
+_flat_offsets = {}
+
+
+class ArrayGraph(Graph):
+    """Graph stored as a flat array of palette ids indexed by y*width + x.
+
+    Each cell costs one byte while the graph holds at most 256 distinct values, and the
+    array is widened automatically if more are added.
+    """
+    def __init__(self, width=10, height=10, default=None):
+        """Construct a graph of given width and height.
+
+        :param width: the width (x-axis) for the new graph (default 10)
+        :param height: the height (y-axis) for the new graph (default 10)
+        :param default: the default value for each element in the graph (default None)
+        :return: null
+        """
+        if width < 0 or height < 0:
+            raise IndexError("Cannot initialize graph with less than zero dimension")
+        self._palette = self._new_palette()
+        self._width, self._height = width, height
+        # An empty graph leaves its palette untouched, so it can adopt loaded cells as they are.
+        value_id = self._palette.index(default) if width*height else 0
+        self._cells = array(typecode_for(len(self._palette)), [value_id]) * (width*height)
+
+    def _filled(self, value_id, length):
+        """Create an array filled with a single id, with the same typecode as the cell array.
+
+        Loaded cells may be wider than the palette needs, and slices only take arrays of their own typecode.
+        :param value_id: the id to fill the array with
+        :param length: the number of cells in the array
+        :return: an array of ids
+        """
+        return array(self._typecode(), [value_id]) * length
+
+    def _typecode(self):
+        """Get the typecode of the cell array, which may be an array or a memoryview.
+
+        :return: an array typecode
+        """
+        return getattr(self._cells, 'typecode', None) or self._cells.format
+
+    def _id_of(self, val):
+        """Get the id for a value, widening the cell array if the palette outgrows it.
+
+        :param val: the value to look up
+        :return: the id of the value
+        """
+        value_id = self._palette.index(val)
+        if value_id > 255:
+            # Ids that fit in a byte fit in any cell array, so only larger ones can need it widened.
+            typecode = typecode_for(len(self._palette))
+            if typecode != self._typecode():
+                self._cells = array(typecode, self._cells)
+        return value_id
+
+    def contains_point(self, x=0, y=0):
+        """Test if the point (x, y) can be found in graph.
+
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :return: a boolean value representing the point's presence in the graph
+        """
+        return 0 <= x < self._width and 0 <= y < self._height
+
+    def get_elem(self, x=0, y=0):
+        """Access the element at a given point (x, y).
+
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :return: the element at (x, y)
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise IndexError("Element not present in graph")
+        return self._palette[self._cells[y*self._width + x]]
+
+    def set_elem(self, val, x=0, y=0):
+        """Change the value of an element and return the original value.
+
+        :param val: the new value for the element at point (x, y)
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :return: the original value of the element at point (x, y)
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise IndexError("Element not present in graph")
+        # Single cells are written most often, so the common case of a small id skips _id_of.
+        value_id = self._palette.index(val)
+        if value_id > 255:
+            value_id = self._id_of(val)
+        index = y*self._width + x
+        old = self._palette[self._cells[index]]
+        self._cells[index] = value_id
+        if self._listeners:
+            self._changed(x, y, x, y)
+        return old
+
+    def get_id(self, x=0, y=0):
+        """Access the palette id stored at a given point (x, y).
+
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :return: the id at (x, y)
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise IndexError("Element not present in graph")
+        return self._cells[y*self._width + x]
+
+    def get_palette(self):
+        """Get the palette that translates ids into values.
+
+        :return: the graph's Palette
+        """
+        return self._palette
+
+    def get_cells(self):
+        """Get the flat array of ids backing the graph, indexed by y*width + x.
+
+        Writing to the array changes the graph directly, but only ids already in the
+        palette may be written.
+        :return: the graph's cell array
+        """
+        return self._cells
+
+    def set_cells(self, cells, width, height):
+        """Replace the cells of the graph with an existing buffer of palette ids.
+
+        :param cells: an array, or a writable memoryview, of width*height ids
+        :param width: the width of the graph the cells describe
+        :param height: the height of the graph the cells describe
+        :return: a reference to the graph
+        """
+        if width < 0 or height < 0 or len(cells) != width*height:
+            raise IndexError("Cells do not match a {0} by {1} graph".format(width, height))
+        self._width, self._height, self._cells = width, height, cells
+        self._changed_all()
+        return self
+
+    def as_numpy(self):
+        """Get a writable NumPy view of the cells, shaped (height, width).
+
+        The view shares memory with the graph, and becomes stale if the graph is resized
+        or its array is widened.
+        :return: a two-dimensional numpy array of ids
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required for as_numpy")
+        return numpy.frombuffer(self._cells, dtype=self._typecode()).reshape(self._height, self._width)
+
+    def get_height(self):
+        """Get the height of the graph.
+
+        :return: the height of the graph
+        """
+        return self._height
+
+    def get_width(self):
+        """Get the width of the graph.
+
+        :return: the width of the graph
+        """
+        return self._width
+
+    def rows(self):
+        """Generate each row of the graph as a list of values, starting from row zero.
+
+        :return: a generator of lists
+        """
+        values, width = self._palette.values(), self._width
+        for start in range(0, width*self._height, width or 1):
+            yield [values[value_id] for value_id in self._cells[start:start+width]]
+
+    def neighbor_indices(self, index, connectivity=8):
+        """Find the flat indices of the cells next to the cell at a flat index.
+
+        :param index: the index of the cell, y*width + x
+        :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+        :return: a list of indices
+        """
+        width, height = self._width, self._height
+        y, x = divmod(index, width)
+        offsets = flat_offsets(width, connectivity)
+        if 0 < x < width-1 and 0 < y < height-1:
+            # Cells away from the edges have every neighbor.
+            return [index + offset for _, _, offset in offsets]
+        return [index + offset for dx, dy, offset in offsets if 0 <= x+dx < width and 0 <= y+dy < height]
+
+    def neighbors(self, x=0, y=0, connectivity=8):
+        """Find the points next to (x, y) that are in the graph.
+
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+        :return: a list of points in the form (x, y)
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise IndexError("Element not present in graph")
+        return [divmod(index, self._width)[::-1] for index in
+                self.neighbor_indices(y*self._width + x, connectivity)]
+
+    def neighbor_values(self, x=0, y=0, connectivity=8):
+        """Get the elements next to (x, y).
+
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+        :return: a list of elements, in the same order as neighbors
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise IndexError("Element not present in graph")
+        cells, palette = self._cells, self._palette
+        return [palette[cells[index]] for index in self.neighbor_indices(y*self._width + x, connectivity)]
+
+    def id_mask(self, test):
+        """Mark every cell whose value passes a test, testing each palette value only once.
+
+        :param test: a function taking a value and returning whether it should be marked
+        :return: a bytes object of 0 or 1 per cell, indexed by y*width + x
+        """
+        table = bytes(1 if test(value) else 0 for value in self._palette.values())
+        if self._typecode() == 'B':
+            return bytes(self._cells).translate(table.ljust(256, b'\0'))
+        return bytes(table[value_id] for value_id in self._cells)
+
+    def mask(self, test):
+        """Mark every element that passes a test, testing each palette value only once.
+
+        :param test: a function taking an element and returning whether it should be marked
+        :return: a bytes object of 0 or 1 per element, indexed by y*width + x
+        """
+        return self.id_mask(test)
+
+    def neighbor_counts(self, test, connectivity=8):
+        """Count, for every element, how many of its neighbors pass a test.
+
+        :param test: a function taking an element and returning whether it should be counted
+        :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+        :return: a list of rows of counts starting from row zero, indexed as counts[y][x]
+        """
+        mask, width = self.id_mask(test), self._width
+        if numpy is not None and width:
+            # NumPy only does the counting; the result is the same lists as without it.
+            return numpy_count_neighbors(numpy.frombuffer(mask, dtype=numpy.uint8).reshape(self._height, width),
+                                         connectivity).tolist()
+        return count_neighbors([mask[start:start+width] for start in range(0, len(mask), width or 1)],
+                               connectivity)
+
+    def get_row(self, y=0, x_start=0, x_end=None):
+        """Get a copy of part of a row.
+
+        :param y: the row to read (default 0)
+        :param x_start: the first x-element to read (default 0)
+        :param x_end: the last x-element to read (default the end of the row)
+        :return: a list of the elements from x_start to x_end
+        """
+        if not 0 <= y < self._height:
+            raise IndexError("Row not present in graph")
+        if x_end is None:
+            x_end = self._width-1
+        start = y*self._width
+        values = self._palette.values()
+        return [values[value_id] for value_id in
+                self._cells[start+max(x_start, 0):start+min(x_end+1, self._width)]]
+
+    def fill_points(self, val, point_list):
+        """Set every point in a list to the same value, skipping points outside the graph.
+
+        :param val: the new value for the points
+        :param point_list: the list of points in the form (x, y)
+        :return: a reference to the graph
+        """
+        value_id = self._id_of(val)
+        width, height, cells = self._width, self._height, self._cells
+        points = [(x, y) for x, y in point_list if 0 <= x < width and 0 <= y < height]
+        for x, y in points:
+            cells[y*width + x] = value_id
+        if points and self._listeners:
+            self._changed(*_bounding_box(points))
+        return self
+
+    def fill_rect(self, val, x_start, y_start, x_end, y_end):
+        """Set every element of a rectangle to the same value, clipped to the graph.
+
+        :param val: the new value for the rectangle
+        :param x_start: the x-element of the start point of the rectangle (bottom left)
+        :param y_start: the y-element of the start point of the rectangle (bottom left)
+        :param x_end: the x-element of the end point of the rectangle (top right)
+        :param y_end: the y-element of the end point of the rectangle (top right)
+        :return: a reference to the graph
+        """
+        clipped = self.clip_rect(x_start, y_start, x_end, y_end)
+        if clipped is None:
+            return self
+        x_start, y_start, x_end, y_end = clipped
+        value_id = self._id_of(val)
+        width, cells = self._width, self._cells
+        if x_start == 0 and x_end == width-1:
+            # Whole rows are contiguous, so the rectangle is a single slice.
+            cells[y_start*width:(y_end+1)*width] = self._filled(value_id, (y_end-y_start+1)*width)
+        else:
+            span = self._filled(value_id, x_end-x_start+1)
+            for start in range(y_start*width + x_start, y_end*width + x_start + 1, width):
+                cells[start:start+len(span)] = span
+        self._changed(*clipped)
+        return self
+
+    def fill_mask(self, val, mask, x=0, y=0):
+        """Set the elements selected by a mask to the same value, clipped to the graph.
+
+        :param val: the new value for the selected elements
+        :param mask: rows of truthy or falsy values, starting from row zero
+        :param x: the x-element where the mask's first column is placed (default 0)
+        :param y: the y-element where the mask's first row is placed (default 0)
+        :return: a reference to the graph
+        """
+        value_id = self._id_of(val)
+        if numpy is not None and isinstance(mask, numpy.ndarray):
+            clipped = self.clip_rect(x, y, x+mask.shape[1]-1, y+mask.shape[0]-1)
+            if clipped is not None:
+                x_start, y_start, x_end, y_end = clipped
+                selected = mask[y_start-y:y_end-y+1, x_start-x:x_end-x+1].astype(bool)
+                self.as_numpy()[y_start:y_end+1, x_start:x_end+1][selected] = value_id
+                self._changed(*clipped)
+            return self
+        width, cells = self._width, self._cells
+        for j, mask_row in enumerate(mask, y):
+            if not 0 <= j < self._height:
+                continue
+            x_start, x_end = max(x, 0), min(x+len(mask_row), width)-1
+            if x_start > x_end:
+                continue
+            start, stop = j*width + x_start, j*width + x_end + 1
+            cells[start:stop] = array(self._typecode(), [value_id if selected else old for selected, old in
+                                                       zip(mask_row[x_start-x:x_end-x+1], cells[start:stop])])
+        if self._listeners:
+            changed = self._mask_rect(mask, x, y)
+            if changed is not None:
+                self._changed(*changed)
+        return self
+
+    def blit(self, source, x=0, y=0, src_x=0, src_y=0, width=None, height=None):
+        """Copy a rectangle of another graph into this graph, clipped to both graphs.
+
+        When both graphs share a palette the ids are copied a row slice at a time.
+        :param source: the graph to copy from
+        :param x: the x-element where the copied rectangle's first column is placed (default 0)
+        :param y: the y-element where the copied rectangle's first row is placed (default 0)
+        :param src_x: the x-element of the rectangle's bottom left in source (default 0)
+        :param src_y: the y-element of the rectangle's bottom left in source (default 0)
+        :param width: the width of the rectangle (default the rest of source)
+        :param height: the height of the rectangle (default the rest of source)
+        :return: a reference to the graph
+        """
+        if not (isinstance(source, ArrayGraph) and source._palette is self._palette):
+            return super(ArrayGraph, self).blit(source, x, y, src_x, src_y, width, height)
+        if width is None:
+            width = source._width-src_x
+        if height is None:
+            height = source._height-src_y
+        clipped = source.clip_rect(src_x, src_y, src_x+width-1, src_y+height-1)
+        if clipped is None:
+            return self
+        x, y = x + clipped[0]-src_x, y + clipped[1]-src_y
+        src_x, src_y = clipped[0], clipped[1]
+        clipped = self.clip_rect(x, y, x+clipped[2]-src_x, y+clipped[3]-src_y)
+        if clipped is None:
+            return self
+        x_start, y_start, x_end, y_end = clipped
+        src_x, src_y = src_x + x_start-x, src_y + y_start-y
+        span = x_end-x_start+1
+        # Both arrays are widened to fit the shared palette so their slices are compatible.
+        typecode = typecode_for(len(self._palette))
+        if typecode != self._typecode():
+            self._cells = array(typecode, self._cells)
+        if typecode != source._typecode():
+            source._cells = array(typecode, source._cells)
+        # Slicing copies, so reading every row first keeps overlapping copies safe.
+        rows = [array(typecode, source._cells[(src_y+j)*source._width + src_x:
+                                              (src_y+j)*source._width + src_x + span])
+                for j in range(y_end-y_start+1)]
+        for j, ids in enumerate(rows, y_start):
+            self._cells[j*self._width + x_start:j*self._width + x_start + span] = ids
+        self._changed(*clipped)
+        return self
+
+    def _write_rows(self, rows, x, y):
+        """Write rows of values that are already clipped to the graph.
+
+        :param rows: lists of values, starting from row y
+        :param x: the x-element of the first value in each row
+        :param y: the row to write the first list to
+        :return: null
+        """
+        ids = {}
+        for j, values in enumerate(rows, y):
+            for value in values:
+                if value not in ids:
+                    ids[value] = self._id_of(value)
+            start = j*self._width + x
+            self._cells[start:start+len(values)] = array(self._typecode(), [ids[value] for value in values])
+
+    def read_from_file(self, filename):
+        """Read a json file and load the graph from it.
+
+        :param filename: the name of the file to be read
+        :return: a reference to the graph
+        """
+        with open(filename, 'r') as read_file:
+            rows = load(read_file)
+        # Check the shape before replacing anything, so a bad file leaves the graph as it was.
+        if not isinstance(rows, list) or not all(isinstance(row, list) for row in rows):
+            raise ValueError("{} does not hold a list of rows".format(filename))
+        if any(len(row) != len(rows[0]) for row in rows):
+            raise ValueError("Rows in {} are not all the same length".format(filename))
+        ids = [self._palette.index(val) for row in rows for val in row]
+        self._height, self._width = len(rows), len(rows[0]) if rows else 0
+        self._cells = array(typecode_for(len(self._palette)), ids)
+        self._changed_all()
+        return self
+
+    def save_to_file(self, filename):
+        """Save the graph to a json file.
+
+        :param filename: the name of the file to be written to
+        :return: a reference to the graph
+        """
+        with open(filename, 'w') as write_file:
+            dump(list(self.rows()), write_file)
+        return self
+
+    def resize(self, x=0, y=0, default=None):
+        """Change the dimensions of the graph.
+
+        :param x: the new width of the graph (default 0)
+        :param y: the new height of the graph (default 0)
+        :param default: the default value for any elements not in the original scope (default None)
+        :return: a reference to the graph
+        """
+        if x == self._width and y == self._height:
+            return self
+        elif x < 0 or y < 0:
+            raise IndexError("Unable to resize to negative size")
+        cells = self._filled(self._id_of(default), x*y)
+        # Copy the overlapping part of each kept row in one slice. Rows are written through a
+        # memoryview, which takes them from a memory-mapped view as readily as from an array.
+        keep, view = min(x, self._width), memoryview(cells)
+        for j in range(min(y, self._height)):
+            view[j*x:j*x+keep] = self._cells[j*self._width:j*self._width+keep]
+        view.release()
+        self._width, self._height, self._cells = x, y, cells
+        self._changed_all()
+        return self
+
+    def copy(self):
+        """Copy the graph to a new location.
+
+        :return: a copy of the graph
+        """
+        new_graph = self._copy_attributes()
+        new_graph._cells = array(self._typecode(), self._cells)
+        return new_graph
+
+    def clear(self, default=None):
+        """Remove all data from the current graph and restore it to default.
+
+        :param default: the default value for each element in the graph (default None)
+        :return: a reference to the graph
+        """
+        value_id = self._id_of(default)
+        self._cells = self._filled(value_id, self._width*self._height)
+        self._changed_all()
+        return self
+
+    def print_all(self):
+        """Print every row to the command line, starting from row zero.
+
+        :return: null
+        """
+        strings, width = [str(value) for value in self._palette.values()], self._width
+        for start in reversed(range(0, width*self._height, width or 1)):
+            print(''.join([strings[value_id] for value_id in self._cells[start:start+width]]))
+
+if __name__ == "__main__":
+    # Short program for showing off capability of module.
+    print("Demonstrating arraygraph.py\n")
+    test = ArrayGraph(6, 3, '.')
+    for i in range(6):
+        test.set_elem('#', i, 1)
+    test.print_all()
+    print("\nThe graph holds {0} cells in {1} bytes using {2} palette entries".format(
+        test.get_width()*test.get_height(), test.get_cells().buffer_info()[1]*test.get_cells().itemsize,
+        len(test.get_palette())))
@@ -0,0 +1,4 @@
+from benchmarks.cases import CASES, case
+from benchmarks.fakewindow import FakeWindow
+
+__author__ = 'Kellan Childers'
@@ -0,0 +1,110 @@
+import sys
+from argparse import ArgumentParser
+from json import dump, load
+from platform import python_version
+from time import perf_counter
+from benchmarks.cases import CASES
+__author__ = 'Kellan Childers'
+
+
+def time_case(name, engine, graph_class, size, repeat=5):
+    """Time one benchmark, keeping the fastest of several runs.
+
+    :param name: the name of the benchmark
+    :param engine: the name of the storage engine, or None
+    :param graph_class: the graph class to benchmark, or None
+    :param size: the width and height of the map, or None
+    :param repeat: the number of runs (default 5)
+    :return: a dictionary describing the result
+    """
+    operation, count = CASES[name][0](graph_class, size)
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        operation()
+        best = min(best, perf_counter()-start)
+    return {'name': name, 'engine': engine, 'size': size, 'seconds': best, 'per_op': best / count, 'ops': count}
+
+
+def run(names, sizes, engines=None, repeat=5, report=print):
+    """Time every chosen benchmark against every chosen engine and size.
+
+    :param names: the benchmarks to run
+    :param sizes: the map sizes to run
+    :param engines: the engine names to run, or None for all (default None)
+    :param repeat: the number of runs per benchmark (default 5)
+    :param report: a function called with a line of text after each result (default print)
+    :return: a list of results
+    """
+    results = []
+    for name in names:
+        function, classes = CASES[name]
+        if classes is None:
+            runs = [(None, None, None)]
+        else:
+            runs = [(engine, classes[engine], size) for size in sizes for engine in classes
+                    if engines is None or engine in engines]
+        for engine, graph_class, size in runs:
+            result = time_case(name, engine, graph_class, size, repeat)
+            results.append(result)
+            report("{:<16}{:<9}{:>6}  {:>12.3f} us/op".format(name, engine or '-', size or '-', result['per_op']*1e6))
+    return results
+
+
+def _key(result):
+    return result['name'], result['engine'], result['size']
+
+
+def compare(results, baseline, threshold=0.2):
+    """Compare results with a baseline run.
+
+    :param results: the results of this run
+    :param baseline: the results of the baseline run
+    :param threshold: the fraction slower than the baseline that counts as a regression (default 0.2)
+    :return: a list of (result, ratio) for every result slower than the threshold, where ratio is new/old time
+    """
+    previous = {_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(_key(result))
+        if old is not None and old['per_op'] > 0:
+            ratio = result['per_op'] / old['per_op']
+            result['baseline_ratio'] = ratio
+            if ratio > 1+threshold:
+                regressions.append((result, ratio))
+    return regressions
+
+
+def parse_arguments():
+    parser = ArgumentParser(description="Benchmark the roguelike's hot paths.",
+                            epilog="Run from the repository root as python -m benchmarks. Save a run with "
+                                   "--save-baseline; later runs given --baseline list every benchmark that got "
+                                   "slower by more than the threshold and exit with status 1.")
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=sorted(CASES), help="benchmarks to run")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000], help="map sizes (default 10 100 1000)")
+    parser.add_argument('--engines', nargs='+', choices=['list', 'array', 'chunked'], help="storage engines to run")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per benchmark, keeping the fastest (default 5)")
+    parser.add_argument('--output', default='benchmark_results.json', help="file for the results")
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--save-baseline', help="also write the results to this file for future comparisons")
+    parser.add_argument('--threshold', type=float, default=0.2, help="slowdown counted as a regression (default 0.2)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    results = run(arguments.cases, arguments.sizes, arguments.engines, arguments.repeat)
+
+    regressions = []
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            regressions = compare(results, load(baseline_file)['results'], arguments.threshold)
+
+    document = {'python': python_version(), 'results': results}
+    for filename in filter(None, (arguments.output, arguments.save_baseline)):
+        with open(filename, 'w') as output_file:
+            dump(document, output_file, indent=1)
+
+    for result, ratio in regressions:
+        print("Regression: {} {} {} is {:.2f}x slower than the baseline".format(
+            result['name'], result['engine'] or '-', result['size'] or '-', ratio))
+    sys.exit(1 if regressions else 0)
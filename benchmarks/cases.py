@@ -0,0 +1,202 @@
+import os
+from atexit import register
+from shutil import rmtree
+from random import Random
+from tempfile import mkdtemp
+import dice
+from arraygraph import ArrayGraph
+from chunkedgraph import ChunkedGraph
+from curses_helper.renderer import DungeonRenderer
+from dungeon import Dungeon, ArrayDungeon, ChunkedDungeon, EntityLayer, GROUND, WALL
+from graph import Graph
+from mapfile import load_map, save_map
+from benchmarks.fakewindow import FakeWindow
+__author__ = 'Kellan Childers'
+
+# Storage engines each benchmark is run against, by name.
+GRAPHS = {'list': Graph, 'array': ArrayGraph, 'chunked': ChunkedGraph}
+DUNGEONS = {'list': Dungeon, 'array': ArrayDungeon, 'chunked': ChunkedDungeon}
+
+# Benchmarks by name, each a tuple of (function, engines); engines is None for benchmarks that ignore map size.
+CASES = {}
+
+# Directory for files written by the save and load benchmarks.
+_scratch = mkdtemp(prefix='roguelike-benchmarks-')
+register(rmtree, _scratch, True)
+
+
+def case(name, engines=None):
+    """Register a benchmark.
+
+    The function is called with a graph class and a map size, and sets up a benchmark
+    returning (operation, count): operation is timed, and performs count operations.
+    :param name: the name of the benchmark
+    :param engines: GRAPHS or DUNGEONS to run for every engine and size, or None to run once (default None)
+    :return: a decorator registering the function
+    """
+    def register(function):
+        CASES[name] = (function, engines)
+        return function
+    return register
+
+
+def _points(size, count, seed=0, margin=0):
+    """Choose random points in a square map, the same ones every run.
+
+    :return: a list of points in the form (x, y)
+    """
+    random = Random(seed)
+    return [(random.randrange(margin, size-margin), random.randrange(margin, size-margin)) for _ in range(count)]
+
+
+@case('get_elem', GRAPHS)
+def get_elem(graph_class, size):
+    graph, points = graph_class(size, size, 0), _points(size, 10000)
+
+    def operation():
+        for x, y in points:
+            graph.get_elem(x, y)
+    return operation, len(points)
+
+
+@case('set_elem', GRAPHS)
+def set_elem(graph_class, size):
+    graph, points = graph_class(size, size, 0), _points(size, 10000)
+
+    def operation():
+        for value, (x, y) in enumerate(points):
+            graph.set_elem(value & 7, x, y)
+    return operation, len(points)
+
+
+@case('surrounding', GRAPHS)
+def surrounding(graph_class, size):
+    graph, points = graph_class(size, size, 0), _points(size, 2000, margin=1)
+
+    def operation():
+        for x, y in points:
+            graph.surrounding(x, y)
+    return operation, len(points)
+
+
+@case('resize', GRAPHS)
+def resize(graph_class, size):
+    graph = graph_class(size, size, 0)
+
+    def operation():
+        graph.resize(size + size//2, size + size//2, 1)
+        graph.resize(size, size)
+    return operation, 2
+
+
+@case('copy', GRAPHS)
+def copy(graph_class, size):
+    graph = graph_class(size, size, 0)
+    graph.fill_rect(1, 0, 0, size//2, size//2)
+    return graph.copy, 1
+
+
+@case('make_rectangle', DUNGEONS)
+def make_rectangle(dungeon_class, size):
+    dungeon = dungeon_class(size, size)
+
+    def operation():
+        for inset in range(0, size//2, max(1, size//20)):
+            dungeon.make_rectangle(inset, inset, size-1-inset, size-1-inset)
+    return operation, len(range(0, size//2, max(1, size//20)))
+
+
+@case('make_line', DUNGEONS)
+def make_line(dungeon_class, size):
+    dungeon = dungeon_class(size, size)
+    diagonal = [(index, index) for index in range(size)]
+    return lambda: dungeon.make_line(diagonal), 1
+
+
+@case('save_json', GRAPHS)
+def save_json(graph_class, size):
+    graph, filename = graph_class(size, size, 0), os.path.join(_scratch, 'graph.json')
+    return lambda: graph.save_to_file(filename), 1
+
+
+@case('load_json', GRAPHS)
+def load_json(graph_class, size):
+    filename = os.path.join(_scratch, 'graph.json')
+    graph_class(size, size, 0).save_to_file(filename)
+    graph = graph_class(size, size, 0)
+    return lambda: graph.read_from_file(filename), 1
+
+
+@case('save_map', DUNGEONS)
+def save_binary(dungeon_class, size):
+    dungeon, filename = dungeon_class(size, size), os.path.join(_scratch, 'dungeon.rlmp')
+    dungeon.make_rectangle(0, 0, size-1, size-1)
+    return lambda: save_map(dungeon, filename, compress=True), 1
+
+
+# Binary maps only load into array-backed graphs.
+@case('load_map', {'array': ArrayDungeon})
+def load_binary(dungeon_class, size):
+    filename = os.path.join(_scratch, 'dungeon.rlmp')
+    dungeon = dungeon_class(size, size)
+    dungeon.make_rectangle(0, 0, size-1, size-1)
+    save_map(dungeon, filename, compress=True)
+    return lambda: load_map(filename, dungeon_class), 1
+
+
+@case('render_full', DUNGEONS)
+def render_full(dungeon_class, size):
+    dungeon = dungeon_class(size, size)
+    dungeon.make_rectangle(0, 0, size-1, size-1)
+    renderer = DungeonRenderer(FakeWindow(size, size), dungeon)
+
+    def operation():
+        renderer.invalidate()
+        renderer.render()
+    return operation, 1
+
+
+@case('render_changes', DUNGEONS)
+def render_changes(dungeon_class, size):
+    dungeon = dungeon_class(size, size)
+    renderer = DungeonRenderer(FakeWindow(size, size), dungeon)
+    renderer.render()
+    points = _points(size, 100, seed=1)
+
+    def operation():
+        # A turn's worth of scattered changes, such as monsters moving.
+        for x, y in points:
+            dungeon.set_elem(WALL if dungeon.get_elem(x, y) is GROUND else GROUND, x, y)
+        renderer.render()
+    return operation, 1
+
+
+class _Marker:
+    x = y = 0
+
+
+@case('entities.move')
+def entities_move(_, __):
+    layer, points = EntityLayer(), _points(1000, 5000)
+    markers = [layer.add(_Marker(), x, y) for x, y in points]
+
+    def operation():
+        # Every actor on a crowded level steps and checks its surroundings, as in one round of turns.
+        for marker in markers:
+            layer.move(marker, marker.x ^ 1, marker.y)
+            layer.in_radius(marker.x, marker.y, 4)
+    return operation, len(markers)
+
+
+@case('dice.roll')
+def roll(_, __):
+    def operation():
+        for _ in range(10000):
+            dice.roll(3, 6)
+    return operation, 10000
+
+
+@case('dice.roll_many')
+def roll_many(_, __):
+    roller = dice.Dice(0)
+    return lambda: roller.roll_many("3d6+2", 100000), 100000
@@ -0,0 +1,37 @@
+__author__ = 'Kellan Childers'
+
+
+class FakeWindow:
+    """Stand-in for a curses window or pad that records drawing instead of showing it.
+
+    Only the calls the renderers make are supported, so rendering can be timed without a terminal.
+    """
+    def __init__(self, height=24, width=80):
+        """Create a blank window.
+
+        :param height: the number of rows (default 24)
+        :param width: the number of columns (default 80)
+        :return: null
+        """
+        self.height, self.width = height, width
+        self.calls = 0
+        self.cells_written = 0
+
+    def addstr(self, y, x, text, attribute=0):
+        self.calls += 1
+        self.cells_written += len(text)
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def bkgd(self, character, attribute=0):
+        self.calls += 1
+
+    def touchwin(self):
+        self.calls += 1
+
+    def noutrefresh(self, *positions):
+        self.calls += 1
+
+    def refresh(self, *positions):
+        self.calls += 1
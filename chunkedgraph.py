@@ -0,0 +1,433 @@
+#!/usr/bin/python3
+
+from array import array
+from json import dump, load
+from graph import Graph, _bounding_box
+from arraygraph import typecode_for
+__author__ = 'Kellan Childers'
+
+
+class ChunkedGraph(Graph):
+    """Graph split into square chunks of palette ids that are only allocated once written.
+
+    Chunks that have never been written read as the graph's default value, so a mostly
+    empty graph costs memory only for the parts that have been touched, and growing the
+    graph does not touch any existing cells.
+
+    Copies share chunks with the original until one of them writes to a chunk, so taking a
+    copy or snapshot costs the same however large the graph is.
+    """
+    def __init__(self, width=10, height=10, default=None, chunk_size=64):
+        """Construct a graph of given width and height.
+
+        :param width: the width (x-axis) for the new graph (default 10)
+        :param height: the height (y-axis) for the new graph (default 10)
+        :param default: the default value for each element in the graph (default None)
+        :param chunk_size: the width and height of each chunk (default 64)
+        :return: null
+        """
+        if width < 0 or height < 0:
+            raise IndexError("Cannot initialize graph with less than zero dimension")
+        if chunk_size < 1:
+            raise ValueError("Chunks must be at least one cell across")
+        self._palette = self._new_palette()
+        self._width, self._height = width, height
+        self._chunk_size = chunk_size
+        self._default = default
+        self._default_id = self._palette.index(default)
+        # Maps (chunk_x, chunk_y) to an array of chunk_size*chunk_size ids in row-major order.
+        self._chunks = {}
+        # Keys of the chunks only this graph holds; None when the dictionary itself is shared with a copy.
+        self._owned = set()
+
+    def _own_chunks(self):
+        """Give the graph its own chunk dictionary before chunks are added or removed.
+
+        :return: null
+        """
+        if self._owned is None:
+            self._chunks = dict(self._chunks)
+            self._owned = set()
+
+    def _chunk(self, key):
+        """Get a chunk that is about to be written, allocating it if necessary.
+
+        :param key: the (chunk_x, chunk_y) of the chunk
+        :return: the chunk's array of ids, wide enough for every id in the palette
+        """
+        self._own_chunks()
+        chunk = self._chunks.get(key)
+        typecode = typecode_for(len(self._palette))
+        if chunk is None:
+            chunk = array(typecode, [self._default_id]) * (self._chunk_size*self._chunk_size)
+            self._chunks[key] = chunk
+            self._owned.add(key)
+        elif chunk.typecode != typecode or key not in self._owned:
+            # Chunks shared with a copy are copied before their first write.
+            chunk = self._chunks[key] = array(typecode, chunk)
+            self._owned.add(key)
+        return chunk
+
+    def contains_point(self, x=0, y=0):
+        """Test if the point (x, y) can be found in graph.
+
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :return: a boolean value representing the point's presence in the graph
+        """
+        return 0 <= x < self._width and 0 <= y < self._height
+
+    def get_elem(self, x=0, y=0):
+        """Access the element at a given point (x, y).
+
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :return: the element at (x, y)
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise IndexError("Element not present in graph")
+        size = self._chunk_size
+        chunk = self._chunks.get((x // size, y // size))
+        if chunk is None:
+            return self._default
+        return self._palette[chunk[(y % size)*size + x % size]]
+
+    def set_elem(self, val, x=0, y=0):
+        """Change the value of an element and return the original value.
+
+        :param val: the new value for the element at point (x, y)
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :return: the original value of the element at point (x, y)
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise IndexError("Element not present in graph")
+        value_id = self._palette.index(val)
+        size = self._chunk_size
+        chunk = self._chunk((x // size, y // size))
+        index = (y % size)*size + x % size
+        old = self._palette[chunk[index]]
+        chunk[index] = value_id
+        if self._listeners:
+            self._changed(x, y, x, y)
+        return old
+
+    def get_height(self):
+        """Get the height of the graph.
+
+        :return: the height of the graph
+        """
+        return self._height
+
+    def get_width(self):
+        """Get the width of the graph.
+
+        :return: the width of the graph
+        """
+        return self._width
+
+    def get_palette(self):
+        """Get the palette that translates ids into values.
+
+        :return: the graph's Palette
+        """
+        return self._palette
+
+    def get_chunk_size(self):
+        """Get the width and height of each chunk.
+
+        :return: the chunk size
+        """
+        return self._chunk_size
+
+    def allocated_chunks(self):
+        """Get the chunks that have been written to.
+
+        :return: a list of (chunk_x, chunk_y) pairs
+        """
+        return list(self._chunks)
+
+    def get_row(self, y=0, x_start=0, x_end=None):
+        """Get a copy of part of a row.
+
+        :param y: the row to read (default 0)
+        :param x_start: the first x-element to read (default 0)
+        :param x_end: the last x-element to read (default the end of the row)
+        :return: a list of the elements from x_start to x_end
+        """
+        if not 0 <= y < self._height:
+            raise IndexError("Row not present in graph")
+        x_start = max(x_start, 0)
+        x_end = self._width-1 if x_end is None else min(x_end, self._width-1)
+        size, values = self._chunk_size, self._palette.values()
+        row_start = (y % size)*size
+        row = []
+        for chunk_x in range(x_start // size, x_end // size + 1):
+            start, end = max(x_start, chunk_x*size), min(x_end, chunk_x*size + size-1)
+            chunk = self._chunks.get((chunk_x, y // size))
+            if chunk is None:
+                row.extend([self._default] * (end-start+1))
+            else:
+                offset = row_start - chunk_x*size
+                row.extend([values[value_id] for value_id in chunk[offset+start:offset+end+1]])
+        return row
+
+    def _fill_ids(self, value_id, x_start, y_start, x_end, y_end):
+        """Write an id over a rectangle of cells without checking it against the graph's bounds.
+
+        Chunks that end up entirely holding the default value are released.
+        :param value_id: the id to write
+        :param x_start: the x-element of the start point of the rectangle (bottom left)
+        :param y_start: the y-element of the start point of the rectangle (bottom left)
+        :param x_end: the x-element of the end point of the rectangle (top right)
+        :param y_end: the y-element of the end point of the rectangle (top right)
+        :return: null
+        """
+        if x_start > x_end or y_start > y_end:
+            return
+        self._own_chunks()
+        size = self._chunk_size
+        for chunk_y in range(y_start // size, y_end // size + 1):
+            base_y = chunk_y*size
+            rows = range(max(y_start, base_y) - base_y, min(y_end, base_y + size-1) - base_y + 1)
+            for chunk_x in range(x_start // size, x_end // size + 1):
+                start = max(x_start, chunk_x*size) - chunk_x*size
+                end = min(x_end, chunk_x*size + size-1) - chunk_x*size
+                key = (chunk_x, chunk_y)
+                if value_id == self._default_id:
+                    if key not in self._chunks:
+                        continue
+                    if len(rows) == size and end-start+1 == size:
+                        del self._chunks[key]
+                        continue
+                chunk = self._chunk(key)
+                span = array(chunk.typecode, [value_id]) * (end-start+1)
+                for row in rows:
+                    chunk[row*size+start:row*size+end+1] = span
+
+    def fill_points(self, val, point_list):
+        """Set every point in a list to the same value, skipping points outside the graph.
+
+        :param val: the new value for the points
+        :param point_list: the list of points in the form (x, y)
+        :return: a reference to the graph
+        """
+        value_id = self._palette.index(val)
+        width, height, size = self._width, self._height, self._chunk_size
+        points = [(x, y) for x, y in point_list if 0 <= x < width and 0 <= y < height]
+        for x, y in points:
+            self._chunk((x // size, y // size))[(y % size)*size + x % size] = value_id
+        if points and self._listeners:
+            self._changed(*_bounding_box(points))
+        return self
+
+    def fill_rect(self, val, x_start, y_start, x_end, y_end):
+        """Set every element of a rectangle to the same value, clipped to the graph.
+
+        :param val: the new value for the rectangle
+        :param x_start: the x-element of the start point of the rectangle (bottom left)
+        :param y_start: the y-element of the start point of the rectangle (bottom left)
+        :param x_end: the x-element of the end point of the rectangle (top right)
+        :param y_end: the y-element of the end point of the rectangle (top right)
+        :return: a reference to the graph
+        """
+        clipped = self.clip_rect(x_start, y_start, x_end, y_end)
+        if clipped is not None:
+            self._fill_ids(self._palette.index(val), *clipped)
+            self._changed(*clipped)
+        return self
+
+    def fill_mask(self, val, mask, x=0, y=0):
+        """Set the elements selected by a mask to the same value, clipped to the graph.
+
+        :param val: the new value for the selected elements
+        :param mask: rows of truthy or falsy values, starting from row zero
+        :param x: the x-element where the mask's first column is placed (default 0)
+        :param y: the y-element where the mask's first row is placed (default 0)
+        :return: a reference to the graph
+        """
+        for j, mask_row in enumerate(mask, y):
+            if not 0 <= j < self._height:
+                continue
+            x_start, x_end = max(x, 0), min(x+len(mask_row), self._width)-1
+            if x_start > x_end:
+                continue
+            row = [val if selected else old for selected, old in
+                   zip(mask_row[x_start-x:x_end-x+1], self.get_row(j, x_start, x_end))]
+            self._write_rows([row], x_start, j)
+        if self._listeners:
+            changed = self._mask_rect(mask, x, y)
+            if changed is not None:
+                self._changed(*changed)
+        return self
+
+    def _write_rows(self, rows, x, y):
+        """Write rows of values that are already clipped to the graph.
+
+        :param rows: lists of values, starting from row y
+        :param x: the x-element of the first value in each row
+        :param y: the row to write the first list to
+        :return: null
+        """
+        ids, id_rows = {}, []
+        for values in rows:
+            for value in values:
+                if value not in ids:
+                    ids[value] = self._palette.index(value)
+            id_rows.append([ids[value] for value in values])
+        self._write_id_rows(id_rows, x, y)
+
+    def _write_id_rows(self, rows, x, y):
+        """Write rows of palette ids that are already clipped to the graph.
+
+        Parts of rows that are all the default id are skipped where their chunk is not yet
+        allocated, so large empty areas never allocate chunks.
+        :param rows: lists or arrays of ids, starting from row y
+        :param x: the x-element of the first id in each row
+        :param y: the row to write the first list to
+        :return: null
+        """
+        size, default_id = self._chunk_size, self._default_id
+        for j, ids in enumerate(rows, y):
+            row_start = (j % size)*size
+            for chunk_x in range(x // size, (x+len(ids)-1) // size + 1):
+                start, end = max(x, chunk_x*size), min(x+len(ids)-1, chunk_x*size + size-1)
+                segment = ids[start-x:end-x+1]
+                if (chunk_x, j // size) not in self._chunks and segment.count(default_id) == len(segment):
+                    continue
+                chunk = self._chunk((chunk_x, j // size))
+                offset = row_start - chunk_x*size
+                chunk[offset+start:offset+end+1] = array(chunk.typecode, segment)
+
+    def read_from_file(self, filename):
+        """Read a json file and load the graph from it.
+
+        :param filename: the name of the file to be read
+        :return: a reference to the graph
+        """
+        with open(filename, 'r') as read_file:
+            rows = load(read_file)
+        width = len(rows[0]) if rows else 0
+        if any(len(row) != width for row in rows):
+            raise ValueError("Rows in {} are not all the same length".format(filename))
+        self._chunks, self._owned = {}, set()
+        self._width, self._height = width, len(rows)
+        self._write_rows(rows, 0, 0)
+        self._changed_all()
+        return self
+
+    def save_to_file(self, filename):
+        """Save the graph to a json file.
+
+        :param filename: the name of the file to be written to
+        :return: a reference to the graph
+        """
+        with open(filename, 'w') as write_file:
+            dump([self.get_row(y) for y in range(self._height)], write_file)
+        return self
+
+    def resize(self, x=0, y=0, default=None):
+        """Change the dimensions of the graph.
+
+        Growing only allocates chunks when default differs from the graph's default value,
+        so it costs at most one allocation per new chunk rather than one write per new cell.
+        :param x: the new width of the graph (default 0)
+        :param y: the new height of the graph (default 0)
+        :param default: the default value for any elements not in the original scope (default None)
+        :return: a reference to the graph
+        """
+        if x == self._width and y == self._height:
+            return self
+        elif x < 0 or y < 0:
+            raise IndexError("Unable to resize to negative size")
+        size, width, height = self._chunk_size, self._width, self._height
+        # Cells outside the graph always hold the default id, so that growing can reveal them as they are.
+        self._chunks = {key: chunk for key, chunk in self._chunks.items() if key[0]*size < x and key[1]*size < y}
+        if self._owned is None:
+            self._owned = set()
+        if x < width:
+            self._fill_ids(self._default_id, x, 0, min(width, -(-x // size)*size)-1,
+                           min(height, -(-y // size)*size)-1)
+        if y < height:
+            self._fill_ids(self._default_id, 0, y, min(width, x)-1, min(height, -(-y // size)*size)-1)
+        self._width, self._height = x, y
+
+        default_id = self._palette.index(default)
+        if default_id != self._default_id:
+            if x > width:
+                self._fill_ids(default_id, width, 0, x-1, y-1)
+            if y > height:
+                self._fill_ids(default_id, 0, height, min(width, x)-1, y-1)
+        self._changed_all()
+        return self
+
+    def copy(self):
+        """Copy the graph to a new location without copying any cells.
+
+        Both graphs share every chunk until one of them writes to it, and the palette is
+        shared as well, so ids mean the same in both.
+        :return: a copy of the graph
+        """
+        new_graph = self._copy_attributes()
+        self._owned = new_graph._owned = None
+        return new_graph
+
+    def restore(self, snapshot):
+        """Make the graph match a snapshot again, sharing the snapshot's chunks.
+
+        Only the chunks that differ from the snapshot are reported to listeners.
+        :param snapshot: a graph returned by snapshot() or copy()
+        :return: a reference to the graph
+        """
+        if not isinstance(snapshot, ChunkedGraph) or snapshot._palette is not self._palette or \
+                snapshot._chunk_size != self._chunk_size:
+            return super(ChunkedGraph, self).restore(snapshot)
+        resized = (self._width, self._height, self._default_id) != \
+                  (snapshot._width, snapshot._height, snapshot._default_id)
+        changed = [key for key in set(self._chunks) | set(snapshot._chunks)
+                   if self._chunks.get(key) is not snapshot._chunks.get(key)]
+        self._chunks = snapshot._chunks
+        self._owned = snapshot._owned = None
+        self._width, self._height = snapshot._width, snapshot._height
+        self._default, self._default_id = snapshot._default, snapshot._default_id
+        if resized:
+            self._changed_all()
+        elif changed and self._listeners:
+            size = self._chunk_size
+            clipped = self.clip_rect(min(key[0] for key in changed)*size, min(key[1] for key in changed)*size,
+                                     max(key[0] for key in changed)*size + size-1,
+                                     max(key[1] for key in changed)*size + size-1)
+            if clipped is not None:
+                self._changed(*clipped)
+        return self
+
+    def clear(self, default=None):
+        """Remove all data from the current graph and restore it to default.
+
+        :param default: the default value for each element in the graph (default None)
+        :return: a reference to the graph
+        """
+        self._chunks, self._owned = {}, set()
+        self._default = default
+        self._default_id = self._palette.index(default)
+        self._changed_all()
+        return self
+
+    def print_all(self):
+        """Print every row to the command line, starting from row zero.
+
+        :return: null
+        """
+        for y in reversed(range(self._height)):
+            print(''.join([str(element) for element in self.get_row(y)]))
+
+if __name__ == "__main__":
+    # Short program for showing off capability of module.
+    print("Demonstrating chunkedgraph.py\n")
+    test = ChunkedGraph(1000000, 1000000, '.', chunk_size=16)
+    test.fill_rect('#', 999990, 999990, 1000009, 999995)
+    print("Writing to the corner of a million by million graph allocated {} chunks".format(
+        len(test.allocated_chunks())))
+    test.resize(2000000, 2000000, '.')
+    print("Growing it to two million by two million left {} chunks allocated".format(
+        len(test.allocated_chunks())))
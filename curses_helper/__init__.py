@@ -1,2 +1,5 @@
-from curses_helper.mainscreen import MainScreen
+from lazyimport import lazy_exports
 __author__ = 'Kellan Childers'
+
+# The main screen brings in the whole game, so it is only imported when it is used.
+__getattr__, __dir__ = lazy_exports(__name__, globals(), {'MainScreen': 'curses_helper.mainscreen'})
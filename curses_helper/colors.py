@@ -0,0 +1,84 @@
+import curses
+__author__ = 'Kellan Childers'
+
+# Color names used by tiles and screens, and the curses colors they stand for.
+COLOR_NAMES = {
+    'black': curses.COLOR_BLACK, 'red': curses.COLOR_RED, 'green': curses.COLOR_GREEN,
+    'yellow': curses.COLOR_YELLOW, 'blue': curses.COLOR_BLUE, 'magenta': curses.COLOR_MAGENTA,
+    'cyan': curses.COLOR_CYAN, 'white': curses.COLOR_WHITE,
+}
+
+
+def color_number(color):
+    """Get the curses color for a color name.
+
+    :param color: a name in COLOR_NAMES, or a curses color number
+    :return: the curses color number
+    """
+    if isinstance(color, int):
+        return color
+    try:
+        return COLOR_NAMES[color]
+    except KeyError:
+        raise ValueError("Unknown color {}".format(color))
+
+
+class ColorPairs:
+    """Cache giving each distinct (foreground, background) pair one curses color pair.
+
+    Pairs are created with init_pair the first time their colors are asked for, and tile
+    attributes are remembered by color, so drawing a tile costs a single dictionary lookup
+    and the cache holds one entry per pair of colors however many tiles are drawn.
+    Once curses runs out of pairs, further colors are drawn in the terminal's default pair.
+    """
+    def __init__(self, first_pair=1):
+        """Create an empty cache.
+
+        :param first_pair: the first pair number to hand out; lower numbers are left alone (default 1)
+        :return: null
+        """
+        self._next_pair = first_pair
+        # Maps (foreground, background) to a pair number.
+        self._pairs = {}
+        # Maps a tile's (char_color, back_color) to its attribute.
+        self._tiles = {}
+
+    def pair_number(self, foreground, background):
+        """Get the pair number for two colors, creating the pair if it is new.
+
+        :param foreground: the color of the text
+        :param background: the color behind the text
+        :return: the pair number
+        """
+        number = self._pairs.get((foreground, background))
+        if number is None:
+            number = 0
+            if self._next_pair < getattr(curses, 'COLOR_PAIRS', 0):
+                curses.init_pair(self._next_pair, color_number(foreground), color_number(background))
+                number, self._next_pair = self._next_pair, self._next_pair+1
+            self._pairs[(foreground, background)] = number
+        return number
+
+    def attribute(self, foreground, background):
+        """Get the curses attribute that draws in two colors.
+
+        :param foreground: the color of the text
+        :param background: the color behind the text
+        :return: the attribute, for passing to addstr or bkgd
+        """
+        return curses.color_pair(self.pair_number(foreground, background))
+
+    def tile_attribute(self, tile):
+        """Get the curses attribute that draws a tile in its colors.
+
+        :param tile: the tile, or any value without colors, which is drawn without attributes
+        :return: the attribute
+        """
+        colors = getattr(tile, 'char_color', None), getattr(tile, 'back_color', None)
+        attribute = self._tiles.get(colors)
+        if attribute is None:
+            attribute = self._tiles[colors] = 0 if None in colors else self.attribute(*colors)
+        return attribute
+
+# Pairs shared by every window, since curses color pairs belong to the whole terminal.
+color_pairs = ColorPairs()
@@ -1,267 +1,547 @@
 import curses
+import sys
 import curses_helper.util as util
-from dungeon import Dungeon
+from curses_helper.colors import color_pairs
+from instrument import recorder
 __author__ = 'Kellan Childers'
 
+# The intro is drawn before anything else is needed, so the event loop, the engine and the
+# dungeon view are imported by the methods that first use them, once the intro is on screen.
+
+# Screen commands by key, each naming the MainScreen method that carries it out; other keys go to the game.
+COMMANDS = {
+    'h': 'help',
+    'q': 'quit',
+    's': 'save',
+    '>': 'descend',
+    '<': 'ascend',
+}
+
+# Game turns taken between chances for input and drawing to run, so monsters never stall the screen.
+STEPS_PER_YIELD = 50
+
 
 class MainScreen:
-    def __init__(self, console_height, console_width):
+    def __init__(self, console_height, console_width, game=None, seed=None, resident=4, save=None,
+                 generator='cave'):
         """Create a main screen.
 
         :param console_height: the height of the console
         :param console_width: the width of the console
+        :param game: the first level's game, whose input must be a QueueInput (default a new level from generator,
+                     made when the game starts)
+        :param seed: the seed for new levels (default None)
+        :param resident: the most levels kept in memory; the rest are cached on disk (default 4)
+        :param save: the file to save the game in after every turn, and to continue from (default None, to ask)
+        :param generator: the name of the generator in levelgen.GENERATORS making new levels (default 'cave')
         :return: null
         """
         # List should be two smaller in each direction because of surrounding border.
         self._dungeon_height, self._dungeon_width = console_height-2, console_width-2
 
         # Center the window based on the size of the console.
-        display_start_y, display_start_x = util.center_start(console_height, console_width,
+        self._display_y, self._display_x = util.center_start(console_height, console_width,
                                                              self._dungeon_height, self._dungeon_width)
 
-        # Initialize a Dungeon to serve as a main dungeon.
-        self._dungeon = Dungeon(self._dungeon_width, self._dungeon_height)
+        # Create window that will act as main visual. Keys are read from it without waiting.
+        self._dungeon_display = curses.newwin(self._dungeon_height, self._dungeon_width,
+                                              self._display_y, self._display_x)
+        self._dungeon_display.keypad(True)
+        self._dungeon_display.nodelay(True)
+
+        # Add visual detail to window: white text on blue inside a black border.
+        # The border never changes, so it is only drawn here.
+        self._dungeon_display.bkgd(' ', color_pairs.attribute('white', 'blue'))
+        util.color_box(self._dungeon_display, 0, 0, self._dungeon_height-1, self._dungeon_width-1,
+                       color_pairs.pair_number('black', 'black'))
+
+        # No level is made until the game starts, so the intro never waits for one.
+        self._console_height, self._console_width = console_height, console_width
+        self._first_game, self._seed, self._resident, self._generator = game, seed, resident, generator
+        self.levels, self.game, self._dungeon, self._dungeon_view = None, None, None, None
+
+        # The help window is made the first time help() shows it.
+        self.help_window = None
+
+        # Keys go to the first of: an open prompt, the help window, the intro, then the commands.
+        self._prompt = None
+        self._help_open = False
+        self._intro = False
+        self._message = ''
+        self._last_game_message = None
+
+        # The game is saved after every turn once a save file is chosen.
+        self._save_name = save
+        self._save = None
+
+        # Whether the last frame's statistics are drawn over the top of the border.
+        self._overlay = False
+        self._instrumented = False
+
+        # State of the event loop, created by run().
+        self._running = False
+        self._redraw = None
+        self._keys_ready = None
+        self._failure = None
+
+    def _show_game(self, game):
+        """Play a game, viewing its dungeon.
+
+        :param game: the game to show
+        :return: null
+        """
+        import dungeon.dungeonview as dungeonview
+        if self._dungeon_view is not None:
+            self._dungeon_view.close()
+        self.game, self._dungeon = game, game.dungeon
+        self.game.running = True
+        # Show the dungeon inside the border through a scrolling view.
+        self._dungeon_view = dungeonview.DungeonView(dungeon=self._dungeon,
+                                                     screen_y=self._display_y+1, screen_x=self._display_x+1,
+                                                     view_height=self._dungeon_height-2,
+                                                     view_width=self._dungeon_width-2, colors=color_pairs)
+        self._dungeon_view.get_pad().bkgd(' ', color_pairs.attribute('white', 'blue'))
+        if self._instrumented:
+            self._dungeon_view.instrument(recorder)
+            recorder.watch_graph(self._dungeon)
+
+    def _new_levels(self, seed, input_source):
+        """Create a level manager for a run.
+
+        Levels are twice the size of the view in each direction, so the view scrolls to follow the player.
+        Levels below and above are prepared in the background while the current one is played.
+        :param seed: the seed of the run
+        :param input_source: the source of the player's keys
+        :return: a new LevelManager with no levels
+        """
+        from engine import LevelManager
+        return LevelManager(input_source, 2*(self._dungeon_width-2), 2*(self._dungeon_height-2), seed,
+                            self._resident, generator=self._generator)
 
-        # Create window that will act as main visual.
-        self._dungeon_display = curses.newwin(self._dungeon_height, self._dungeon_width, display_start_y, display_start_x)
+    def _start_game(self):
+        """Make the first level, or take the game given to the screen, and start playing it.
 
-        # Add visual detail to window.
-        self._dungeon_display.bkgd(' ', curses.color_pair(1))
-        util.color_box(self._dungeon_display, 0, 0, self._dungeon_height-1, self._dungeon_width-1, 3)
+        :return: null
+        """
+        from engine import Player, QueueInput
+        game = self._first_game
+        self.levels = self._new_levels(self._seed, QueueInput() if game is None else game.input)
+        if game is not None:
+            self.levels.put(1, game)
+        self._first_game = None
+        self._show_game(self.levels.enter(1, Player() if game is None else game.player))
+        if self._keys_ready is not None:
+            self._keys_ready.set()
+
+    def instrument(self, overlay=False):
+        """Count the curses calls and map changes made by the screen in the shared recorder.
+
+        :param overlay: whether to draw the last frame's statistics over the top border (default False)
+        :return: a reference to the main screen
+        """
+        self._dungeon_display = recorder.wrap_window(self._dungeon_display)
+        if self._dungeon_view is not None:
+            self._dungeon_view.instrument(recorder)
+            recorder.watch_graph(self._dungeon)
+        self._overlay, self._instrumented = overlay, True
+        return self
 
-        # Initializes help window for use in pause().
-        help_height, help_width = 12, 50
-        help_y, help_x = util.center_start(console_height, console_width, help_height, help_width)
-        self.help_window = curses.newwin(help_height, help_width, help_y, help_x)
+    def message(self, text):
+        """Show a message on the bottom border until the next message.
 
-    def request_element(self, request):
-        """Ask for an element.
+        :param text: the message
+        :return: null
+        """
+        self._message = text
+
+    def request_element(self, request, callback):
+        """Ask for an element, which is typed in while the game keeps running.
 
         :param request: the request for the element (requires string)
-        :return: the user's response
+        :param callback: a function called with the user's response once enter is pressed
+        :return: null
         """
-        # Clear row in preparation of getting element.
-        self._dungeon_display.addstr(self._dungeon_height-2, 1, ' '*(self._dungeon_width-2))
+        self._prompt = (request, callback, [])
 
-        # Format request, then request.
-        _, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, len(request))
-        self._dungeon_display.addstr(self._dungeon_height-2, line_x, request)
-        self._dungeon_display.refresh()
+    def _prompt_key(self, key):
+        """Add a key to the open prompt, finishing it on enter and abandoning it on escape.
 
-        # Get element.
-        curses.echo()
-        element = self._dungeon_display.getstr().decode(encoding="utf-8")
-        curses.noecho()
+        :param key: the key
+        :return: null
+        """
+        request, callback, typed = self._prompt
+        if key == '\n':
+            self._prompt = None
+            self.message('')
+            callback(''.join(typed))
+        elif key == '\x1b':
+            self._prompt = None
+            self.message('')
+        elif key in ('KEY_BACKSPACE', '\x7f', '\b'):
+            if typed:
+                typed.pop()
+        elif len(key) == 1 and key.isprintable():
+            typed.append(key)
+
+    def load(self):
+        """Continue the game saved in the save file, asking for the file if none was given.
 
-        return element
+        :return: null
+        """
+        if self._save_name is None:
+            self.request_element("Enter save file: ", self._load_from)
+        else:
+            self._load_from(self._save_name)
 
-    def start_load(self):
-        """Loads a list from a file.
+    def _load_from(self, filename):
+        """Continue a saved game, replacing the current run, and keep saving it to the same file.
 
+        :param filename: the save file
         :return: null
         """
-        # Request filename.
-        line_y, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 16)
-        self._dungeon_display.addstr(line_y+4, 1, ' '*(self._dungeon_width-2))
-        self._dungeon_display.addstr(line_y+4, line_x, "Enter filename: ")
-        self._dungeon_display.refresh()
-
-        # Get filename
-        curses.echo()
-        filename = self._dungeon_display.getstr().decode(encoding="utf-8")
-        filename = 'shopping_lists/data/' + filename
-        curses.noecho()
-
-        # Try to load list, and recursively call start_command if the file isn't loaded.
+        from engine import QueueInput, load_game
+        input_source = QueueInput() if self.levels is None else self.levels.input
         try:
-            # new_list = Recipe.create_from_file(filename)
-            # Add ingredients to the shopping list.
-            # new_list.add_to(self._shopping_list)
-
-            # Alert user that list was updated..
-            line_y, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, len(filename)+13)
-            self._dungeon_display.addstr(line_y+5, line_x, "{} fully loaded".format(filename))
-            self._dungeon_display.refresh()
-        except (FileNotFoundError, IsADirectoryError):
-            # Alert user that file was not found.
-            line_y, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 13)
-            self._dungeon_display.addstr(line_y+5, line_x, "File not found.")
-            self._dungeon_display.refresh()
-
-            # Retry getting a command
-            self.start_shopping_list()
+            game, info = load_game(filename, input_source)
+        except (OSError, ValueError) as error:
+            self.message("Could not load {}: {}".format(filename, error))
+            return
+        if game.player is None:
+            self.message("The game saved in {} is over".format(filename))
+            return
+        # Levels other than the saved one are generated again from the saved run's seed.
+        if self.levels is not None:
+            self.levels.close()
+        self.levels = self._new_levels(info['seed'], input_source)
+        self.levels.put(info['depth'], game)
+        self._show_game(self.levels.enter(info['depth'], game.player))
+        self._intro = False
+        self._start_saving(filename)
+        self.message("Loaded {} at level {}".format(filename, info['depth']))
+
+    def _start_saving(self, filename):
+        """Save the current level to a file, and keep it saved after every turn.
+
+        :param filename: the save file
+        :return: null
+        """
+        from engine import SaveGame
+        if self._save is not None:
+            self._save.close()
+        try:
+            self._save = SaveGame(filename).start(self.game, self.levels.depth, self.levels.seed)
+        except (OSError, ValueError) as error:
+            self._save = None
+            self.message("Could not save to {}: {}".format(filename, error))
+            return
+        self._save_name = filename
 
     def show_intro(self):
-        """Show welcome text."""
+        """Show welcome text until a key is pressed."""
         # Calling util.center_start using the length of the string will center the string.
         # Line length acquired by adding str(len(...)) around text and running program.
-        line_1_y, line_1_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 18)
-        self._dungeon_display.addstr(line_1_y, line_1_x, "Welcome to RecAppE")
+        line_1_y, line_1_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 22)
+        self._dungeon_display.addstr(line_1_y, line_1_x, "Welcome to the dungeon")
 
-        line_2_y, line_2_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 42)
-        self._dungeon_display.addstr(line_2_y+1, line_2_x, "To create a new shopping list, press enter")
+        line_2_y, line_2_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 32)
+        self._dungeon_display.addstr(line_2_y+1, line_2_x, "To start a new game, press enter")
 
-        line_3_y, line_3_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 52)
-        self._dungeon_display.addstr(line_3_y+2, line_3_x, "To add to a previously made shopping list, press 'l'")
+        line_3_y, line_3_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 35)
+        self._dungeon_display.addstr(line_3_y+2, line_3_x, "To continue a saved game, press 'l'")
 
         line_4_y, line_4_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 30)
         self._dungeon_display.addstr(line_4_y+3, line_4_x, "To quit, press 'q' at any time")
 
-        self._dungeon_display.refresh()
+        self._intro = True
 
-    def start_shopping_list(self):
-        """Start the main screen by getting a command from a key.
+    def _intro_key(self, key):
+        """Handle a key pressed on the intro screen.
 
         Pressing 'q' will quit app.
-        :return: a reference to the main screen
+        :param key: the key
+        :return: null
         """
-        key = self._dungeon_display.getkey()
         if key == '\n':
-            # Shopping list is already empty so program can continue
-            return self
+            self._intro = False
+            self._start_game()
+            if self._save_name is not None:
+                self._start_saving(self._save_name)
         elif key == 'l':
-            # Load a shopping list from saves.
-            self.start_load()
-            return self
+            self.load()
         elif key == 'q':
-            # quit app.
-            exit()
+            self.quit()
         else:
-            # Use same method for centering text as show_intro(); add text below show_intro()'s.
-            line_y, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 28)
-            self._dungeon_display.addstr(line_y+4, line_x, "Command not found, try again")
-
-            self._dungeon_display.refresh()
-            self.start_shopping_list()
+            self.message("Command not found, try again")
 
     def clear_screen(self):
-        """Clear the contents of the screen.
+        """Draw one frame: the border's messages, then the part of the dungeon and the actors in view.
 
         :return: a reference to the main screen
         """
-        self._dungeon_display.clear()
-
-        # Add back border and show display
-        util.color_box(self._dungeon_display, 0, 0, self._dungeon_height-1, self._dungeon_width-1, 3)
-        self._dungeon_display.refresh()
-
+        recorder.start_frame()
+        if self._overlay:
+            text = recorder.overlay_text()[:self._dungeon_width-4]
+            self._dungeon_display.addstr(0, 2, text.ljust(self._dungeon_width-4), curses.A_BOLD)
+        if self._prompt is not None:
+            request, _, typed = self._prompt
+            line = request + ''.join(typed)
+        else:
+            line = self._message
+        line = line[-(self._dungeon_width-4):].ljust(self._dungeon_width-4)
+        self._dungeon_display.addstr(self._dungeon_height-1, 2, line, color_pairs.attribute('white', 'black'))
+
+        # Only cells that differ from the terminal are sent by doupdate.
+        self._dungeon_display.noutrefresh()
+        if not self._intro:
+            player = self.game.player
+            if player is not None:
+                self._dungeon_view.follow(player.x, player.y)
+            # The display was copied over the view, so all of the view is copied back.
+            self._dungeon_view.touch().noutrefresh(self.game.entities.in_rect(*self._dungeon_view.get_bounds()))
+        if self._help_open:
+            self.help_window.touchwin()
+            self.help_window.noutrefresh()
+        recorder.count('curses.calls')
+        curses.doupdate()
+
+        recorder.end_frame()
         return self
 
     def help(self):
-        """Show help window."""
-        self.help_window.bkgd(' ', curses.color_pair(0))
-
-        self.help_window.addstr(1, 19, "Help window")
-        self.help_window.addstr(3, 12, "To add an item, press 'a'")
-        self.help_window.addstr(4, 11, "To remove an item, press 'r'")
-        self.help_window.addstr(5, 11, "To load a recipe, press 'l'")
-        self.help_window.addstr(6, 10, "To save as a recipe, press 'w'")
-        self.help_window.addstr(7, 6, "To save as a shopping list, press 's'")
-        self.help_window.addstr(8, 12, "To clear the list, press 'c'")
-        self.help_window.addstr(9, 16, "To quit, press 'q'")
-        self.help_window.addstr(10, 3, "Otherwise, press 'h' to return to application")
-
-        self.help_window.refresh()
-
-        # Close if user hits 'h', otherwise do the command user asks.
-        key = self.help_window.getkey()
-        if key == 'h':
+        """Show help window until the next key."""
+        if self.help_window is None:
+            # The help window never changes, so it is drawn once when it is first needed.
+            help_height, help_width = 12, 50
+            help_y, help_x = util.center_start(self._console_height, self._console_width, help_height, help_width)
+            self.help_window = curses.newwin(help_height, help_width, help_y, help_x)
+            self.help_window.bkgd(' ', curses.color_pair(0))
+
+            self.help_window.addstr(1, 19, "Help window")
+            self.help_window.addstr(3, 4, "To move, use the arrows or the number pad")
+            self.help_window.addstr(4, 13, "To wait a turn, press '.'")
+            self.help_window.addstr(5, 6, "To go down to the next level, press '>'")
+            self.help_window.addstr(6, 11, "To go up a level, press '<'")
+            self.help_window.addstr(7, 11, "To save the game, press 's'")
+            self.help_window.addstr(9, 16, "To quit, press 'q'")
+            self.help_window.addstr(10, 3, "Otherwise, press 'h' to return to application")
+        self._help_open = True
+
+    def _help_key(self, key):
+        """Close the help window, then carry out the key unless it was 'h'.
+
+        :param key: the key
+        :return: null
+        """
+        self._help_open = False
+        # The help window covered part of the display, so all of it must be sent again.
+        self._dungeon_display.touchwin()
+        if key != 'h':
+            self.do_command(key)
+
+    def quit(self):
+        """Stop the event loop once the current frame is done.
+
+        :return: null
+        """
+        self._running = False
+        if self._redraw is not None:
+            self._redraw.set()
+
+    def save(self):
+        """Take a new snapshot of the game, asking for a save file if none was chosen.
+
+        :return: null
+        """
+        if self._save_name is None:
+            self.request_element("Enter name to save game as: ", self._start_saving)
+        elif self._save is None:
+            self._start_saving(self._save_name)
+        else:
+            self._save.checkpoint()
+        if self._save is not None:
+            self.message("Game saved to {}".format(self._save_name))
+
+    def _change_level(self, depth):
+        """Carry the player to another level, if it has been prepared in the background.
+
+        :param depth: the depth of the level
+        :return: null
+        """
+        if not self.levels.is_ready(depth):
+            self.levels.prefetch(depth)
+            self.message("The way {} is not ready yet".format("down" if depth > self.levels.depth else "up"))
+            return
+        direction = "descend" if depth > self.levels.depth else "climb"
+        self._show_game(self.levels.enter(depth, self.game.player))
+        if self._save is not None:
+            # The save holds the level being played, so it starts again from the new level.
+            self._save.start(self.game, depth, self.levels.seed)
+        self.message("You {} to level {}".format(direction, depth))
+        if self._keys_ready is not None:
+            self._keys_ready.set()
+
+    def descend(self):
+        """Carry the player down a level.
+
+        :return: null
+        """
+        self._change_level(self.levels.depth+1)
+
+    def ascend(self):
+        """Carry the player up a level, unless they are on the first level.
+
+        :return: null
+        """
+        if self.levels.depth == 1:
+            self.message("There is no way up from here")
             return
+        self._change_level(self.levels.depth-1)
+
+    def handle_key(self, key):
+        """Send a key to whatever is waiting for it.
+
+        :param key: the key, as named by curses
+        :return: null
+        """
+        if self._prompt is not None:
+            self._prompt_key(key)
+        elif self._help_open:
+            self._help_key(key)
+        elif self._intro:
+            self._intro_key(key)
         else:
             self.do_command(key)
+        if self._redraw is not None:
+            self._redraw.set()
 
-    def do_command(self, key=None):
-        """Execute a command based on key input."""
-        if key is None:
-            key = self._dungeon_display.getkey()
+    @recorder.timed('screen.command')
+    def do_command(self, key):
+        """Execute a command based on key input, looking it up in COMMANDS and then in the game's commands.
 
-        # Clear line in case a previous command had written to it.
-        self._dungeon_display.addstr(self._dungeon_height-2, 1, ' '*(self._dungeon_width-2))
-        self._dungeon_display.refresh()
+        :param key: the key, as named by curses
+        :return: null
+        """
+        command = COMMANDS.get(key)
+        if command is not None:
+            getattr(self, command)()
+        elif key in self.game.commands and self.game.running:
+            self.game.input.push(key)
+            if self._keys_ready is not None:
+                self._keys_ready.set()
+        elif key != 'KEY_RESIZE':
+            # Tell the user that the key was an invalid command.
+            self.message("Command not found")
 
-        if key == 'l':
-            # Load a recipe.
-            try:
-                filename = self.request_element("Enter name of recipe to load: ")
-                self.add_recipe(filename)
-            except (FileNotFoundError, IsADirectoryError):
-                # Alert user that recipe wasn't loaded.
-                _, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 18)
-                self._dungeon_display.addstr(self._dungeon_height-2, 1, ' '*(self._dungeon_width-2))
-                self._dungeon_display.addstr(self._dungeon_height-2, line_x, "File not found")
-                self._dungeon_display.refresh()
-                self.do_command()
-        elif key == 'a':
-            # Add an ingredient.
-            try:
-                # Pull data to add as a new ingredient.
-                item_name = self.request_element("Enter name of item: ")
-                item_quantity = int(self.request_element("Enter quantity of item: "))
-                item_qualifier = self.request_element("Enter qualifier of item: ")
-
-                self.add_item(item_name, item_quantity, item_qualifier)
-            except ValueError:
-                self._dungeon_display.addstr(self._dungeon_height-2, 1, ' '*(self._dungeon_width-2))
-                _, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 18)
-                self._dungeon_display.addstr(self._dungeon_height-2, line_x, "Could not add item")
-                self._dungeon_display.refresh()
-                self.do_command()
-        elif key == 'q':
-            # Quit app.
-            # USING THIS FULLY EXITS PYTHON INTERPRETER.
-            exit()
-        elif key == 's':
-            # Save shopping list.
-            try:
-                filename = self.request_element("Enter name to save list as: ")
-                self.save_list(filename)
-            except IsADirectoryError:
-                # User didn't enter file, so tell the user and retry.
-                self._dungeon_display.addstr(self._dungeon_height-2, 1, ' '*(self._dungeon_width-2))
-
-                _, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 23)
-                self._dungeon_display.addstr(self._dungeon_height-2, line_x, "File unable to be saved")
-
-                self._dungeon_display.refresh()
-                self.do_command()
-        elif key == 'w':
-            # Save shopping list as a recipe.
-            try:
-                filename = self.request_element("Enter name to save recipe as: ")
-                # self.save_as_recipe(filename)
-            except IsADirectoryError:
-                # User didn't enter file, so tell the user and retry.
-                self._dungeon_display.addstr(self._dungeon_height-2, 1, ' '*(self._dungeon_width-2))
-
-                _, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 23)
-                self._dungeon_display.addstr(self._dungeon_height-2, line_x, "File unable to be saved")
-
-                self._dungeon_display.refresh()
-                self.do_command()
-        elif key == 'c':
-            # Clear the shopping list.
-            # self._shopping_list.clear()
-            pass
-        elif key == 'r':
-            # Remove item.
+    def _read_keys(self):
+        """Handle every key waiting in the terminal, without blocking.
+
+        :return: null
+        """
+        while True:
             try:
-                item_name = self.request_element("Enter item to remove: ")
-                # self.remove_item(item_name)
-            except ValueError:
-                # Item wasn't in list, so tell the user and retry.
-                self._dungeon_display.addstr(self._dungeon_height-2, 1, ' '*(self._dungeon_width-2))
-
-                _, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 15)
-                self._dungeon_display.addstr(self._dungeon_height-2, line_x, "Item not found")
-
-                self._dungeon_display.refresh()
-                self.do_command()
-        elif key == 'h':
-            # Show help window
-            self.help()
-        else:
-            # Tell the user that the key was an invalid command.
-            _, line_x = util.center_start(self._dungeon_height-2, self._dungeon_width-2, 1, 18)
-            self._dungeon_display.addstr(self._dungeon_height-2, line_x, "Command not found")
-            self._dungeon_display.refresh()
-            self.do_command()
+                key = self._dungeon_display.getkey()
+            except curses.error:
+                # No key is waiting.
+                break
+            self.handle_key(key)
+
+    async def _poll_keys(self, interval=0.01):
+        """Check for keys regularly, where the event loop cannot watch the terminal itself.
+
+        :param interval: the seconds between checks (default 0.01)
+        :return: null
+        """
+        import asyncio
+        while True:
+            self._read_keys()
+            await asyncio.sleep(interval)
+
+    async def _play(self):
+        """Give the game's actors their turns, waiting whenever the player needs a key.
+
+        :return: null
+        """
+        import asyncio
+        steps = 0
+        while True:
+            game = self.game
+            if self._intro or not game.running or game.waiting:
+                self._keys_ready.clear()
+                await self._keys_ready.wait()
+                if game is not None:
+                    game.waiting = False
+                continue
+            turns = game.turns
+            game.step()
+            if self._save is not None and game.turns != turns:
+                # Only the cells and actors the turn changed are written.
+                self._save.record()
+            if game.messages and game.messages[-1] is not self._last_game_message:
+                self._last_game_message = game.messages[-1]
+                self.message(self._last_game_message)
+            self._redraw.set()
+            steps += 1
+            if steps % STEPS_PER_YIELD == 0:
+                await asyncio.sleep(0)
+
+    async def _watch(self, coroutine):
+        """Run a background task, stopping the event loop if it fails so the error is not lost.
+
+        :param coroutine: the task's coroutine
+        :return: null
+        """
+        import asyncio
+        try:
+            await coroutine
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            self._failure = error
+            self.quit()
+
+    async def run(self, frame_budget=1/30):
+        """Run the screen until the user quits, drawing at most one frame per frame budget.
+
+        Keys are handled as soon as they arrive and the game runs as a background task between
+        them, while the level manager prepares levels in its own threads. Redraws asked for
+        within one frame budget are drawn together in a single frame.
+        :param frame_budget: the fewest seconds between frames (default 1/30)
+        :return: null
+        """
+        import asyncio
+        if self.game is None and not self._intro:
+            # Without the intro there is nothing to wait for, so the game starts at once.
+            self._start_game()
+        loop = asyncio.get_running_loop()
+        self._running, self._redraw, self._keys_ready = True, asyncio.Event(), asyncio.Event()
+        tasks = [loop.create_task(self._watch(self._play()))]
+        try:
+            loop.add_reader(sys.stdin.fileno(), self._read_keys)
+            reading = True
+        except (NotImplementedError, ValueError, OSError):
+            reading = False
+            tasks.append(loop.create_task(self._watch(self._poll_keys())))
+        try:
+            # Keys pressed before the loop started are waiting already.
+            self._read_keys()
+            self._redraw.set()
+            while self._running:
+                await self._redraw.wait()
+                self._redraw.clear()
+                if not self._running:
+                    break
+                started = loop.time()
+                self.clear_screen()
+                await asyncio.sleep(max(0.0, frame_budget - (loop.time()-started)))
+        finally:
+            if reading:
+                loop.remove_reader(sys.stdin.fileno())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self._save is not None:
+                self._save.close()
+            if self.levels is not None:
+                self.levels.close()
+        if self._failure is not None:
+            raise self._failure
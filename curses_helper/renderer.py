@@ -0,0 +1,183 @@
+import curses
+from itertools import groupby
+__author__ = 'Kellan Childers'
+
+
+class DungeonRenderer:
+    """Draw a rectangle of a dungeon into a curses window, redrawing only what has changed.
+
+    The renderer listens to the dungeon and remembers one dirty span per row; render()
+    writes each span with a single addstr, or with one addstr per run of tiles sharing
+    colors when given a color cache. Row zero of the dungeon is drawn at the bottom of the
+    view, matching Graph.print_all.
+    """
+    def __init__(self, window, dungeon, screen_y=0, screen_x=0, height=None, width=None, view_x=0, view_y=0,
+                 colors=None):
+        """Create a renderer and mark its whole view as dirty.
+
+        :param window: the curses window (or pad) to draw into
+        :param dungeon: the dungeon to draw
+        :param screen_y: the window row of the top of the view (default 0)
+        :param screen_x: the window column of the left of the view (default 0)
+        :param height: the number of rows in the view (default the dungeon's height)
+        :param width: the number of columns in the view (default the dungeon's width)
+        :param view_x: the dungeon x-element shown in the leftmost column (default 0)
+        :param view_y: the dungeon y-element shown in the bottom row (default 0)
+        :param colors: a ColorPairs drawing each tile in its colors (default None, for the window's colors)
+        :return: null
+        """
+        self.window, self.dungeon, self.colors = window, dungeon, colors
+        self._screen_y, self._screen_x = screen_y, screen_x
+        self.height = dungeon.get_height() if height is None else height
+        self.width = dungeon.get_width() if width is None else width
+        self.view_x, self.view_y = view_x, view_y
+        # Maps a view row to the [first, last] dirty view column in it.
+        self._dirty = {}
+        self._dungeon_size = (dungeon.get_width(), dungeon.get_height())
+        dungeon.add_listener(self._mark)
+        self.invalidate()
+
+    def _mark(self, dungeon, x_start, y_start, x_end, y_end):
+        """Listener that marks a changed rectangle of the dungeon as dirty.
+
+        :return: null
+        """
+        size = (dungeon.get_width(), dungeon.get_height())
+        if size != self._dungeon_size:
+            # Cells that were cut off by a resize need blanking too.
+            self._dungeon_size = size
+            self.invalidate()
+        else:
+            self.mark(x_start, y_start, x_end, y_end)
+
+    def mark(self, x_start, y_start, x_end, y_end):
+        """Mark a rectangle of the dungeon as needing to be redrawn.
+
+        :param x_start: the x-element of the start point of the rectangle (bottom left)
+        :param y_start: the y-element of the start point of the rectangle (bottom left)
+        :param x_end: the x-element of the end point of the rectangle (top right)
+        :param y_end: the y-element of the end point of the rectangle (top right)
+        :return: null
+        """
+        # Convert to view coordinates and clip to the view.
+        x_start, x_end = max(x_start-self.view_x, 0), min(x_end-self.view_x, self.width-1)
+        y_start, y_end = max(y_start-self.view_y, 0), min(y_end-self.view_y, self.height-1)
+        if x_start > x_end:
+            return
+        dirty = self._dirty
+        for row in range(y_start, y_end+1):
+            span = dirty.get(row)
+            if span is None:
+                dirty[row] = [x_start, x_end]
+            else:
+                span[0], span[1] = min(span[0], x_start), max(span[1], x_end)
+
+    def invalidate(self):
+        """Mark the whole view as needing to be redrawn.
+
+        :return: null
+        """
+        self.mark(self.view_x, self.view_y, self.view_x+self.width-1, self.view_y+self.height-1)
+
+    def invalidate_screen_row(self, screen_y):
+        """Mark a window row inside the view as needing to be redrawn, such as after a message.
+
+        :param screen_y: the window row
+        :return: null
+        """
+        row = self.height-1 - (screen_y-self._screen_y)
+        if 0 <= row < self.height:
+            self._dirty[row] = [0, self.width-1]
+
+    def scroll_to(self, view_x, view_y):
+        """Move the view so a different part of the dungeon is shown, redrawing all of it.
+
+        :param view_x: the dungeon x-element shown in the leftmost column
+        :param view_y: the dungeon y-element shown in the bottom row
+        :return: null
+        """
+        if (view_x, view_y) != (self.view_x, self.view_y):
+            self.view_x, self.view_y = view_x, view_y
+            self.invalidate()
+
+    def draw_over(self, x, y, text, attribute=0):
+        """Draw text over the tile at a dungeon point, such as an actor; it stays until the point is redrawn.
+
+        :param x: the dungeon x-element
+        :param y: the dungeon y-element
+        :param text: the character to draw
+        :param attribute: the curses attribute to draw with (default 0)
+        :return: a boolean value representing whether the point is in the view
+        """
+        column, row = x - self.view_x, y - self.view_y
+        if not (0 <= column < self.width and 0 <= row < self.height):
+            return False
+        try:
+            self.window.addstr(self._screen_y + self.height-1 - row, self._screen_x + column, text, attribute)
+        except curses.error:
+            # curses.error is raised after writing the bottom right cell and can safely be ignored.
+            pass
+        return True
+
+    def is_dirty(self):
+        """Check whether anything is waiting to be drawn.
+
+        :return: a boolean value representing pending changes
+        """
+        return bool(self._dirty)
+
+    def render(self):
+        """Draw every dirty span into the window without refreshing it.
+
+        Cells of the view outside the dungeon are drawn as blanks.
+        :return: the number of spans drawn
+        """
+        dirty, self._dirty = self._dirty, {}
+        dungeon_width, dungeon_height = self.dungeon.get_width(), self.dungeon.get_height()
+        for row, (first, last) in dirty.items():
+            y, x_start, x_end = self.view_y + row, self.view_x + first, self.view_x + last
+            if 0 <= y < dungeon_height and x_end >= 0 and x_start < dungeon_width:
+                tiles = self.dungeon.get_row(y, max(x_start, 0), min(x_end, dungeon_width-1))
+            else:
+                tiles = []
+            screen_y, screen_x = self._screen_y + self.height-1 - row, self._screen_x + first
+            # Columns left of the dungeon are blank, but never more of them than the span holds.
+            blanks = min(max(-x_start, 0), last-first+1)
+            try:
+                if self.colors is None:
+                    text = ' '*blanks + ''.join([str(tile) for tile in tiles])
+                    self.window.addstr(screen_y, screen_x, text.ljust(last-first+1))
+                else:
+                    self._render_runs(screen_y, screen_x, blanks, tiles, last-first+1)
+            except curses.error:
+                # curses.error is raised after writing the bottom right cell and can safely be ignored.
+                pass
+        return len(dirty)
+
+    def _render_runs(self, screen_y, screen_x, blanks, tiles, length):
+        """Draw a span of tiles with one addstr per run of tiles sharing an attribute.
+
+        :param screen_y: the window row of the span
+        :param screen_x: the window column of the start of the span
+        :param blanks: the number of blank cells before the tiles
+        :param tiles: the tiles in the span
+        :param length: the number of cells in the span, padded with blanks after the tiles
+        :return: null
+        """
+        window, tile_attribute = self.window, self.colors.tile_attribute
+        if blanks:
+            window.addstr(screen_y, screen_x, ' '*blanks)
+        column = screen_x + blanks
+        for attribute, run in groupby(tiles, tile_attribute):
+            text = ''.join([str(tile) for tile in run])
+            window.addstr(screen_y, column, text, attribute)
+            column += len(text)
+        if column < screen_x + length:
+            window.addstr(screen_y, column, ' '*(screen_x + length - column))
+
+    def close(self):
+        """Stop listening to the dungeon.
+
+        :return: null
+        """
+        self.dungeon.remove_listener(self._mark)
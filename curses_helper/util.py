@@ -32,16 +32,20 @@ def size_lim(console_height, console_width, bound_height, bound_width):
 
 
 def color_box(window, start_y, start_x, stop_y, stop_x, color):
-    """Create a border around a window in a certain color."""
-    try:
-        for i in range(start_y, stop_y):
-            window.addstr(i, start_x, ' ', curses.color_pair(color))
-            window.addstr(i, stop_x, ' ', curses.color_pair(color))
-        for i in range(start_x, stop_x):
-            window.addstr(start_y, i, ' ', curses.color_pair(color))
-            window.addstr(stop_y, i, ' ', curses.color_pair(color))
-        # for loops fail to add last element.
-        window.addstr(stop_y, stop_x, ' ', curses.color_pair(color))
-    except curses.error:
-        # curses.error is raised at end of line and can safely be ignored.
-        pass
+    """Create a border around a window in a certain color.
+
+    Each side is drawn with a single line call instead of one call per cell.
+    :param window: the window to draw in
+    :param start_y: the row of the top of the border
+    :param start_x: the column of the left of the border
+    :param stop_y: the row of the bottom of the border
+    :param stop_x: the column of the right of the border
+    :param color: the number of the color pair to draw in
+    :return: null
+    """
+    # Lines never move the cursor, so the bottom right cell can be drawn without an error.
+    cell = ord(' ') | curses.color_pair(color)
+    window.hline(start_y, start_x, cell, stop_x-start_x+1)
+    window.hline(stop_y, start_x, cell, stop_x-start_x+1)
+    window.vline(start_y, start_x, cell, stop_y-start_y+1)
+    window.vline(start_y, stop_x, cell, stop_y-start_y+1)
@@ -1,14 +1,274 @@
-from random import randint
+import re
+from random import Random
+try:
+    import numpy
+except ImportError:
+    numpy = None
 __author__ = 'Kellan Childers'
 
+# A term of a dice expression: a count of dice such as 3d6, 4dF or d%, or a plain number.
+_TERM = re.compile(r'\s*([+-])?\s*(?:(\d*)\s*d\s*(\d+|F|%)|(\d+))\s*', re.IGNORECASE)
+
+
+class Distribution:
+    """Exact distribution of the total of a dice expression.
+
+    Outcomes are counted with integer weights, so probabilities are exact. An alias table
+    is built the first time the distribution is sampled, after which every draw takes a
+    single random number no matter how many dice the expression has.
+    """
+    def __init__(self, minimum, weights):
+        """Create a distribution over consecutive outcomes.
+
+        :param minimum: the smallest outcome
+        :param weights: the number of ways to make each outcome, starting from minimum
+        :return: null
+        """
+        self.minimum = minimum
+        self.weights = list(weights)
+        self.total = sum(self.weights)
+        self._alias = None
+
+    @classmethod
+    def dice(cls, count, sides, lowest=1):
+        """Create the distribution of the sum of several identical dice.
+
+        :param count: the number of dice
+        :param sides: the number of faces on each die
+        :param lowest: the value of the lowest face, with each face one higher than the last (default 1)
+        :return: a new Distribution
+        """
+        if count < 0 or sides < 1:
+            raise ValueError("Cannot roll {} dice with {} sides".format(count, sides))
+        weights = [1]
+        for _ in range(count):
+            # Adding a die sums a sliding window of the previous weights, using running totals.
+            running = [0]
+            for weight in weights:
+                running.append(running[-1] + weight)
+            length = len(weights) + sides - 1
+            weights = [running[min(index+1, len(weights))] - running[max(index+1-sides, 0)] for index in range(length)]
+        return cls(count*lowest, weights)
+
+    def __add__(self, other):
+        """Convolve two distributions to get the distribution of their sum.
+
+        :return: a new Distribution
+        """
+        weights = [0] * (len(self.weights) + len(other.weights) - 1)
+        for offset, weight in enumerate(self.weights):
+            if weight:
+                for index, other_weight in enumerate(other.weights):
+                    weights[offset+index] += weight * other_weight
+        return Distribution(self.minimum + other.minimum, weights)
+
+    def __neg__(self):
+        return Distribution(-(self.minimum + len(self.weights) - 1), reversed(self.weights))
+
+    def shift(self, amount):
+        """Get the distribution with a constant added to every outcome.
+
+        :param amount: the constant to add
+        :return: a new Distribution
+        """
+        return Distribution(self.minimum + amount, self.weights)
+
+    def maximum(self):
+        """Get the largest outcome.
+
+        :return: the largest outcome
+        """
+        return self.minimum + len(self.weights) - 1
+
+    def probability(self, value):
+        """Get the chance of rolling a particular total.
+
+        :param value: the total
+        :return: the probability as a float
+        """
+        index = value - self.minimum
+        return self.weights[index] / self.total if 0 <= index < len(self.weights) else 0.0
+
+    def mean(self):
+        """Get the expected total.
+
+        :return: the mean as a float
+        """
+        return self.minimum + sum(index*weight for index, weight in enumerate(self.weights)) / self.total
+
+    def _table(self):
+        """Build the alias table with Vose's method, using integers so no probability is rounded.
+
+        Column i keeps outcome i for draws below threshold[i] out of total, and gives alias[i] otherwise.
+        :return: a tuple of (thresholds, aliases)
+        """
+        if self._alias is None:
+            columns = len(self.weights)
+            thresholds = [weight * columns for weight in self.weights]
+            aliases = list(range(columns))
+            small = [index for index in range(columns) if thresholds[index] < self.total]
+            large = [index for index in range(columns) if thresholds[index] >= self.total]
+            while small and large:
+                lesser, greater = small.pop(), large.pop()
+                aliases[lesser] = greater
+                thresholds[greater] -= self.total - thresholds[lesser]
+                (small if thresholds[greater] < self.total else large).append(greater)
+            for index in small + large:
+                thresholds[index] = self.total
+            self._alias = (thresholds, aliases)
+        return self._alias
+
+    def sample(self, rng):
+        """Draw one total in constant time.
+
+        :param rng: the random.Random to draw from
+        :return: the total
+        """
+        thresholds, aliases = self._table()
+        column, draw = divmod(rng.randrange(len(thresholds) * self.total), self.total)
+        return self.minimum + (column if draw < thresholds[column] else aliases[column])
+
+    def sample_many(self, rng, times, generator=None):
+        """Draw many totals at once.
+
+        :param rng: the random.Random to draw from
+        :param times: the number of totals to draw
+        :param generator: a NumPy Generator to draw from instead, when NumPy is installed (default None)
+        :return: a list of totals, or a NumPy array of totals when a generator is given
+        """
+        thresholds, aliases = self._table()
+        if generator is not None and self.total < 2**63 and len(thresholds)*self.total < 2**63:
+            columns = generator.integers(0, len(thresholds), times)
+            draws = generator.integers(0, self.total, times)
+            chosen = numpy.where(draws < numpy.array(thresholds, dtype=numpy.int64)[columns], columns,
+                                 numpy.array(aliases, dtype=numpy.int64)[columns])
+            return chosen + self.minimum
+        span, total, minimum, randrange = len(thresholds) * self.total, self.total, self.minimum, rng.randrange
+        results = []
+        for _ in range(times):
+            column, draw = divmod(randrange(span), total)
+            results.append(minimum + (column if draw < thresholds[column] else aliases[column]))
+        return results
+
+
+def parse(expression):
+    """Get the exact distribution of a dice expression such as "3d6+2", "d20-1" or "4dF".
+
+    Distributions are computed once and cached, so parsing the same expression again is cheap.
+    :param expression: terms of dice (NdS, NdF for fate dice or Nd% for percentile dice) and
+                       numbers joined by + or -
+    :return: a Distribution
+    """
+    key = expression.replace(' ', '').lower()
+    if key in _distributions:
+        return _distributions[key]
+    result, position = Distribution(0, [1]), 0
+    while position < len(expression):
+        match = _TERM.match(expression, position)
+        if match is None or match.end() == position or (position and not match.group(1)):
+            raise ValueError("Malformed dice expression {!r}".format(expression))
+        sign, count, sides, number = match.groups()
+        if number is not None:
+            term = Distribution(int(number), [1])
+        elif sides.upper() == 'F':
+            term = _dice(int(count or 1), 3, -1)
+        else:
+            term = _dice(int(count or 1), 100 if sides == '%' else int(sides), 1)
+        result = result + (-term if sign == '-' else term)
+        position = match.end()
+    if not position:
+        raise ValueError("Empty dice expression")
+    _distributions[key] = result
+    return result
+
+
+def _dice(count, sides, lowest):
+    """Get the cached distribution of several identical dice.
+
+    :return: a Distribution
+    """
+    key = (count, sides, lowest)
+    if key not in _dice_distributions:
+        _dice_distributions[key] = Distribution.dice(count, sides, lowest)
+    return _dice_distributions[key]
+
+_distributions = {}
+_dice_distributions = {}
+
+
+class Dice:
+    """Dice roller with its own random stream, so rolls can be reproduced from a seed.
+
+    Every roll draws from an exact precomputed distribution in constant time, however many
+    dice are rolled. Batches are drawn with NumPy when it is installed; because NumPy has
+    its own generator, seeded batches differ between machines with and without it.
+    """
+    def __init__(self, seed=None):
+        """Create a dice roller.
+
+        :param seed: the seed for the roller's random stream (default None, for an unpredictable stream)
+        :return: null
+        """
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """Restart the roller's random stream.
+
+        :param seed: the seed for the random stream (default None, for an unpredictable stream)
+        :return: a reference to the roller
+        """
+        self._rng = Random(seed)
+        self._generator = None if numpy is None else numpy.random.default_rng(seed)
+        return self
+
+    def roll(self, count, dice_sides):
+        """Roll several identical dice.
+
+        :param count: the number of dice; no dice, or a negative number of them, total 0
+        :param dice_sides: the number of sides on each die
+        :return: the total
+        """
+        if count <= 0:
+            return 0
+        return _dice(count, dice_sides, 1).sample(self._rng)
+
+    def fate_roll(self):
+        """Roll five fate dice, each showing -1, 0 or 1.
+
+        :return: the total
+        """
+        return _dice(5, 3, -1).sample(self._rng)
+
+    def roll_expression(self, expression):
+        """Roll a dice expression such as "3d6+2".
+
+        :param expression: the expression to roll, as accepted by parse
+        :return: the total
+        """
+        return parse(expression).sample(self._rng)
+
+    def roll_many(self, expression, times):
+        """Roll a dice expression many times at once.
+
+        :param expression: the expression to roll, as accepted by parse
+        :param times: the number of rolls
+        :return: a list of totals, or a NumPy array of totals when NumPy is installed
+        """
+        return parse(expression).sample_many(self._rng, times, self._generator)
+
+# Roller used by the module-level functions.
+_default = Dice()
+
 
 def roll(count, dice_sides):
-    return sum([randint(1, dice_sides) for _ in range(count)])
+    return _default.roll(count, dice_sides)
 
 
 def fate_roll():
-    return sum([randint(-1, 1) for _ in range(5)])
+    return _default.fate_roll()
 
 if __name__ == "__main__":
     print("Rolling 2d6: " + str(roll(2, 6)))
-    print("Rolling 4dF: " + str(fate_roll()))
+    print("Rolling 5dF: " + str(fate_roll()))
+    print("Rolling 3d6+2 ten times: " + str(list(Dice(1).roll_many("3d6+2", 10))))
+    print("Chance of 18 on 3d6: " + str(parse("3d6").probability(18)))
@@ -1,4 +1,15 @@
-from dungeon.tiles import *
-from dungeon.dungeon import Dungeon
+from lazyimport import lazy_exports
+__author__ = 'Kellan Childers'
 
-__author__ = 'Kellan Childers'
\ No newline at end of file
+# Names exported by the package, by the module defining them; each module is imported when one of its names is used.
+_EXPORTS = {
+    'Tile': 'dungeon.tiles', 'Ground': 'dungeon.tiles', 'Wall': 'dungeon.tiles', 'TileRegistry': 'dungeon.tiles',
+    'tile_registry': 'dungeon.tiles', 'tile_legend': 'dungeon.tiles', 'GROUND': 'dungeon.tiles', 'WALL': 'dungeon.tiles',
+    'Dungeon': 'dungeon.dungeon', 'ArrayDungeon': 'dungeon.dungeon', 'ChunkedDungeon': 'dungeon.dungeon',
+    'CaveGenerator': 'dungeon.cave',
+    'BSPGenerator': 'dungeon.bsp',
+    'PathFinder': 'dungeon.pathfinding', 'DistanceMap': 'dungeon.pathfinding',
+    'FieldOfView': 'dungeon.fov',
+    'EntityLayer': 'dungeon.entities',
+}
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _EXPORTS)
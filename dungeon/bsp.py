@@ -0,0 +1,182 @@
+from array import array
+from random import Random
+from arraygraph import typecode_for
+from dungeon.dungeon import ArrayDungeon
+from dungeon.tiles import tile_registry, GROUND, WALL
+__author__ = 'Kellan Childers'
+
+
+def line_runs(x_start, y_start, x_end, y_end):
+    """Find the cells of a Bresenham line as runs along its longer axis.
+
+    :param x_start: the x-element of the start point of the line
+    :param y_start: the y-element of the start point of the line
+    :param x_end: the x-element of the end point of the line
+    :param y_end: the y-element of the end point of the line
+    :return: a list of rectangles (x_start, y_start, x_end, y_end), each one cell thick
+    """
+    steep = abs(y_end-y_start) > abs(x_end-x_start)
+    if steep:
+        x_start, y_start, x_end, y_end = y_start, x_start, y_end, x_end
+    if x_start > x_end:
+        x_start, y_start, x_end, y_end = x_end, y_end, x_start, y_start
+    dx, dy = x_end-x_start, abs(y_end-y_start)
+    step = 1 if y_end >= y_start else -1
+    # Starting from an error of dx // 2 and taking dy off it each cell, the line moves on to
+    # its next row after the cell where the error has gone below zero for the row-th time.
+    runs, run_start = [], x_start
+    for row in range(dy):
+        run_end = x_start + (dx//2 + row*dx) // dy
+        runs.append((run_start, y_start + row*step, run_end, y_start + row*step))
+        run_start = run_end+1
+    runs.append((run_start, y_end, x_end, y_end))
+    if steep:
+        return [(y, x_start, y, x_end) for x_start, y, x_end, y in runs]
+    return runs
+
+
+def _between(random, low, high):
+    """Choose an integer from low to high inclusive.
+
+    Scaling random() is several times faster than randint, which matters with a choice or more per cell
+    of a large level, and it is just as repeatable for a given seed.
+    :param random: the random stream
+    :return: the integer
+    """
+    return low + int(random.random() * (high-low+1))
+
+
+class BSPGenerator:
+    """Generator for rooms joined by corridors, placed by binary space partitioning.
+
+    The map is split in two again and again, across its longer side, until every part is
+    at most max_leaf across. Each part gets a room, and the two halves of every split are
+    joined by a corridor between a room in each, so every room can be reached. Rooms and
+    corridors are carved as whole rows and columns of tile ids, written into the level's
+    cell array one slice at a time. The same seed always produces the same level.
+    """
+    def __init__(self, width=80, height=40, min_leaf=8, max_leaf=20, min_room=3, corridors='bent', seed=None,
+                 wall=WALL, floor=GROUND):
+        """Create a BSP generator.
+
+        :param width: the width of generated levels (default 80)
+        :param height: the height of generated levels (default 40)
+        :param min_leaf: the fewest cells across a part left by a split (default 8)
+        :param max_leaf: the most cells across a part that is not split again (default 20)
+        :param min_room: the fewest cells across a room (default 3)
+        :param corridors: 'bent' for L-shaped corridors, or 'straight' for Bresenham lines (default 'bent')
+        :param seed: the seed for every random choice (default None)
+        :param wall: the tile used for walls (default wall tile)
+        :param floor: the tile used for rooms and corridors (default ground tile)
+        :return: null
+        """
+        if corridors not in ('bent', 'straight'):
+            raise ValueError("Unknown corridor style {}".format(corridors))
+        if min_room+2 > min_leaf or 2*min_leaf > max_leaf+1:
+            raise ValueError("Parts of {0} to {1} cells cannot hold rooms of {2}".format(min_leaf, max_leaf, min_room))
+        self.width, self.height = width, height
+        self.min_leaf, self.max_leaf, self.min_room = min_leaf, max_leaf, min_room
+        self.corridors = corridors
+        self.seed = seed
+        self.wall, self.floor = wall, floor
+
+    def _split(self, random):
+        """Split the map into parts.
+
+        :param random: the random stream
+        :return: a list of nodes [x_start, y_start, x_end, y_end, first_child, second_child], each
+                 parent before its children, whose children are indices into the list or None for parts
+        """
+        nodes = [[0, 0, self.width-1, self.height-1, None, None]]
+        pending = [0]
+        min_leaf, max_leaf = self.min_leaf, self.max_leaf
+        while pending:
+            node = nodes[pending.pop()]
+            x_start, y_start, x_end, y_end = node[:4]
+            width, height = x_end-x_start+1, y_end-y_start+1
+            if width <= max_leaf and height <= max_leaf:
+                continue
+            # Cut across the longer side, so parts stay close to square.
+            if width > height or (width == height and random.random() < 0.5):
+                cut = _between(random, x_start+min_leaf, x_end-min_leaf+1)
+                halves = ([x_start, y_start, cut-1, y_end], [cut, y_start, x_end, y_end])
+            else:
+                cut = _between(random, y_start+min_leaf, y_end-min_leaf+1)
+                halves = ([x_start, y_start, x_end, cut-1], [x_start, cut, x_end, y_end])
+            node[4], node[5] = len(nodes), len(nodes)+1
+            for half in halves:
+                pending.append(len(nodes))
+                nodes.append(half + [None, None])
+        return nodes
+
+    def _room(self, random, x_start, y_start, x_end, y_end):
+        """Place a room in a part, leaving at least one wall between it and the part's edge.
+
+        :return: the room as (x_start, y_start, x_end, y_end)
+        """
+        width = _between(random, self.min_room, x_end-x_start-1)
+        height = _between(random, self.min_room, y_end-y_start-1)
+        room_x = _between(random, x_start+1, x_end-width)
+        room_y = _between(random, y_start+1, y_end-height)
+        return room_x, room_y, room_x+width-1, room_y+height-1
+
+    def _corridor(self, random, start, end):
+        """Find the spans of a corridor between two points.
+
+        :return: a list of rectangles (x_start, y_start, x_end, y_end)
+        """
+        (x_start, y_start), (x_end, y_end) = start, end
+        if self.corridors == 'straight':
+            return line_runs(x_start, y_start, x_end, y_end)
+        # An L-shaped corridor turns at one of the two corners between its ends.
+        corner_x, corner_y = (x_end, y_start) if random.random() < 0.5 else (x_start, y_end)
+        return [(min(x_start, x_end), corner_y, max(x_start, x_end), corner_y),
+                (corner_x, min(y_start, y_end), corner_x, max(y_start, y_end))]
+
+    def generate(self):
+        """Generate a level.
+
+        :return: a new ArrayDungeon
+        """
+        width, height = self.width, self.height
+        random = Random(self.seed)
+        wall_id, floor_id = tile_registry.id_of(self.wall), tile_registry.id_of(self.floor)
+        typecode = typecode_for(len(tile_registry))
+        cells = array(typecode, [wall_id]) * (width*height)
+        if width < self.min_room+2 or height < self.min_room+2:
+            return ArrayDungeon(0, 0).set_cells(cells, width, height)
+        nodes = self._split(random)
+
+        # Children come after their parents, so going backwards joins the halves of every split
+        # after each half has been joined up. Each node is represented by a point in one of its rooms.
+        points, spans = [None] * len(nodes), []
+        for index in range(len(nodes)-1, -1, -1):
+            x_start, y_start, x_end, y_end, first, second = nodes[index]
+            if first is None:
+                room = self._room(random, x_start, y_start, x_end, y_end)
+                spans.append(room)
+                points[index] = (_between(random, room[0], room[2]), _between(random, room[1], room[3]))
+            else:
+                spans.extend(self._corridor(random, points[first], points[second]))
+                points[index] = points[first] if random.random() < 0.5 else points[second]
+                points[first] = points[second] = None
+
+        floor_run = array(typecode, [floor_id]) * max(width, height)
+        for x_start, y_start, x_end, y_end in spans:
+            start, length = y_start*width + x_start, x_end-x_start+1
+            if length == 1:
+                # A column is a single slice stepping a row at a time.
+                cells[start:y_end*width + x_start + 1:width] = floor_run[:y_end-y_start+1]
+            elif y_start == y_end:
+                cells[start:start+length] = floor_run[:length]
+            else:
+                run = floor_run[:length]
+                for start in range(start, y_end*width + x_start + 1, width):
+                    cells[start:start+length] = run
+        return ArrayDungeon(0, 0).set_cells(cells, width, height)
+
+if __name__ == "__main__":
+    # Short program for showing off capability of module.
+    BSPGenerator(78, 20, seed=1).generate().print_all()
+    print()
+    BSPGenerator(78, 20, corridors='straight', seed=1).generate().print_all()
@@ -0,0 +1,134 @@
+from array import array
+from random import Random
+from arraygraph import typecode_for
+from dungeon.dungeon import ArrayDungeon
+from dungeon.regions import find_regions
+from dungeon.tiles import tile_registry, GROUND, WALL
+try:
+    import numpy
+except ImportError:
+    numpy = None
+__author__ = 'Kellan Childers'
+
+
+class CaveGenerator:
+    """Generator for organic caves using a birth/survival cellular automaton.
+
+    The map starts as random noise of walls and floor. Each generation, a floor cell becomes
+    wall if its number of wall neighbors is in birth, and a wall stays wall if its number is
+    in survival; cells outside the map count as walls. Afterwards only the largest connected
+    cave is kept. The same seed always produces the same cave, with or without NumPy.
+    """
+    def __init__(self, width=80, height=40, fill=0.45, generations=5, birth=(5, 6, 7, 8),
+                 survival=(4, 5, 6, 7, 8), seed=None, wall=WALL, floor=GROUND):
+        """Create a cave generator.
+
+        :param width: the width of generated caves (default 80)
+        :param height: the height of generated caves (default 40)
+        :param fill: the chance of each cell starting as wall (default 0.45)
+        :param generations: the number of times the rule is applied (default 5)
+        :param birth: the wall-neighbor counts that turn floor into wall (default 5 to 8)
+        :param survival: the wall-neighbor counts that keep wall as wall (default 4 to 8)
+        :param seed: the seed for the random starting noise (default None)
+        :param wall: the tile used for walls (default wall tile)
+        :param floor: the tile used for floor (default ground tile)
+        :return: null
+        """
+        self.width, self.height = width, height
+        self.fill, self.generations = fill, generations
+        self.birth, self.survival = frozenset(birth), frozenset(survival)
+        self.seed = seed
+        self.wall, self.floor = wall, floor
+        # Maps 2*wall_neighbors + is_wall to the cell's next state.
+        self._rule = bytes(1 if count in (self.survival if alive else self.birth) else 0
+                           for count in range(9) for alive in (0, 1))
+
+    def _noise(self):
+        """Create the random starting grid.
+
+        :return: a bytes object of 1 for wall and 0 for floor, indexed by y*width + x
+        """
+        threshold = int(self.fill * 256)
+        noise = Random(self.seed).randbytes(self.width*self.height)
+        return noise.translate(bytes(1 if value < threshold else 0 for value in range(256)))
+
+    def _evolve(self, grid):
+        """Apply the rule to a grid for every generation, adding shifted copies of the whole grid at once.
+
+        The grid is read as one large integer holding a byte per cell, so shifting it by 8 bits
+        moves every cell one column and by 8*stride bits one row. No sum goes above 17, so bytes
+        never carry into each other, and a generation is a few integer operations and a translate.
+        :param grid: a bytes object of 1 for wall and 0 for floor, indexed by y*width + x
+        :return: the evolved grid in the same form
+        """
+        width, height = self.width, self.height
+        # Work on a copy surrounded by a ring of walls, flattened with a row stride of width+2.
+        stride, size = width+2, (width+2)*(height+2)
+        current = bytearray(b'\x01' * size)
+        for y in range(height):
+            start = (y+1)*stride + 1
+            current[start:start+width] = grid[y*width:(y+1)*width]
+        rule = self._rule.ljust(256, b'\x00')
+        ring, wall_row = b'\x01' * (height+2), b'\x01' * stride
+        for _ in range(self.generations):
+            cells = int.from_bytes(current, 'little')
+            # Sum each cell with its left and right neighbors, then add the rows above and below.
+            across = cells + (cells << 8) + (cells >> 8)
+            block = across + (across << 8*stride) + (across >> 8*stride)
+            # 2*neighbors + is_wall is 2*block - is_wall, since block also counts the cell itself.
+            codes = (block << 1) - cells
+            current = bytearray(codes.to_bytes(size+stride+1, 'little')[:size].translate(rule))
+            current[:stride] = current[-stride:] = wall_row
+            current[::stride] = current[stride-1::stride] = ring
+        return b''.join(bytes(current[(y+1)*stride + 1:(y+1)*stride + 1 + width]) for y in range(height))
+
+    def _evolve_numpy(self, grid):
+        """Apply the rule to a grid for every generation using shifted NumPy slices.
+
+        :param grid: a bytes object of 1 for wall and 0 for floor, indexed by y*width + x
+        :return: the evolved grid in the same form
+        """
+        width, height = self.width, self.height
+        current = numpy.ones((height+2, width+2), dtype=numpy.uint8)
+        current[1:-1, 1:-1] = numpy.frombuffer(grid, dtype=numpy.uint8).reshape(height, width)
+        following = current.copy()
+        rule = numpy.frombuffer(self._rule, dtype=numpy.uint8)
+        counts = numpy.empty((height, width), dtype=numpy.uint8)
+        for _ in range(self.generations):
+            counts.fill(0)
+            for dy in (0, 1, 2):
+                for dx in (0, 1, 2):
+                    if dx != 1 or dy != 1:
+                        counts += current[dy:dy+height, dx:dx+width]
+            counts *= 2
+            counts += current[1:-1, 1:-1]
+            following[1:-1, 1:-1] = rule[counts]
+            current, following = following, current
+        return current[1:-1, 1:-1].tobytes()
+
+    def generate(self):
+        """Generate a cave.
+
+        :return: a new ArrayDungeon
+        """
+        width, height = self.width, self.height
+        grid = self._noise()
+        grid = self._evolve_numpy(grid) if numpy is not None else self._evolve(grid)
+
+        # Close the edges, then keep only the largest open region.
+        grid = bytearray(grid)
+        if width and height:
+            grid[:width] = grid[-width:] = b'\x01' * width
+            grid[::width] = grid[width-1::width] = b'\x01' * height
+        regions = find_regions(grid.translate(bytes([1, 0]).ljust(256, b'\x00')), width, height)
+
+        wall_id, floor_id = tile_registry.id_of(self.wall), tile_registry.id_of(self.floor)
+        typecode = typecode_for(len(tile_registry))
+        cells = array(typecode, [wall_id]) * (width*height)
+        floor_run = array(typecode, [floor_id]) * width
+        for y, x_start, x_end in regions[0] if regions else ():
+            cells[y*width + x_start:y*width + x_end + 1] = floor_run[:x_end-x_start+1]
+        return ArrayDungeon(0, 0).set_cells(cells, width, height)
+
+if __name__ == "__main__":
+    CaveGenerator(78, 20, seed=1).generate().print_all()
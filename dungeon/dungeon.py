@@ -1,10 +1,12 @@
 from graph import Graph
+from arraygraph import ArrayGraph
+from chunkedgraph import ChunkedGraph
 from dungeon.tiles import *
 __author__ = 'Kellan Childers'
 
 
 class Dungeon(Graph):
-    def __init__(self, x=10, y=10, default=Ground()):
+    def __init__(self, x=10, y=10, default=GROUND):
         """Construct a dungeon of given width and height.
 
         :param x: the width (x-axis) for the new dungeon (default 10)
@@ -15,7 +17,34 @@ class Dungeon(Graph):
         """
         super(Dungeon, self).__init__(x, y, default)
 
-    def make_rectangle(self, x_start, y_start, x_end, y_end, line_element=Wall()):
+    def _new_palette(self):
+        """Dungeons share the tile registry, so tile ids mean the same tile in every dungeon.
+
+        :return: the tile registry
+        """
+        return tile_registry
+
+    def resize(self, x=0, y=0, default=GROUND):
+        """Change the dimensions of the dungeon.
+
+        :param x: the new width of the dungeon (default 0)
+        :param y: the new height of the dungeon (default 0)
+        :param default: the tile for any elements not in the original scope (default ground tile)
+        :type default: Tile
+        :return: a reference to the dungeon
+        """
+        return super(Dungeon, self).resize(x, y, default)
+
+    def clear(self, default=GROUND):
+        """Remove all data from the current dungeon and restore it to default.
+
+        :param default: the tile for each element in the dungeon (default ground tile)
+        :type default: Tile
+        :return: a reference to the dungeon
+        """
+        return super(Dungeon, self).clear(default)
+
+    def make_rectangle(self, x_start, y_start, x_end, y_end, line_element=WALL):
         """Add a rectangle of tiles to the dungeon.
 
         :param x_start: the x-element of the start point of the rectangle (bottom left)
@@ -26,12 +55,9 @@ class Dungeon(Graph):
         :type line_element: Tile
         :return: null
         """
-        self.make_line([(x, y_start) for x in range(x_start, x_end+1)], line_element)
-        self.make_line([(x, y_end) for x in range(x_start, x_end+1)], line_element)
-        self.make_line([(x_start, y) for y in range(y_start, y_end+1)], line_element)
-        self.make_line([(x_end, y) for y in range(y_start, y_end+1)], line_element)
+        self.outline_rect(line_element, x_start, y_start, x_end, y_end)
 
-    def make_line(self, point_list, line_element=Wall()):
+    def make_line(self, point_list, line_element=WALL):
         """Add a line of tiles along a set of points to the dungeon.
 
         :param point_list: the list of points in the form (x, y)
@@ -39,11 +65,17 @@ class Dungeon(Graph):
         :type line_element: Tile
         :return: null
         """
-        for x, y in point_list:
-            if 0 <= y < self.get_height() and 0 <= x < self.get_width():
-                self.set_elem(line_element, x, y)
-            else:
-                continue
+        self.fill_points(line_element, point_list)
+
+
+class ArrayDungeon(Dungeon, ArrayGraph):
+    """Dungeon stored as a compact array of registry tile ids instead of nested lists of tiles."""
+    pass
+
+
+class ChunkedDungeon(Dungeon, ChunkedGraph):
+    """Dungeon stored in lazily allocated chunks of registry tile ids, for large sparse worlds."""
+    pass
 
 if __name__ == "__main__":
     test_dungeon = Dungeon(80, 12)
@@ -1,8 +1,174 @@
+import curses
 from dungeon.dungeon import Dungeon
+from curses_helper.renderer import DungeonRenderer
 __author__ = 'Kellan Childers'
 
 
 class DungeonView:
-    def __init__(self, width=10, height=10):
-        self.dungeon = Dungeon(width, height)
-        # Implement view as a pad
+    """Scrolling viewport onto a dungeon of any size, backed by a curses pad.
+
+    The pad holds a region of the dungeon a few times larger than the viewport. Changes to
+    the dungeon are drawn into the pad as they happen, and scrolling within the region only
+    changes the offsets passed to the pad's refresh; the region is only redrawn when the
+    camera leaves it.
+    """
+    def __init__(self, width=10, height=10, dungeon=None, screen_y=0, screen_x=0,
+                 view_height=None, view_width=None, pad_scale=3, colors=None):
+        """Create a view and its pad.
+
+        :param width: the width of a new dungeon to view (default 10)
+        :param height: the height of a new dungeon to view (default 10)
+        :param dungeon: an existing dungeon to view instead of a new one (default None)
+        :param screen_y: the screen row of the top of the viewport (default 0)
+        :param screen_x: the screen column of the left of the viewport (default 0)
+        :param view_height: the number of rows in the viewport (default the dungeon's height)
+        :param view_width: the number of columns in the viewport (default the dungeon's width)
+        :param pad_scale: how many viewports wide and high the pad's region is (default 3)
+        :param colors: a ColorPairs drawing each tile in its colors (default None, for the pad's colors)
+        :return: null
+        """
+        self.dungeon = Dungeon(width, height) if dungeon is None else dungeon
+        self.screen_y, self.screen_x = screen_y, screen_x
+        self.view_height = self.dungeon.get_height() if view_height is None else view_height
+        self.view_width = self.dungeon.get_width() if view_width is None else view_width
+
+        # The pad is never smaller than the viewport, so refreshes always have enough to show.
+        self._pad_height = max(self.view_height, min(self.dungeon.get_height(), self.view_height*pad_scale))
+        self._pad_width = max(self.view_width, min(self.dungeon.get_width(), self.view_width*pad_scale))
+        self._pad = curses.newpad(self._pad_height, self._pad_width)
+        self._renderer = DungeonRenderer(self._pad, self.dungeon, 0, 0, self._pad_height, self._pad_width,
+                                         colors=colors)
+
+        # The camera is the dungeon point shown in the bottom left of the viewport.
+        self.camera_x, self.camera_y = 0, 0
+        # Points that entities were drawn over, which are redrawn before entities are drawn again.
+        self._entity_points = []
+
+    def get_pad(self):
+        """Get the pad the dungeon is drawn into, for setting its background or attributes.
+
+        :return: the curses pad
+        """
+        return self._pad
+
+    def _clamp(self, x, y):
+        """Keep a camera position from showing more than necessary outside the dungeon.
+
+        :param x: the desired camera x-element
+        :param y: the desired camera y-element
+        :return: the clamped (x, y)
+        """
+        x = max(0, min(x, self.dungeon.get_width()-self.view_width))
+        y = max(0, min(y, self.dungeon.get_height()-self.view_height))
+        return x, y
+
+    def scroll_to(self, x, y):
+        """Move the camera so (x, y) is shown in the bottom left of the viewport.
+
+        :param x: the dungeon x-element to show in the leftmost column
+        :param y: the dungeon y-element to show in the bottom row
+        :return: a reference to the view
+        """
+        self.camera_x, self.camera_y = self._clamp(x, y)
+        renderer = self._renderer
+        # Move the pad's region only when the viewport would leave it.
+        if not (renderer.view_x <= self.camera_x <= renderer.view_x + self._pad_width - self.view_width and
+                renderer.view_y <= self.camera_y <= renderer.view_y + self._pad_height - self.view_height):
+            region_x = self.camera_x - (self._pad_width-self.view_width) // 2
+            region_y = self.camera_y - (self._pad_height-self.view_height) // 2
+            region_x = max(0, min(region_x, self.dungeon.get_width()-self._pad_width))
+            region_y = max(0, min(region_y, self.dungeon.get_height()-self._pad_height))
+            renderer.scroll_to(region_x, region_y)
+        return self
+
+    def scroll(self, dx=0, dy=0):
+        """Move the camera by an offset.
+
+        :param dx: the number of columns to move right (default 0)
+        :param dy: the number of rows to move up (default 0)
+        :return: a reference to the view
+        """
+        return self.scroll_to(self.camera_x+dx, self.camera_y+dy)
+
+    def center_on(self, x, y):
+        """Move the camera so (x, y) is as close to the middle of the viewport as possible.
+
+        :param x: the dungeon x-element to center on
+        :param y: the dungeon y-element to center on
+        :return: a reference to the view
+        """
+        return self.scroll_to(x - self.view_width//2, y - self.view_height//2)
+
+    def follow(self, x, y, margin=4):
+        """Move the camera only as far as needed to keep (x, y) away from the viewport's edges.
+
+        :param x: the dungeon x-element to keep in view
+        :param y: the dungeon y-element to keep in view
+        :param margin: the number of cells to keep between the point and the edges (default 4)
+        :return: a reference to the view
+        """
+        margin_x, margin_y = min(margin, (self.view_width-1)//2), min(margin, (self.view_height-1)//2)
+        camera_x = min(max(self.camera_x, x + margin_x - self.view_width + 1), x - margin_x)
+        camera_y = min(max(self.camera_y, y + margin_y - self.view_height + 1), y - margin_y)
+        return self.scroll_to(camera_x, camera_y)
+
+    def touch(self):
+        """Make the next refresh copy the whole viewport again, such as after another window covered it.
+
+        :return: a reference to the view
+        """
+        self._pad.touchwin()
+        return self
+
+    def get_bounds(self):
+        """Get the rectangle of the dungeon shown in the viewport.
+
+        :return: a tuple of (x_start, y_start, x_end, y_end)
+        """
+        return (self.camera_x, self.camera_y,
+                self.camera_x + self.view_width-1, self.camera_y + self.view_height-1)
+
+    def noutrefresh(self, entities=()):
+        """Draw pending changes and any entities into the pad and copy the viewport to the virtual screen.
+
+        :param entities: actors or items to draw over the tiles, each with x, y and character attributes
+                         (default none)
+        :return: the number of spans drawn into the pad
+        """
+        renderer = self._renderer
+        for x, y in self._entity_points:
+            renderer.mark(x, y, x, y)
+        drawn = renderer.render()
+        self._entity_points = [(entity.x, entity.y) for entity in entities
+                               if renderer.draw_over(entity.x, entity.y, entity.character, curses.A_BOLD)]
+        top = self._pad_height-1 - (self.camera_y + self.view_height-1 - self._renderer.view_y)
+        left = self.camera_x - self._renderer.view_x
+        self._pad.noutrefresh(top, left, self.screen_y, self.screen_x,
+                              self.screen_y+self.view_height-1, self.screen_x+self.view_width-1)
+        return drawn
+
+    def refresh(self, entities=()):
+        """Draw pending changes and any entities and update the terminal.
+
+        :param entities: actors or items to draw over the tiles (default none)
+        :return: the number of spans drawn into the pad
+        """
+        drawn = self.noutrefresh(entities)
+        curses.doupdate()
+        return drawn
+
+    def instrument(self, recorder):
+        """Count the calls made to the view's pad in a recorder.
+
+        :param recorder: the instrument.Recorder to count into
+        :return: a reference to the view
+        """
+        self._pad = self._renderer.window = recorder.wrap_window(self._pad)
+        return self
+
+    def close(self):
+        """Stop following changes to the dungeon.
+
+        :return: null
+        """
+        self._renderer.close()
@@ -0,0 +1,210 @@
+__author__ = 'Kellan Childers'
+
+
+class EntityLayer:
+    """Monsters, items and other entities placed on a dungeon, indexed by position.
+
+    Entities are kept twice: in a dictionary of cells for lookups at a point, and in a
+    uniform spatial hash of square buckets for area queries, which only visit the buckets
+    overlapping the area. Several entities may share a cell. Entities are expected to have
+    x and y attributes, which the layer keeps up to date.
+    """
+    def __init__(self, dungeon=None, bucket_size=8):
+        """Create an empty layer.
+
+        :param dungeon: the dungeon whose bounds entities must stay within (default None, for no bounds)
+        :param bucket_size: the width and height of each spatial hash bucket (default 8)
+        :return: null
+        """
+        if bucket_size < 1:
+            raise ValueError("Buckets must be at least one cell across")
+        self.dungeon = dungeon
+        self._bucket_size = bucket_size
+        # Maps each entity to its (x, y).
+        self._positions = {}
+        # Maps (x, y) to a list of the entities there, in the order they arrived.
+        self._cells = {}
+        # Maps (bucket_x, bucket_y) to a set of the entities in that bucket.
+        self._buckets = {}
+
+    def _check(self, x, y):
+        """Raise IndexError if a point is outside the dungeon.
+
+        :return: null
+        """
+        if self.dungeon is not None and not self.dungeon.contains_point(x, y):
+            raise IndexError("Point ({}, {}) is outside the dungeon".format(x, y))
+
+    def _place(self, entity, x, y):
+        """Index an entity at a point.
+
+        :return: null
+        """
+        self._positions[entity] = (x, y)
+        self._cells.setdefault((x, y), []).append(entity)
+        size = self._bucket_size
+        self._buckets.setdefault((x // size, y // size), set()).add(entity)
+        entity.x, entity.y = x, y
+
+    def _unplace(self, entity, x, y, bucket=True):
+        """Remove an entity from the index at a point, optionally leaving its bucket alone.
+
+        :return: null
+        """
+        cell = self._cells[(x, y)]
+        cell.remove(entity)
+        if not cell:
+            del self._cells[(x, y)]
+        if bucket:
+            size = self._bucket_size
+            members = self._buckets[(x // size, y // size)]
+            members.discard(entity)
+            if not members:
+                del self._buckets[(x // size, y // size)]
+
+    def add(self, entity, x=None, y=None):
+        """Place an entity on the layer.
+
+        :param entity: the entity to add; it must be hashable and not already on the layer
+        :param x: the x-element to place it at (default the entity's x attribute)
+        :param y: the y-element to place it at (default the entity's y attribute)
+        :return: the entity
+        """
+        if entity in self._positions:
+            raise ValueError("Entity is already on the layer")
+        x = entity.x if x is None else x
+        y = entity.y if y is None else y
+        self._check(x, y)
+        self._place(entity, x, y)
+        return entity
+
+    def remove(self, entity):
+        """Take an entity off the layer.
+
+        :param entity: the entity to remove
+        :return: the entity
+        """
+        x, y = self._positions.pop(entity)
+        self._unplace(entity, x, y)
+        return entity
+
+    def move(self, entity, x, y):
+        """Move an entity to another point, touching its bucket only if it crosses into another one.
+
+        :param entity: the entity to move
+        :param x: the new x-element
+        :param y: the new y-element
+        :return: the entity
+        """
+        self._check(x, y)
+        old_x, old_y = self._positions[entity]
+        size = self._bucket_size
+        same_bucket = (old_x // size, old_y // size) == (x // size, y // size)
+        self._unplace(entity, old_x, old_y, not same_bucket)
+        self._positions[entity] = (x, y)
+        self._cells.setdefault((x, y), []).append(entity)
+        if not same_bucket:
+            self._buckets.setdefault((x // size, y // size), set()).add(entity)
+        entity.x, entity.y = x, y
+        return entity
+
+    def position(self, entity):
+        """Get where an entity is.
+
+        :param entity: the entity to find
+        :return: its point in the form (x, y)
+        """
+        return self._positions[entity]
+
+    def at(self, x, y):
+        """Get every entity at a point.
+
+        :param x: the x-element of the point
+        :param y: the y-element of the point
+        :return: a list of entities, in the order they arrived
+        """
+        return list(self._cells.get((x, y), ()))
+
+    def first_at(self, x, y):
+        """Get the entity that arrived first at a point.
+
+        :param x: the x-element of the point
+        :param y: the y-element of the point
+        :return: the entity, or None if the point is empty
+        """
+        cell = self._cells.get((x, y))
+        return cell[0] if cell else None
+
+    def is_occupied(self, x, y):
+        """Check whether any entity is at a point.
+
+        :return: a boolean value representing occupancy
+        """
+        return (x, y) in self._cells
+
+    def in_rect(self, x_start, y_start, x_end, y_end):
+        """Find every entity inside a rectangle, including its edges.
+
+        :param x_start: the x-element of the start point of the rectangle (bottom left)
+        :param y_start: the y-element of the start point of the rectangle (bottom left)
+        :param x_end: the x-element of the end point of the rectangle (top right)
+        :param y_end: the y-element of the end point of the rectangle (top right)
+        :return: a list of entities
+        """
+        size, positions, found = self._bucket_size, self._positions, []
+        bucket_columns = range(x_start // size, x_end // size + 1)
+        bucket_rows = range(y_start // size, y_end // size + 1)
+        if len(bucket_columns) * len(bucket_rows) > len(self._buckets):
+            # Areas larger than the occupied part of the layer are quicker to check bucket by bucket.
+            buckets = [members for (bucket_x, bucket_y), members in self._buckets.items()
+                       if bucket_x in bucket_columns and bucket_y in bucket_rows]
+        else:
+            buckets = [self._buckets[key] for key in ((bucket_x, bucket_y) for bucket_y in bucket_rows
+                                                      for bucket_x in bucket_columns) if key in self._buckets]
+        for members in buckets:
+            for entity in members:
+                x, y = positions[entity]
+                if x_start <= x <= x_end and y_start <= y <= y_end:
+                    found.append(entity)
+        return found
+
+    def in_radius(self, x, y, radius):
+        """Find every entity within a distance of a point.
+
+        :param x: the x-element of the center
+        :param y: the y-element of the center
+        :param radius: the greatest straight-line distance
+        :return: a list of entities
+        """
+        radius_squared, positions = radius*radius, self._positions
+        found = []
+        for entity in self.in_rect(x-radius, y-radius, x+radius, y+radius):
+            entity_x, entity_y = positions[entity]
+            if (entity_x-x)**2 + (entity_y-y)**2 <= radius_squared:
+                found.append(entity)
+        return found
+
+    def __contains__(self, entity):
+        return entity in self._positions
+
+    def __iter__(self):
+        return iter(list(self._positions))
+
+    def __len__(self):
+        return len(self._positions)
+
+if __name__ == "__main__":
+    from random import Random
+    from dungeon.dungeon import ArrayDungeon
+    # Short program for showing off capability of module.
+    class Marker:
+        def __init__(self, name):
+            self.name, self.x, self.y = name, 0, 0
+
+    random = Random(0)
+    demo = EntityLayer(ArrayDungeon(200, 200))
+    markers = [demo.add(Marker(index), random.randrange(200), random.randrange(200)) for index in range(5000)]
+    demo.move(markers[0], 100, 100)
+    print(len(demo), "entities;", len(demo.in_radius(100, 100, 10)), "within 10 of (100, 100);",
+          len(demo.in_rect(0, 0, 49, 49)), "in the bottom left corner")
+    print("At (100, 100):", [marker.name for marker in demo.at(100, 100)])
@@ -0,0 +1,227 @@
+from chunkedgraph import ChunkedGraph
+__author__ = 'Kellan Childers'
+
+# Multipliers (xx, xy, yx, yy) that turn the first octant into each of the eight octants.
+_OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+            (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+
+
+def is_opaque(tile):
+    """Check whether a tile blocks sight; values that are not tiles block it too.
+
+    :param tile: the value of a dungeon cell
+    :return: a boolean value representing opacity
+    """
+    return not getattr(tile, 'transparent', False)
+
+
+def shadowcast(opaque, width, height, x, y, radius):
+    """Find every point visible from a point with recursive shadowcasting.
+
+    :param opaque: a bytes-like object of 1 for cells that block sight, indexed by y*width + x
+    :param width: the width of the map
+    :param height: the height of the map
+    :param x: the x-element of the viewer
+    :param y: the y-element of the viewer
+    :param radius: the greatest distance that can be seen
+    :return: a set of visible points in the form (x, y), including the viewer's
+    """
+    visible = {(x, y)}
+    for octant in _OCTANTS:
+        _cast(opaque, width, height, x, y, radius, 1, 1.0, 0.0, octant, visible)
+    return visible
+
+
+def _cast(opaque, width, height, x, y, radius, row, start, end, octant, visible):
+    """Scan one octant row by row from row, between the slopes start and end, recursing past each obstacle.
+
+    :return: null
+    """
+    if start < end:
+        return
+    xx, xy, yx, yy = octant
+    radius_squared = radius*radius + radius
+    new_start = start
+    for distance in range(row, radius+1):
+        dy = -distance
+        blocked = False
+        for dx in range(-distance, 1):
+            # The slopes to the left and right edges of the cell.
+            left, right = (dx-0.5) / (dy+0.5), (dx+0.5) / (dy-0.5)
+            if start < right:
+                continue
+            elif end > left:
+                break
+            cell_x, cell_y = x + dx*xx + dy*xy, y + dx*yx + dy*yy
+            inside = 0 <= cell_x < width and 0 <= cell_y < height
+            if inside and dx*dx + dy*dy <= radius_squared:
+                visible.add((cell_x, cell_y))
+            # Cells outside the map block sight like walls.
+            blocking = not inside or opaque[cell_y*width + cell_x]
+            if blocked:
+                if blocking:
+                    new_start = right
+                else:
+                    blocked = False
+                    start = new_start
+            elif blocking and distance < radius:
+                blocked = True
+                _cast(opaque, width, height, x, y, radius, distance+1, start, left, octant, visible)
+                new_start = right
+        if blocked:
+            break
+
+
+class FieldOfView:
+    """What a viewer can currently see of a dungeon, and what they remember of it.
+
+    The field of view listens to the dungeon and keeps its own bitmap of opaque cells.
+    Visibility is only recomputed when the viewer moves or an opaque cell in range
+    changes, and each computation reports just the cells that came into or went out of
+    sight, so only those need to be redrawn. Everything seen is copied into a sparse
+    memory graph, which holds None for cells that have never been seen.
+    """
+    def __init__(self, dungeon, radius=8, memory=None):
+        """Create a field of view for a dungeon.
+
+        :param dungeon: the dungeon being viewed
+        :param radius: the greatest distance the viewer can see (default 8)
+        :param memory: a graph of previously remembered tiles to keep adding to (default None)
+        :return: null
+        """
+        self.dungeon = dungeon
+        self.radius = radius
+        self._memory = memory
+        self._viewer = None
+        self._visible = set()
+        self._rebuild()
+        dungeon.add_listener(self._update)
+
+    def _rebuild(self):
+        """Recompute the whole opacity bitmap and fit the memory to the dungeon.
+
+        :return: null
+        """
+        width, height = self.dungeon.get_width(), self.dungeon.get_height()
+        self._size = (width, height)
+        self._opaque = bytearray(self.dungeon.mask(is_opaque))
+        if self._memory is None:
+            self._memory = ChunkedGraph(width, height)
+        elif (self._memory.get_width(), self._memory.get_height()) != self._size:
+            self._memory.resize(width, height)
+        self._stale = True
+
+    def _update(self, dungeon, x_start, y_start, x_end, y_end):
+        """Listener that refreshes the bitmap and the memory of visible cells in a changed rectangle.
+
+        :return: null
+        """
+        if (dungeon.get_width(), dungeon.get_height()) != self._size:
+            self._rebuild()
+            # Cells cut off by a resize can no longer be seen, even before the next computation.
+            width, height = self._size
+            self._visible = {(x, y) for x, y in self._visible if x < width and y < height}
+            return
+        width = self._size[0]
+        for y in range(y_start, y_end+1):
+            start = y*width + x_start
+            row = bytes(map(is_opaque, dungeon.get_row(y, x_start, x_end)))
+            if self._opaque[start:start+len(row)] != row:
+                self._opaque[start:start+len(row)] = row
+                if self._viewer is not None and self._in_range(x_start, y_start, x_end, y_end):
+                    self._stale = True
+        # Cells in sight are remembered as they change, without waiting for the next computation.
+        if (x_end-x_start+1) * (y_end-y_start+1) < len(self._visible):
+            changed = [(x, y) for y in range(y_start, y_end+1) for x in range(x_start, x_end+1)
+                       if (x, y) in self._visible]
+        else:
+            changed = [(x, y) for x, y in self._visible if x_start <= x <= x_end and y_start <= y <= y_end]
+        self._remember(changed)
+
+    def _in_range(self, x_start, y_start, x_end, y_end):
+        """Check whether a rectangle overlaps the square of cells the viewer could see.
+
+        :return: a boolean value representing the overlap
+        """
+        x, y, radius = self._viewer[0], self._viewer[1], self._viewer[2]
+        return x-radius <= x_end and x_start <= x+radius and y-radius <= y_end and y_start <= y+radius
+
+    def _remember(self, point_list):
+        """Copy the current tiles at a list of points into the memory.
+
+        :return: null
+        """
+        tiles = {}
+        for x, y in point_list:
+            tiles.setdefault(self.dungeon.get_elem(x, y), []).append((x, y))
+        for tile, points in tiles.items():
+            self._memory.fill_points(tile, points)
+
+    def compute(self, x, y):
+        """Update what can be seen from a point.
+
+        :param x: the x-element of the viewer
+        :param y: the y-element of the viewer
+        :return: a tuple of (newly visible, newly hidden) sets of points in the form (x, y)
+        """
+        if not self.dungeon.contains_point(x, y):
+            raise IndexError("Viewer ({}, {}) is outside the dungeon".format(x, y))
+        viewer = (x, y, self.radius)
+        if viewer == self._viewer and not self._stale:
+            return set(), set()
+        visible = shadowcast(self._opaque, self._size[0], self._size[1], x, y, self.radius)
+        appeared, hidden = visible - self._visible, self._visible - visible
+        self._viewer, self._visible, self._stale = viewer, visible, False
+        self._remember(appeared)
+        return appeared, hidden
+
+    def is_visible(self, x=0, y=0):
+        """Check whether a point was visible at the last computation.
+
+        :param x: the x-element of the point (default 0)
+        :param y: the y-element of the point (default 0)
+        :return: a boolean value representing visibility
+        """
+        return (x, y) in self._visible
+
+    def get_visible(self):
+        """Get every point visible at the last computation.
+
+        :return: a set of points in the form (x, y)
+        """
+        return set(self._visible)
+
+    def get_memory(self):
+        """Get the graph of remembered tiles, which can be drawn like a dungeon.
+
+        :return: a graph holding the last tile seen at each point, or None where nothing was seen
+        """
+        return self._memory
+
+    def is_remembered(self, x=0, y=0):
+        """Check whether a point has ever been seen.
+
+        :param x: the x-element of the point (default 0)
+        :param y: the y-element of the point (default 0)
+        :return: a boolean value representing whether the point is remembered
+        """
+        return self._memory.get_elem(x, y) is not None
+
+    def close(self):
+        """Stop listening to the dungeon.
+
+        :return: null
+        """
+        self.dungeon.remove_listener(self._update)
+
+if __name__ == "__main__":
+    from dungeon.dungeon import ArrayDungeon
+    # Short program for showing off capability of module.
+    demo = ArrayDungeon(40, 15)
+    demo.make_rectangle(0, 0, 39, 14)
+    demo.make_rectangle(15, 5, 18, 8)
+    view = FieldOfView(demo, radius=12)
+    view.compute(8, 7)
+    for row in range(demo.get_height()-1, -1, -1):
+        print(''.join(str(demo.get_elem(column, row)) if view.is_visible(column, row) else ' '
+                      for column in range(demo.get_width())))
@@ -0,0 +1,346 @@
+from array import array
+from heapq import heappop, heappush
+from graph import neighbor_offsets
+__author__ = 'Kellan Childers'
+
+# Distance of cells that cannot be reached from any source.
+UNREACHABLE = 0xFFFFFFFF
+
+
+def is_passable(tile):
+    """Check whether creatures can walk onto a tile; values that are not tiles block movement.
+
+    :param tile: the value of a dungeon cell
+    :return: a boolean value representing passability
+    """
+    return bool(getattr(tile, 'passable', False))
+
+
+def passability(dungeon):
+    """Mark every passable cell of a dungeon.
+
+    :param dungeon: the dungeon to check
+    :return: a bytes object of 0 or 1 per cell, indexed by y*width + x
+    """
+    return dungeon.mask(is_passable)
+
+
+def _overlaps(box, x_start, y_start, x_end, y_end):
+    """Check whether a rectangle overlaps a bounding box in the form (x_start, y_start, x_end, y_end).
+
+    :return: a boolean value representing the overlap
+    """
+    return box[0] <= x_end and x_start <= box[2] and box[1] <= y_end and y_start <= box[3]
+
+
+class DistanceMap:
+    """Distance from every cell of a dungeon to the nearest of a set of sources.
+
+    A single map answers for every creature heading toward the same sources: each one
+    only has to step to whichever neighbor is closest. Distances are only stored for a
+    window of the dungeon holding every reachable cell, so a map limited to a short
+    distance stays small however large the dungeon is.
+    """
+    def __init__(self, distances, width, height, connectivity=8, window=None):
+        """Wrap distances computed by PathFinder.distance_map.
+
+        :param distances: an array of distances over the window with a ring of unreachable cells two deep,
+                          indexed by (y-y_start+2)*(window width+4) + x-x_start+2
+        :param width: the width of the dungeon
+        :param height: the height of the dungeon
+        :param connectivity: 4 for moves sharing an edge, 8 to include diagonals (default 8)
+        :param window: the rectangle (x_start, y_start, x_end, y_end) outside which every cell is unreachable
+                       (default the whole dungeon)
+        :return: null
+        """
+        self._distances = distances
+        self._width, self._height = width, height
+        self._window = (0, 0, width-1, height-1) if window is None else window
+        self._stride = self._window[2]-self._window[0]+5
+        self._offsets = tuple((dx, dy, dy*self._stride + dx) for dx, dy in neighbor_offsets(connectivity))
+
+    def _index(self, x, y, reach):
+        """Find the index of a point in the distances, if it is within reach of the window.
+
+        :return: the index, or None if the point is further than reach from the window
+        """
+        x_start, y_start, x_end, y_end = self._window
+        if not (x_start-reach <= x <= x_end+reach and y_start-reach <= y <= y_end+reach):
+            return None
+        return (y-y_start+2)*self._stride + x-x_start+2
+
+    def get_distance(self, x=0, y=0):
+        """Get the number of moves from a point to the nearest source.
+
+        :param x: the x-element of the point (default 0)
+        :param y: the y-element of the point (default 0)
+        :return: the number of moves, or None if no source can be reached
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise IndexError("Point ({}, {}) is outside the dungeon".format(x, y))
+        index = self._index(x, y, 0)
+        distance = UNREACHABLE if index is None else self._distances[index]
+        return None if distance == UNREACHABLE else distance
+
+    def step_from(self, x=0, y=0):
+        """Find the neighbor of a point that is closest to a source.
+
+        :param x: the x-element of the point (default 0)
+        :param y: the y-element of the point (default 0)
+        :return: the neighbor in the form (x, y), or None if no neighbor is any closer
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise IndexError("Point ({}, {}) is outside the dungeon".format(x, y))
+        # Points in the ring can step into the window; points beyond it have no neighbor any closer.
+        distances, index = self._distances, self._index(x, y, 1)
+        if index is None:
+            return None
+        best, step = distances[index], None
+        for dx, dy, offset in self._offsets:
+            if distances[index+offset] < best:
+                best, step = distances[index+offset], (x+dx, y+dy)
+        return step
+
+
+class PathFinder:
+    """A* paths and Dijkstra distance maps over the passable cells of a dungeon.
+
+    The finder listens to the dungeon and keeps its own bitmap of passable cells. Results
+    are cached along with the area their search explored, and a change to the dungeon only
+    discards the results whose area it touches, and only if it changes passability.
+    """
+    def __init__(self, dungeon, connectivity=8, cache_size=256, map_cache_size=32):
+        """Create a path finder for a dungeon.
+
+        :param dungeon: the dungeon to find paths in
+        :param connectivity: 4 for moves sharing an edge, 8 to include diagonals (default 8)
+        :param cache_size: the number of paths to remember (default 256)
+        :param map_cache_size: the number of distance maps to remember (default 32)
+        :return: null
+        """
+        self.dungeon = dungeon
+        self.connectivity = connectivity
+        # A distance map holds a distance for every cell of the dungeon, and one that follows a
+        # moving source is replaced every move, so far fewer of them are kept than paths.
+        self.cache_size, self.map_cache_size = cache_size, map_cache_size
+        neighbor_offsets(connectivity)
+        self._paths, self._maps = {}, {}
+        self._rebuild()
+        dungeon.add_listener(self._update)
+
+    def _rebuild(self):
+        """Recompute the whole passability bitmap and forget every cached result.
+
+        :return: null
+        """
+        width, height = self.dungeon.get_width(), self.dungeon.get_height()
+        self._size = (width, height)
+        self._stride = width+2
+        self._offsets = tuple(dy*self._stride + dx for dx, dy in neighbor_offsets(self.connectivity))
+        # The bitmap has a ring of blocked cells around it, so searches never need bounds checks.
+        self._passable = bytearray(self._stride*(height+2))
+        mask = passability(self.dungeon)
+        for y in range(height):
+            start = (y+1)*self._stride + 1
+            self._passable[start:start+width] = mask[y*width:(y+1)*width]
+        self._paths.clear()
+        self._maps.clear()
+
+    def _update(self, dungeon, x_start, y_start, x_end, y_end):
+        """Listener that refreshes the bitmap for a changed rectangle and drops results it affects.
+
+        :return: null
+        """
+        if (dungeon.get_width(), dungeon.get_height()) != self._size:
+            self._rebuild()
+            return
+        changed = False
+        for y in range(y_start, y_end+1):
+            start = (y+1)*self._stride + x_start+1
+            row = bytes(map(is_passable, dungeon.get_row(y, x_start, x_end)))
+            if self._passable[start:start+len(row)] != row:
+                self._passable[start:start+len(row)] = row
+                changed = True
+        if changed:
+            for cache in (self._paths, self._maps):
+                for key in [key for key, (_, box) in cache.items() if _overlaps(box, x_start, y_start, x_end, y_end)]:
+                    del cache[key]
+
+    def _remember(self, cache, size, key, result, box):
+        """Cache a result along with the area that can affect it, forgetting the oldest results if full.
+
+        :param cache: the cache of paths or of distance maps
+        :param size: the most results the cache holds
+        :return: the result
+        """
+        while cache and len(cache) >= size:
+            del cache[next(iter(cache))]
+        if size < 1:
+            return result
+        # Cells next to the explored area could open up shorter routes, so they count too.
+        cache[key] = (result, (box[0]-1, box[1]-1, box[2]+1, box[3]+1))
+        return result
+
+    def _box(self, indices, stride, x_start, y_start):
+        """Find the bounding box of a collection of bitmap indices in dungeon coordinates.
+
+        :param indices: the indices
+        :param stride: the row stride of the bitmap
+        :param x_start: the dungeon x-element of the bitmap's first column
+        :param y_start: the dungeon y-element of the bitmap's first row
+        :return: a tuple of (x_start, y_start, x_end, y_end)
+        """
+        columns = [index % stride for index in indices]
+        return (min(columns)+x_start, min(indices)//stride + y_start,
+                max(columns)+x_start, max(indices)//stride + y_start)
+
+    def is_passable(self, x=0, y=0):
+        """Check whether creatures can walk onto a point.
+
+        :param x: the x-element of the point (default 0)
+        :param y: the y-element of the point (default 0)
+        :return: a boolean value representing passability, False outside the dungeon
+        """
+        if not (0 <= x < self._size[0] and 0 <= y < self._size[1]):
+            return False
+        return bool(self._passable[(y+1)*self._stride + x+1])
+
+    def find_path(self, start, goal):
+        """Find a shortest path between two points with A*.
+
+        :param start: the point to start from in the form (x, y); it does not need to be passable
+        :param goal: the point to reach in the form (x, y)
+        :return: a list of points to step through, ending with goal and not including start,
+                 or None if goal cannot be reached
+        """
+        (start_x, start_y), (goal_x, goal_y) = start, goal
+        width, height = self._size
+        if not (0 <= start_x < width and 0 <= start_y < height and 0 <= goal_x < width and 0 <= goal_y < height):
+            raise IndexError("Path from {} to {} leaves the dungeon".format(start, goal))
+        key = (start_x, start_y, goal_x, goal_y)
+        if key in self._paths:
+            path = self._paths[key][0]
+            return None if path is None else list(path)
+
+        stride, passable, offsets = self._stride, self._passable, self._offsets
+        source, target = (start_y+1)*stride + start_x+1, (goal_y+1)*stride + goal_x+1
+        if not passable[target] and source != target:
+            return self._remember(self._paths, self.cache_size, key, None, (goal_x, goal_y, goal_x, goal_y))
+
+        diagonal = self.connectivity == 8
+        target_y, target_x = divmod(target, stride)
+        cost, came_from = {source: 0}, {source: None}
+        open_set = [(0, 0, source)]
+        while open_set:
+            _, distance, index = heappop(open_set)
+            if index == target:
+                break
+            # Entries hold negated distances so that ties go to the cell furthest along.
+            distance = -distance
+            if distance > cost[index]:
+                continue
+            distance += 1
+            for offset in offsets:
+                neighbor = index+offset
+                if passable[neighbor] and distance < cost.get(neighbor, UNREACHABLE):
+                    cost[neighbor], came_from[neighbor] = distance, index
+                    y, x = divmod(neighbor, stride)
+                    # Chebyshev distance when diagonal moves are allowed, Manhattan distance otherwise.
+                    remaining = max(abs(x-target_x), abs(y-target_y)) if diagonal else abs(x-target_x) + abs(y-target_y)
+                    heappush(open_set, (distance+remaining, -distance, neighbor))
+
+        path = None
+        if target in came_from:
+            path, index = [], target
+            while index != source:
+                y, x = divmod(index, stride)
+                path.append((x-1, y-1))
+                index = came_from[index]
+            path.reverse()
+        self._remember(self._paths, self.cache_size, key, path, self._box(came_from, self._stride, -1, -1))
+        return None if path is None else list(path)
+
+    def distance_map(self, sources, limit=None):
+        """Compute the distance from every cell to the nearest source with multi-source Dijkstra.
+
+        Every move costs the same, so cells are settled in breadth-first order.
+        :param sources: a list of points in the form (x, y)
+        :param limit: the greatest distance to explore; cells further away are unreachable (default None)
+        :return: a DistanceMap
+        """
+        key = (frozenset(sources), limit)
+        if key in self._maps:
+            return self._maps[key][0]
+
+        width, height = self._size
+        for x, y in key[0]:
+            if not (0 <= x < width and 0 <= y < height):
+                raise IndexError("Source ({}, {}) is outside the dungeon".format(x, y))
+        # No cell within limit moves of a source is further than limit from it along either axis,
+        # so the search only needs a window around the sources.
+        x_start, y_start, x_end, y_end = (0, 0, width-1, height-1) if limit is None or not key[0] else \
+            self._search_window([x for x, _ in key[0]], [y for _, y in key[0]], limit)
+        # The window gets its own copy of the bitmap with a ring of blocked cells two deep,
+        # so neighbors of the ring can be read without bounds checks too.
+        stride = x_end-x_start+5
+        passable = bytearray(stride*(y_end-y_start+5))
+        for y in range(y_start, y_end+1):
+            start, source = (y-y_start+2)*stride + 2, (y+1)*self._stride + x_start+1
+            passable[start:start+x_end-x_start+1] = self._passable[source:source+x_end-x_start+1]
+        offsets = tuple(dy*stride + dx for dx, dy in neighbor_offsets(self.connectivity))
+        distances = array('I', [UNREACHABLE]) * len(passable)
+
+        frontier = []
+        for x, y in key[0]:
+            distances[(y-y_start+2)*stride + x-x_start+2] = 0
+            frontier.append((y-y_start+2)*stride + x-x_start+2)
+        reached, distance = list(frontier), 0
+        while frontier and (limit is None or distance < limit):
+            distance += 1
+            following = []
+            for index in frontier:
+                for offset in offsets:
+                    neighbor = index+offset
+                    if passable[neighbor] and distances[neighbor] == UNREACHABLE:
+                        distances[neighbor] = distance
+                        following.append(neighbor)
+            reached += following
+            frontier = following
+
+        distance_map = DistanceMap(distances, width, height, self.connectivity, (x_start, y_start, x_end, y_end))
+        if not reached:
+            return distance_map
+        return self._remember(self._maps, self.map_cache_size, key, distance_map,
+                              self._box(reached, stride, x_start-2, y_start-2))
+
+    def _search_window(self, columns, rows, limit):
+        """Find the part of the dungeon within limit of a set of points along both axes.
+
+        :param columns: the x-elements of the points
+        :param rows: the y-elements of the points
+        :param limit: the distance around the points
+        :return: a tuple of (x_start, y_start, x_end, y_end)
+        """
+        width, height = self._size
+        return (max(min(columns)-limit, 0), max(min(rows)-limit, 0),
+                min(max(columns)+limit, width-1), min(max(rows)+limit, height-1))
+
+    def close(self):
+        """Stop listening to the dungeon.
+
+        :return: null
+        """
+        self.dungeon.remove_listener(self._update)
+
+if __name__ == "__main__":
+    from dungeon.dungeon import ArrayDungeon
+    from dungeon.tiles import Ground
+    # Short program for showing off capability of module.
+    demo = ArrayDungeon(30, 10)
+    demo.make_rectangle(0, 0, 29, 9)
+    demo.make_line([(10, y) for y in range(0, 8)])
+    finder = PathFinder(demo)
+    route = finder.find_path((3, 3), (25, 3))
+    demo.make_line(route, Ground('*'))
+    demo.print_all()
+    print(finder.distance_map([(25, 3)]).get_distance(3, 3), len(route))
@@ -0,0 +1,63 @@
+import re
+__author__ = 'Kellan Childers'
+
+# A run of open cells within one row of a mask.
+_RUN = re.compile(b'\x01+')
+
+
+def find_regions(mask, width, height, connectivity=4):
+    """Group the open cells of a mask into connected regions.
+
+    Cells are handled a run at a time: each row is split into runs of open cells, and runs
+    that touch a run in the row below are merged, so the cost grows with the number of runs
+    rather than the number of cells.
+    :param mask: a bytes-like object of 1 for open cells and 0 otherwise, indexed by y*width + x
+    :param width: the width of the masked graph
+    :param height: the height of the masked graph
+    :param connectivity: 4 to join cells sharing an edge, 8 to also join corners (default 4)
+    :return: a list of regions, largest first, each a list of runs in the form (y, x_start, x_end)
+    """
+    if connectivity not in (4, 8):
+        raise ValueError("Connectivity must be 4 or 8, not {}".format(connectivity))
+    reach = 0 if connectivity == 4 else 1
+    runs, parent = [], []
+
+    def root(run):
+        while parent[run] != run:
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        return run
+
+    below = []
+    for y in range(height):
+        row = bytes(mask[y*width:(y+1)*width])
+        current = []
+        first = 0
+        for match in _RUN.finditer(row):
+            start, end = match.start(), match.end()-1
+            run = len(runs)
+            runs.append((y, start, end))
+            parent.append(run)
+            # Runs in the row below that end too early cannot touch this run or any later one.
+            while first < len(below) and runs[below[first]][2] < start-reach:
+                first += 1
+            touching = first
+            while touching < len(below) and runs[below[touching]][1] <= end+reach:
+                parent[root(below[touching])] = root(run)
+                touching += 1
+            current.append(run)
+        below = current
+
+    regions = {}
+    for run in range(len(runs)):
+        regions.setdefault(root(run), []).append(runs[run])
+    return sorted(regions.values(), key=region_size, reverse=True)
+
+
+def region_size(region):
+    """Count the cells in a region.
+
+    :param region: a list of runs in the form (y, x_start, x_end)
+    :return: the number of cells
+    """
+    return sum(x_end-x_start+1 for _, x_start, x_end in region)
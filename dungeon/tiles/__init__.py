@@ -1,5 +1,6 @@
 from dungeon.tiles.tile import Tile
 from dungeon.tiles.ground import Ground
 from dungeon.tiles.wall import Wall
+from dungeon.tiles.registry import TileRegistry, tile_registry, tile_legend, GROUND, WALL
 
 __author__ = 'Kellan Childers'
@@ -3,6 +3,8 @@ __author__ = 'Kellan Childers'
 
 
 class Ground(Tile):
+    __slots__ = ()
+
     def __init__(self, character='.', char_color="white", back_color="black"):
         super(Ground, self).__init__(character, char_color, back_color)
 
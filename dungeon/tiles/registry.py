@@ -0,0 +1,102 @@
+from graph import Palette
+from dungeon.tiles.tile import Tile
+from dungeon.tiles.ground import Ground
+from dungeon.tiles.wall import Wall
+__author__ = 'Kellan Childers'
+
+
+class TileRegistry(Palette):
+    """Palette of interned tile flyweights, each identified by a small integer id."""
+    def index(self, tile):
+        """Get the id of a tile, registering it if it is new.
+
+        Dungeons store their cells as ids in this registry, so every new value is checked here.
+        :param tile: the tile to look up
+        :type tile: Tile
+        :return: the integer id of the tile
+        """
+        try:
+            return self._ids[tile]
+        except KeyError:
+            if not isinstance(tile, Tile):
+                raise TypeError("Only tiles can be registered, not {}".format(type(tile).__name__))
+            return super(TileRegistry, self).index(tile)
+
+    def intern(self, tile):
+        """Get the shared instance of a tile, registering it if it is new.
+
+        :param tile: the tile to intern
+        :type tile: Tile
+        :return: the registered tile equal to tile
+        """
+        return self[self.index(tile)]
+
+    def id_of(self, tile):
+        """Get the id of a tile, registering it if it is new.
+
+        :param tile: the tile to look up
+        :type tile: Tile
+        :return: the integer id of the tile
+        """
+        return self.index(self.intern(tile))
+
+    def encode(self, tile):
+        """Convert a tile into a json-compatible list so the registry can be saved.
+
+        :param tile: a tile in the registry
+        :type tile: Tile
+        :return: a list of the tile's type name, character, and colors
+        """
+        return [type(tile).__name__, tile.character, tile.char_color, tile.back_color]
+
+    def decode(self, data):
+        """Convert the saved form of a tile back into an interned tile.
+
+        :param data: a list created by encode
+        :return: the registered tile
+        """
+        type_name, character, char_color, back_color = data
+        return self.intern(tile_type(type_name)(character, char_color, back_color))
+
+
+def tile_type(type_name):
+    """Find a tile class by name among Tile and all of its subclasses.
+
+    :param type_name: the name of the class
+    :return: the tile class
+    """
+    pending = [Tile]
+    while pending:
+        cls = pending.pop()
+        if cls.__name__ == type_name:
+            return cls
+        pending.extend(cls.__subclasses__())
+    raise ValueError("Unknown tile type {}".format(type_name))
+
+def tile_legend(registry=None):
+    """Map the character of every tile class, and every registered tile, to its tile for reading text maps.
+
+    Each tile class is represented by its default tile; registered tiles are added after, so a
+    registered tile replaces the default one drawn with the same character.
+    :param registry: the registry to intern tiles in and take registered tiles from (default tile_registry)
+    :return: a dictionary of each character to its interned tile
+    """
+    registry = tile_registry if registry is None else registry
+    legend, pending = {}, list(Tile.__subclasses__())
+    while pending:
+        cls = pending.pop()
+        pending.extend(cls.__subclasses__())
+        try:
+            tile = cls()
+        except TypeError:
+            # Classes without a default appearance have no character of their own.
+            continue
+        legend.setdefault(tile.character, registry.intern(tile))
+    for tile in registry.values():
+        legend[tile.character] = tile
+    return legend
+
+# Registry shared by every dungeon; ground and wall are registered first so their ids are 0 and 1.
+tile_registry = TileRegistry()
+GROUND = tile_registry.intern(Ground())
+WALL = tile_registry.intern(Wall())
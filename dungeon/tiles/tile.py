@@ -2,11 +2,32 @@ __author__ = 'Kellan Childers'
 
 
 class Tile:
+    """A kind of dungeon tile.
+
+    Tiles compare equal when they have the same type and appearance, so each distinct
+    tile can be interned once in a TileRegistry and shared by every cell that uses it.
+    Shared tiles should be treated as immutable.
+    """
+    __slots__ = ('character', 'char_color', 'back_color')
+    # Whether creatures can walk onto the tile.
+    passable = True
+    # Whether light and sight pass through the tile.
+    transparent = True
+
     def __init__(self, character, char_color="white", back_color="black"):
         self.character = character
         self.char_color = char_color
         self.back_color = back_color
 
+    def _key(self):
+        return type(self), self.character, self.char_color, self.back_color
+
+    def __eq__(self, other):
+        return isinstance(other, Tile) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
     def __str__(self):
         return self.character
 
@@ -3,6 +3,10 @@ __author__ = 'Kellan Childers'
 
 
 class Wall(Tile):
+    __slots__ = ()
+    passable = False
+    transparent = False
+
     def __init__(self, character='#', char_color="white", back_color="black"):
         super(Wall, self).__init__(character, char_color, back_color)
 
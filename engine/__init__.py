@@ -0,0 +1,15 @@
+from lazyimport import lazy_exports
+__author__ = 'Kellan Childers'
+
+# Names exported by the package, by the module defining them; each module is imported when one of its names is used.
+_EXPORTS = {
+    'Scheduler': 'engine.scheduler', 'ACTION_COST': 'engine.scheduler', 'NORMAL_SPEED': 'engine.scheduler',
+    'WAITING': 'engine.input', 'ScriptedInput': 'engine.input', 'RandomInput': 'engine.input',
+    'RecordingInput': 'engine.input', 'WindowInput': 'engine.input', 'QueueInput': 'engine.input',
+    'Actor': 'engine.actors', 'Player': 'engine.actors', 'Chaser': 'engine.actors',
+    'encode_actor': 'engine.actors', 'decode_actor': 'engine.actors',
+    'Game': 'engine.game', 'new_game': 'engine.game',
+    'LevelManager': 'engine.levels',
+    'SaveGame': 'engine.savegame', 'load_game': 'engine.savegame',
+}
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _EXPORTS)
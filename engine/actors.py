@@ -0,0 +1,129 @@
+from engine.input import WAITING
+from engine.scheduler import ACTION_COST, NORMAL_SPEED
+__author__ = 'Kellan Childers'
+
+# The most keys taking no time the player can press in one turn before the turn is spent waiting.
+FREE_KEYS = 100
+
+
+class Actor:
+    """Something in the dungeon that takes turns."""
+    def __init__(self, x=0, y=0, character='?', name="creature", speed=NORMAL_SPEED, health=10, damage="1d4"):
+        """Create an actor.
+
+        :param x: the x-element of the actor's position (default 0)
+        :param y: the y-element of the actor's position (default 0)
+        :param character: the character the actor is drawn as (default '?')
+        :param name: the name used in messages (default "creature")
+        :param speed: the energy the actor gains each tick (default NORMAL_SPEED)
+        :param health: the damage the actor can take before dying (default 10)
+        :param damage: the dice expression rolled when the actor attacks (default "1d4")
+        :return: null
+        """
+        self.x, self.y = x, y
+        self.character = character
+        self.name = name
+        self.speed = speed
+        self.health = health
+        self.damage = damage
+
+    def act(self, game):
+        """Take a turn; an actor with nothing better to do waits.
+
+        :param game: the game being played
+        :return: the energy spent, or None to leave the turn order
+        """
+        return ACTION_COST
+
+    def is_alive(self):
+        """Check whether the actor can still act.
+
+        :return: a boolean value representing life
+        """
+        return self.health > 0
+
+
+class Player(Actor):
+    """The actor controlled by the game's input source."""
+    def __init__(self, x=0, y=0, character='@', name="player", speed=NORMAL_SPEED, health=30, damage="1d6"):
+        super(Player, self).__init__(x, y, character, name, speed, health, damage)
+
+    def act(self, game):
+        """Read keys until one of them is a command that takes time.
+
+        Commands that take no time, such as bumping into a wall, and unknown keys simply
+        read another key, so no number of them can grow the stack. After FREE_KEYS of them
+        the player waits instead, so an endless input of such keys cannot stall the game.
+        :param game: the game being played
+        :return: the energy spent, WAITING if no key has been pressed yet, or None if the game was stopped
+        """
+        for _ in range(FREE_KEYS):
+            if not game.running:
+                return None
+            key = game.input.next_key()
+            if key is WAITING:
+                return WAITING
+            if key is None:
+                # The input has run out, as at the end of a script.
+                game.stop()
+                return None
+            command = game.commands.get(key)
+            if command is None:
+                game.message("Command not found")
+                continue
+            cost = command(game, self)
+            if cost:
+                return cost
+        return None if not game.running else ACTION_COST
+
+
+class Chaser(Actor):
+    """Monster that walks toward the player and attacks when it gets there."""
+    def __init__(self, x=0, y=0, character='g', name="goblin", speed=NORMAL_SPEED, health=6, damage="1d3"):
+        super(Chaser, self).__init__(x, y, character, name, speed, health, damage)
+
+    def act(self, game):
+        """Step down the distance map shared by every chaser.
+
+        :param game: the game being played
+        :return: the energy spent
+        """
+        distances = game.player_distances()
+        step = None if distances is None else distances.step_from(self.x, self.y)
+        if step is None:
+            return ACTION_COST
+        return game.move(self, step[0]-self.x, step[1]-self.y) or ACTION_COST
+
+
+def actor_type(type_name):
+    """Find an actor class by name among Actor and all of its subclasses.
+
+    :param type_name: the name of the class
+    :return: the actor class
+    """
+    pending = [Actor]
+    while pending:
+        cls = pending.pop()
+        if cls.__name__ == type_name:
+            return cls
+        pending.extend(cls.__subclasses__())
+    raise ValueError("Unknown actor type {}".format(type_name))
+
+
+def encode_actor(actor):
+    """Convert an actor into a json-compatible dictionary so it can be saved.
+
+    :param actor: the actor
+    :return: a dictionary of the actor's type name and attributes
+    """
+    return dict(vars(actor), type=type(actor).__name__)
+
+
+def decode_actor(data):
+    """Convert the saved form of an actor back into an actor.
+
+    :param data: a dictionary created by encode_actor
+    :return: a new actor
+    """
+    data = dict(data)
+    return actor_type(data.pop('type'))(**data)
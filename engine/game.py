@@ -0,0 +1,252 @@
+from collections import deque
+from random import Random
+from dice import Dice
+from dungeon.entities import EntityLayer
+from dungeon.pathfinding import PathFinder
+from engine.actors import Chaser, Player
+from engine.input import WAITING
+from engine.scheduler import ACTION_COST, Scheduler
+from instrument import recorder
+__author__ = 'Kellan Childers'
+
+
+def move_command(dx, dy):
+    """Create a command that moves an actor, or attacks whatever is in the way.
+
+    :param dx: the number of columns to move right
+    :param dy: the number of rows to move up
+    :return: a command taking the game and the actor and returning the energy spent
+    """
+    def move(game, actor):
+        return game.move(actor, dx, dy)
+    return move
+
+
+def wait_command(game, actor):
+    return ACTION_COST
+
+
+def quit_command(game, actor):
+    game.stop()
+    return 0
+
+# Commands available to the player, keyed by the names curses gives keys; digits follow a numeric keypad.
+COMMANDS = {
+    'KEY_UP': move_command(0, 1), 'KEY_DOWN': move_command(0, -1),
+    'KEY_LEFT': move_command(-1, 0), 'KEY_RIGHT': move_command(1, 0),
+    '8': move_command(0, 1), '2': move_command(0, -1), '4': move_command(-1, 0), '6': move_command(1, 0),
+    '7': move_command(-1, 1), '9': move_command(1, 1), '1': move_command(-1, -1), '3': move_command(1, -1),
+    '5': wait_command, '.': wait_command,
+    'q': quit_command,
+}
+
+
+class Game:
+    """A game played in a dungeon, independent of any terminal.
+
+    The game asks its input source for the player's keys, so it runs the same whether the
+    keys come from a person, a script or a random soak test. Everything random is drawn
+    from streams seeded by the game's seed, so a seed and a script replay a game exactly.
+    """
+    def __init__(self, dungeon, input_source, seed=None, sight=20):
+        """Create a game with no actors.
+
+        :param dungeon: the dungeon to play in
+        :param input_source: an object whose next_key() gives the player's next key, or None to stop
+        :param seed: the seed for every random choice in the game (default None)
+        :param sight: the distance from which monsters can find the player (default 20)
+        :return: null
+        """
+        self.dungeon = dungeon
+        self.input = input_source
+        self.random = Random(seed)
+        self.dice = Dice(self.random.getrandbits(64))
+        self.sight = sight
+        self.scheduler = Scheduler()
+        self.pathfinder = PathFinder(dungeon)
+        self.commands = dict(COMMANDS)
+        self.actors = []
+        self.entities = EntityLayer(dungeon)
+        self.player = None
+        self.turns = 0
+        self.running = False
+        # Whether the last step ended with the player waiting for a key that has not been pressed.
+        self.waiting = False
+        self.messages = deque(maxlen=100)
+
+    def message(self, text):
+        """Record a message for the player.
+
+        :param text: the message
+        :return: null
+        """
+        self.messages.append(text)
+
+    def add_actor(self, actor, delay=0):
+        """Put an actor into the game and the turn order.
+
+        :param actor: the actor to add; a Player becomes the game's player
+        :param delay: the number of ticks before its first turn (default 0)
+        :return: the actor
+        """
+        self.entities.add(actor)
+        self.actors.append(actor)
+        if isinstance(actor, Player):
+            self.player = actor
+        self.scheduler.schedule(actor, delay)
+        return actor
+
+    def remove_actor(self, actor):
+        """Take an actor out of the game and the turn order.
+
+        :param actor: the actor to remove
+        :return: null
+        """
+        self.entities.remove(actor)
+        self.actors.remove(actor)
+        self.scheduler.unschedule(actor)
+
+    def actor_at(self, x, y):
+        """Find the actor standing on a point.
+
+        :param x: the x-element of the point
+        :param y: the y-element of the point
+        :return: the actor, or None if the point is empty
+        """
+        return self.entities.first_at(x, y)
+
+    def random_floor(self):
+        """Choose a random passable point with no actor on it.
+
+        :return: the point in the form (x, y)
+        """
+        width, height = self.dungeon.get_width(), self.dungeon.get_height()
+        for _ in range(1000):
+            x, y = self.random.randrange(width), self.random.randrange(height)
+            if self.pathfinder.is_passable(x, y) and self.actor_at(x, y) is None:
+                return x, y
+        # Nearly full dungeons are searched in order instead.
+        for y in range(height):
+            for x in range(width):
+                if self.pathfinder.is_passable(x, y) and self.actor_at(x, y) is None:
+                    return x, y
+        raise ValueError("No free floor left in the dungeon")
+
+    def player_distances(self):
+        """Get the distance map leading to the player, shared by every monster chasing them.
+
+        :return: a DistanceMap, or None if there is no player
+        """
+        if self.player is None:
+            return None
+        return self.pathfinder.distance_map([(self.player.x, self.player.y)], self.sight)
+
+    def move(self, actor, dx, dy):
+        """Move an actor by an offset, attacking any actor in the way.
+
+        :param actor: the actor to move
+        :param dx: the number of columns to move right
+        :param dy: the number of rows to move up
+        :return: the energy spent, which is zero when the way is blocked
+        """
+        x, y = actor.x+dx, actor.y+dy
+        other = self.actor_at(x, y)
+        if other is not None:
+            # Monsters do not fight each other.
+            if actor is not self.player and other is not self.player:
+                return 0
+            self.attack(actor, other)
+            return ACTION_COST
+        if not self.pathfinder.is_passable(x, y):
+            return 0
+        self.entities.move(actor, x, y)
+        return ACTION_COST
+
+    def attack(self, attacker, defender):
+        """Have one actor hit another, removing the defender if it dies.
+
+        :param attacker: the actor attacking
+        :param defender: the actor being attacked
+        :return: the damage dealt
+        """
+        damage = self.dice.roll_expression(attacker.damage)
+        defender.health -= damage
+        self.message("The {} hits the {} for {}".format(attacker.name, defender.name, damage))
+        if not defender.is_alive():
+            self.message("The {} dies".format(defender.name))
+            self.remove_actor(defender)
+            if defender is self.player:
+                self.stop()
+        return damage
+
+    def stop(self):
+        """End the game after the current turn.
+
+        :return: null
+        """
+        self.running = False
+
+    @recorder.timed('game.turn')
+    def step(self):
+        """Give the next actor its turn.
+
+        :return: a boolean value representing whether the game is still running
+        """
+        actor = self.scheduler.next_actor()
+        if actor is None:
+            self.stop()
+            return False
+        cost = actor.act(self)
+        self.waiting = cost is WAITING
+        if self.waiting:
+            # The actor keeps its turn, and takes it once its input has a key.
+            self.scheduler.schedule(actor, 0)
+            return self.running
+        if actor is self.player and cost:
+            self.turns += 1
+        if cost is not None and actor.is_alive() and actor in self.entities:
+            self.scheduler.spend(actor, cost)
+        return self.running
+
+    def run(self, max_turns=None):
+        """Play until the game stops or the player has taken a number of turns.
+
+        :param max_turns: the most turns the player may take (default None, for no limit)
+        :return: a reference to the game
+        """
+        self.running = True
+        while self.running and (max_turns is None or self.turns < max_turns):
+            self.step()
+        return self
+
+
+def new_game(input_source, width=80, height=40, monsters=10, seed=None, dungeon=None, player=None):
+    """Create a game in a new cave with a player and some monsters placed at random.
+
+    :param input_source: the source of the player's keys
+    :param width: the width of the cave (default 80)
+    :param height: the height of the cave (default 40)
+    :param monsters: the number of monsters (default 10)
+    :param seed: the seed for the cave and the game (default None)
+    :param dungeon: a dungeon to play in instead of a new cave (default None)
+    :param player: a player to carry into the game instead of a new one (default None)
+    :return: a new Game
+    """
+    if dungeon is None:
+        from dungeon.cave import CaveGenerator
+        dungeon = CaveGenerator(width, height, seed=seed).generate()
+    game = Game(dungeon, input_source, seed)
+    if player is None:
+        player = Player()
+    player.x, player.y = game.random_floor()
+    game.add_actor(player)
+    for _ in range(monsters):
+        game.add_actor(Chaser(*game.random_floor()), 1)
+    return game
+
+if __name__ == "__main__":
+    from engine.input import RandomInput
+    # Short program for showing off capability of module.
+    demo = new_game(RandomInput(seed=1), seed=1).run(500)
+    print("{} turns, {} ticks, {} actors left".format(demo.turns, demo.scheduler.time, len(demo.actors)))
+    print('\n'.join(list(demo.messages)[-5:]))
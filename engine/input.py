@@ -0,0 +1,147 @@
+from collections import deque
+from random import Random
+__author__ = 'Kellan Childers'
+
+# Returned by next_key when no key has been pressed yet but more may come, as opposed to None.
+WAITING = object()
+
+# Keys that move the player, in the form curses reports them.
+MOVE_KEYS = ('KEY_UP', 'KEY_DOWN', 'KEY_LEFT', 'KEY_RIGHT', '1', '2', '3', '4', '6', '7', '8', '9')
+
+
+class ScriptedInput:
+    """Input source that plays back a fixed sequence of keys."""
+    def __init__(self, keys):
+        """Create an input source from a sequence of keys.
+
+        :param keys: an iterable of keys, such as 'q' or 'KEY_UP'
+        :return: null
+        """
+        self._keys = iter(keys)
+
+    @classmethod
+    def from_file(cls, filename):
+        """Create an input source from a file holding one key per line.
+
+        :param filename: the file to read
+        :return: a new ScriptedInput
+        """
+        with open(filename) as file:
+            return cls([line.rstrip('\n') for line in file])
+
+    def next_key(self):
+        """Get the next key.
+
+        :return: the key, or None when the script has run out
+        """
+        return next(self._keys, None)
+
+
+class RandomInput:
+    """Input source that presses random keys, for soak tests."""
+    def __init__(self, keys=MOVE_KEYS, count=None, seed=None):
+        """Create a random input source.
+
+        :param keys: the keys to choose from (default the movement keys)
+        :param count: the number of keys to press before running out (default None, never running out)
+        :param seed: the seed for choosing keys (default None)
+        :return: null
+        """
+        self._keys = tuple(keys)
+        self._remaining = count
+        self._random = Random(seed)
+
+    def next_key(self):
+        """Get the next key.
+
+        :return: a random key, or None once count keys have been pressed
+        """
+        if self._remaining is not None:
+            if self._remaining <= 0:
+                return None
+            self._remaining -= 1
+        return self._random.choice(self._keys)
+
+
+class WindowInput:
+    """Input source that waits for keys pressed in a curses window."""
+    def __init__(self, window):
+        """Create an input source for a window.
+
+        :param window: the curses window to read from
+        :return: null
+        """
+        self._window = window
+
+    def next_key(self):
+        """Wait for the next key.
+
+        :return: the key
+        """
+        return self._window.getkey()
+
+
+class QueueInput:
+    """Input source fed keys as they arrive, such as by an event loop, that never blocks."""
+    def __init__(self):
+        """Create an empty queue of keys.
+
+        :return: null
+        """
+        self._keys = deque()
+        self._closed = False
+
+    def push(self, key):
+        """Add a key to the end of the queue.
+
+        :param key: the key
+        :return: null
+        """
+        self._keys.append(key)
+
+    def close(self):
+        """Mark the input as finished, so next_key runs out once the queue is empty.
+
+        :return: null
+        """
+        self._closed = True
+
+    def next_key(self):
+        """Get the next key without waiting.
+
+        :return: the key, WAITING if the queue is empty, or None once it is empty and closed
+        """
+        if self._keys:
+            return self._keys.popleft()
+        return None if self._closed else WAITING
+
+
+class RecordingInput:
+    """Input source that remembers every key read from another source, so a game can be replayed."""
+    def __init__(self, source):
+        """Wrap an input source.
+
+        :param source: the input source to record
+        :return: null
+        """
+        self._source = source
+        self.keys = []
+
+    def next_key(self):
+        """Get and record the next key from the wrapped source.
+
+        :return: the key, or None when the wrapped source has run out
+        """
+        key = self._source.next_key()
+        if key is not None and key is not WAITING:
+            self.keys.append(key)
+        return key
+
+    def save(self, filename):
+        """Write the recorded keys in the form read by ScriptedInput.from_file.
+
+        :param filename: the file to write
+        :return: null
+        """
+        with open(filename, 'w') as file:
+            file.writelines(key + '\n' for key in self.keys)
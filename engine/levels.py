@@ -0,0 +1,290 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from json import dump, load
+from tempfile import TemporaryDirectory
+from dungeon.dungeon import ArrayDungeon
+from engine.actors import Chaser, decode_actor, encode_actor
+from engine.game import Game
+from levelgen import GENERATORS
+from mapfile import load_map, save_map
+__author__ = 'Kellan Childers'
+
+
+class LevelManager:
+    """The levels of a run by depth, keeping the most recently visited in memory and the rest on disk.
+
+    Levels are games sharing one input source. When more than resident levels are in memory,
+    the least recently used is written to a cache directory by a background thread: its map
+    as a compressed map file and its monsters as JSON. Until the write finishes the level can
+    be taken back at no cost. Another background thread prefetches levels, loading them from
+    the cache or generating them, so moving to a prefetched level never waits.
+    """
+    def __init__(self, input_source, width=80, height=40, seed=None, resident=4, directory=None,
+                 generator='cave', monsters=10):
+        """Create a manager with no levels.
+
+        :param input_source: the source of the player's keys, shared by every level
+        :param width: the width of new levels (default 80)
+        :param height: the height of new levels (default 40)
+        :param seed: the seed of the first level; level n uses seed+n-1 (default None)
+        :param resident: the most levels kept in memory, not counting prefetched levels (default 4)
+        :param directory: the directory to spill levels into (default a temporary directory, removed on close)
+        :param generator: the name of the generator in levelgen.GENERATORS (default 'cave')
+        :param monsters: the number of monsters in each new level (default 10)
+        :return: null
+        """
+        if resident < 1:
+            raise ValueError("At least one level must stay in memory")
+        if generator not in GENERATORS:
+            raise ValueError("Unknown generator {}".format(generator))
+        self.input = input_source
+        self.width, self.height = width, height
+        self.seed = seed
+        self.resident = resident
+        self.generator = generator
+        self.monsters = monsters
+        self._temporary = TemporaryDirectory(prefix='levels') if directory is None else None
+        self.directory = self._temporary.name if directory is None else directory
+        os.makedirs(self.directory, exist_ok=True)
+        self.depth = None
+        # Maps depth to game, least recently used first.
+        self._levels = OrderedDict()
+        # Maps depth to a one-item list holding the game until its spill is written, then None.
+        self._spilled = {}
+        # Maps depth to the future of a level being loaded or generated. A level being read back keeps
+        # its cache entry until it arrives, so a cancelled or failed read never loses it.
+        self._prefetched = {}
+        self._lock = threading.Lock()
+        # One writer keeps spills of the same level in order; loading never waits behind writing.
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='level-writer')
+        self._loader = ThreadPoolExecutor(1, thread_name_prefix='level-loader')
+
+    def level_seed(self, depth):
+        """Get the seed of a level, so a seed replays every level of a run.
+
+        :param depth: the depth of the level, starting from 1
+        :return: the seed, or None if the run has no seed
+        """
+        return None if self.seed is None else self.seed + depth - 1
+
+    def _paths(self, depth):
+        """Get the files a level is spilled to.
+
+        :return: the map file and monster file
+        """
+        name = os.path.join(self.directory, "level_{:05d}".format(depth))
+        return name + '.rlmp', name + '.json'
+
+    def _generate(self, depth):
+        """Create a new level with monsters placed at random.
+
+        :param depth: the depth of the level
+        :return: a new Game with no player
+        """
+        seed = self.level_seed(depth)
+        game = Game(GENERATORS[self.generator](self.width, self.height, seed), self.input, seed)
+        for _ in range(self.monsters):
+            game.add_actor(Chaser(*game.random_floor()), 1)
+        return game
+
+    def _write(self, depth, game):
+        """Write a level to the cache; run by the writer thread.
+
+        :return: null
+        """
+        map_path, actor_path = self._paths(depth)
+        save_map(game.dungeon, map_path, compress=True)
+        with open(actor_path, 'w') as file:
+            dump([encode_actor(actor) for actor in game.actors if actor is not game.player], file)
+
+    def _read(self, depth):
+        """Read a level back from the cache.
+
+        :return: a new Game holding the level's map and monsters
+        """
+        map_path, actor_path = self._paths(depth)
+        game = Game(load_map(map_path, ArrayDungeon), self.input, self.level_seed(depth))
+        with open(actor_path) as file:
+            for data in load(file):
+                game.add_actor(decode_actor(data), 1)
+        return game
+
+    def _load(self, depth, spilled):
+        """Read a spilled level, or generate a level never seen before.
+
+        :param depth: the depth of the level
+        :param spilled: whether the level is in the cache
+        :return: the level's Game
+        """
+        return self._read(depth) if spilled else self._generate(depth)
+
+    def _spill(self, depth, game):
+        """Write a level to the cache in the background, holding on to it until the write is done.
+
+        :return: null
+        """
+        entry = [game]
+        self._spilled[depth] = entry
+
+        def written(future):
+            # A failed write keeps the level in memory, so it is never lost.
+            if future.exception() is None:
+                with self._lock:
+                    entry[0] = None
+        self._writer.submit(self._write, depth, game).add_done_callback(written)
+
+    def _take(self, depth):
+        """Start getting a level that is not in memory, without waiting for it.
+
+        :return: null
+        """
+        if depth in self._levels or depth in self._prefetched:
+            return
+        with self._lock:
+            entry = self._spilled.get(depth)
+            game = None if entry is None else entry[0]
+            if game is not None:
+                del self._spilled[depth]
+        future = self._prefetched[depth] = Future() if game is not None else \
+            self._loader.submit(self._load, depth, entry is not None)
+        if game is not None:
+            # The spill has not finished, so the level is still in memory.
+            future.set_result(game)
+
+    def _keep(self, depth, game):
+        """Make a level the most recently used, spilling the least recently used beyond the limit.
+
+        :return: null
+        """
+        self._levels[depth] = game
+        self._levels.move_to_end(depth)
+        while len(self._levels) > self.resident:
+            old_depth, old_game = self._levels.popitem(last=False)
+            self._spill(old_depth, old_game)
+
+    def put(self, depth, game):
+        """Add a level that was made elsewhere, replacing any level at its depth.
+
+        :param depth: the depth of the level
+        :param game: the level's Game
+        :return: a reference to the manager
+        """
+        self._spilled.pop(depth, None)
+        self._prefetched.pop(depth, None)
+        self._keep(depth, game)
+        return self
+
+    def prefetch(self, depth):
+        """Start loading or generating a level in the background, if it is not already in memory.
+
+        :param depth: the depth of the level
+        :return: a reference to the manager
+        """
+        if depth >= 1:
+            self._take(depth)
+        return self
+
+    def is_ready(self, depth):
+        """Check whether a level can be entered without waiting.
+
+        :param depth: the depth of the level
+        :return: a boolean value representing readiness
+        """
+        if depth in self._levels:
+            return True
+        future = self._prefetched.get(depth)
+        if future is not None:
+            return future.done()
+        with self._lock:
+            entry = self._spilled.get(depth)
+            return entry is not None and entry[0] is not None
+
+    def get(self, depth):
+        """Get a level, waiting for it to load or generate if it was not prefetched.
+
+        :param depth: the depth of the level, starting from 1
+        :return: the level's Game
+        """
+        if depth < 1:
+            raise IndexError("Levels start at depth 1")
+        self._take(depth)
+        future = self._prefetched.pop(depth, None)
+        if future is not None:
+            game = future.result()
+            with self._lock:
+                self._spilled.pop(depth, None)
+            self._keep(depth, game)
+        self._levels.move_to_end(depth)
+        return self._levels[depth]
+
+    def enter(self, depth, player):
+        """Move the player to a level, making it the current level, and prefetch the levels beside it.
+
+        The player leaves the current level and arrives on a random floor.
+        :param depth: the depth of the level
+        :param player: the player
+        :return: the level's Game
+        """
+        game = self.get(depth)
+        current = self._levels.get(self.depth)
+        if current is not None and current is not game and player in current.entities:
+            current.remove_actor(player)
+            current.player = None
+        if player not in game.entities:
+            player.x, player.y = game.random_floor()
+            game.add_actor(player)
+        self.depth = depth
+        # Levels are prefetched in the background so moving between them never waits.
+        self.prefetch(depth+1).prefetch(depth-1)
+        # Prefetched levels the player has moved away from go straight to the cache once they are
+        # ready, or are dropped if they were never started or failed; a dropped read is still in the
+        # cache. Waiting for one still being made would stall the move, so it is left for a later move.
+        for far_depth in [far_depth for far_depth in self._prefetched if abs(far_depth-depth) > 1]:
+            future = self._prefetched[far_depth]
+            if future.cancel() or (future.done() and future.exception() is not None):
+                del self._prefetched[far_depth]
+            elif future.done():
+                self._spill(far_depth, self._prefetched.pop(far_depth).result())
+        return game
+
+    def get_resident(self):
+        """Get the depths of the levels in memory, least recently used first.
+
+        :return: a list of depths
+        """
+        return list(self._levels)
+
+    def get_spilled(self):
+        """Get the depths of the levels in the cache or being written to it.
+
+        :return: a sorted list of depths
+        """
+        return sorted(self._spilled)
+
+    def close(self):
+        """Wait for the background threads, then remove the cache if it is temporary.
+
+        :return: null
+        """
+        self._loader.shutdown(cancel_futures=True)
+        self._writer.shutdown()
+        if self._temporary is not None:
+            self._temporary.cleanup()
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from engine.actors import Player
+    from engine.input import RandomInput
+    # Short program for showing off capability of module.
+    levels = LevelManager(RandomInput(seed=1), 160, 80, seed=1, resident=2)
+    hero = Player()
+    for level in list(range(1, 7)) + list(range(5, 0, -1)):
+        started = perf_counter()
+        game = levels.enter(level, hero)
+        for _ in range(20):
+            game.step()
+        print("Level {}: entered in {:.2f}ms, resident {}, spilled {}".format(
+            level, (perf_counter()-started)*1e3, levels.get_resident(), levels.get_spilled()))
+    levels.close()
@@ -0,0 +1,284 @@
+import os
+from json import dump, dumps, load, loads
+from dungeon.dungeon import ArrayDungeon
+from engine.actors import decode_actor, encode_actor
+from engine.game import Game
+from mapfile import load_map, save_map
+__author__ = 'Kellan Childers'
+
+# A save game is a snapshot and a journal of the changes made since it was taken:
+#   name                the snapshot's state, as JSON: generation, map file, actors, player, turns, depth, seed
+#   name.<gen>.rlmp     the snapshot's map, as a compressed map file
+#   name.journal        JSON lines, starting with {"generation": G} naming the snapshot they follow:
+#                         {"palette": [...]}    encoded tiles given the next ids in order, before any record using them
+#                         {"turns": T, "cells": [[x, y, [id, ...]], ...], "actors": {"n": actor or null}, "player": n}
+#                       where each cells entry is a run of ids starting at (x, y), and actors maps the id of every
+#                       actor added or changed to its attributes, and of every actor removed to null.
+# The snapshot is only replaced by renaming a finished file over it, so a crash leaves either the old
+# snapshot and its journal or the new one. A journal whose generation is not the snapshot's is ignored.
+
+
+def _write_atomically(filename, write):
+    """Write a file by writing a temporary file beside it, then renaming it over the file.
+
+    :param filename: the name of the file
+    :param write: a function called with the name of the temporary file, which it must create
+    :return: null
+    """
+    temporary = filename + '.tmp'
+    write(temporary)
+    with open(temporary, 'rb') as file:
+        os.fsync(file.fileno())
+    os.replace(temporary, filename)
+
+
+class SaveGame:
+    """Save game for one level of a game, kept up to date by appending the changes of each turn to a journal.
+
+    Recording a turn writes only the cells and actors that changed, so its cost grows with
+    the turn's changes rather than the size of the map. Every compact_every records the
+    journal is folded into a new snapshot and started again.
+    """
+    def __init__(self, filename, compact_every=500, sync=False):
+        """Create a save game that has not started recording.
+
+        :param filename: the name of the snapshot file; the map and journal are saved beside it
+        :param compact_every: the number of records after which a new snapshot is taken (default 500)
+        :param sync: whether each record is forced to disk, not just to the operating system (default False)
+        :return: null
+        """
+        self.filename = filename
+        self.compact_every = compact_every
+        self.sync = sync
+        self.game = None
+        self.depth, self.seed = 1, None
+        self.generation = 0
+        self.records = 0
+        self._journal = None
+        # Changed rectangles of the map since the last record, as (x_start, y_start, x_end, y_end).
+        self._changed = []
+        # Maps each actor to its id and the attributes last saved for it.
+        self._actors = {}
+        self._next_actor = 0
+        self._player = None
+        self._palette = None
+        self._announced = 0
+
+    def _watch(self, graph, x_start, y_start, x_end, y_end):
+        self._changed.append((x_start, y_start, x_end, y_end))
+
+    def start(self, game, depth=1, seed=None):
+        """Start saving a game, taking a snapshot of it now.
+
+        :param game: the game to save
+        :param depth: the depth of the game's level, saved for the caller (default 1)
+        :param seed: the seed of the run, saved for the caller (default None)
+        :return: a reference to the save game
+        """
+        if self.game is not None:
+            self.game.dungeon.remove_listener(self._watch)
+        self.game, self.depth, self.seed = game, depth, seed
+        game.dungeon.add_listener(self._watch)
+        dungeon = game.dungeon
+        self._palette = dungeon.get_palette() if hasattr(dungeon, 'get_palette') else dungeon._new_palette()
+        if self.generation == 0 and os.path.exists(self.filename):
+            # Generations keep counting up, so an old journal is never mistaken for a new one.
+            with open(self.filename) as file:
+                self.generation = load(file).get('generation', 0)
+        return self.checkpoint()
+
+    def checkpoint(self):
+        """Take a new snapshot of the game and start an empty journal after it.
+
+        :return: a reference to the save game
+        """
+        game = self.game
+        generation = self.generation + 1
+        map_name = "{}.{}.rlmp".format(self.filename, generation)
+        _write_atomically(map_name, lambda temporary: save_map(game.dungeon, temporary, compress=True))
+
+        self._actors, self._next_actor = {}, 0
+        actors = {}
+        for actor in game.actors:
+            actor_id, attributes = self._add_actor(actor)
+            actors[actor_id] = attributes
+        self._player = self._actor_id(game.player)
+        state = {'generation': generation, 'map': os.path.basename(map_name), 'actors': actors,
+                 'player': self._player, 'turns': game.turns, 'depth': self.depth, 'seed': self.seed}
+
+        def write_state(temporary):
+            with open(temporary, 'w') as file:
+                dump(state, file)
+
+        def write_journal(temporary):
+            with open(temporary, 'w') as file:
+                file.write(dumps({'generation': generation}) + '\n')
+        # Once the state is renamed into place the new snapshot is the save; the journal only follows it.
+        _write_atomically(self.filename, write_state)
+        if self._journal is not None:
+            self._journal.close()
+        _write_atomically(self.filename + '.journal', write_journal)
+        self._journal = open(self.filename + '.journal', 'a')
+
+        old_map = "{}.{}.rlmp".format(self.filename, self.generation)
+        if self.generation and os.path.exists(old_map):
+            os.remove(old_map)
+        self.generation, self.records = generation, 0
+        self._changed = []
+        # Every id the snapshot's map uses is in its own table, so the journal announces ids from scratch.
+        self._announced = 0
+        return self
+
+    def _add_actor(self, actor):
+        """Give an actor the next id.
+
+        :return: the id, as a string for JSON, and the actor's attributes
+        """
+        actor_id, attributes = str(self._next_actor), encode_actor(actor)
+        self._next_actor += 1
+        self._actors[actor] = (actor_id, attributes)
+        return actor_id, attributes
+
+    def _actor_id(self, actor):
+        return None if actor is None or actor not in self._actors else self._actors[actor][0]
+
+    def record(self):
+        """Append the changes made since the last record to the journal, then compact it if it is due.
+
+        :return: a reference to the save game
+        """
+        game, palette = self.game, self._palette
+        cells = []
+        for x_start, y_start, x_end, y_end in self._changed:
+            for y in range(y_start, y_end+1):
+                cells.append([x_start, y, [palette.index(value) for value in game.dungeon.get_row(y, x_start, x_end)]])
+        self._changed = []
+
+        actors, present = {}, set()
+        for actor in game.actors:
+            present.add(actor)
+            if actor not in self._actors:
+                actor_id, attributes = self._add_actor(actor)
+                actors[actor_id] = attributes
+                continue
+            actor_id, saved = self._actors[actor]
+            attributes = encode_actor(actor)
+            if attributes != saved:
+                self._actors[actor] = (actor_id, attributes)
+                actors[actor_id] = attributes
+        for actor in [actor for actor in self._actors if actor not in present]:
+            actors[self._actors.pop(actor)[0]] = None
+
+        record = {'turns': game.turns}
+        if cells:
+            record['cells'] = cells
+        if actors:
+            record['actors'] = actors
+        player = self._actor_id(game.player)
+        if player != self._player:
+            record['player'] = self._player = player
+        if len(palette) > self._announced:
+            # Tiles are saved by their encoding, since ids are only meaningful to this run's palette.
+            self._journal.write(dumps({'palette': [palette.encode(palette[value_id])
+                                                   for value_id in range(self._announced, len(palette))]}) + '\n')
+            self._announced = len(palette)
+        self._journal.write(dumps(record, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        if self.sync:
+            os.fsync(self._journal.fileno())
+        self.records += 1
+        if self.records >= self.compact_every:
+            self.checkpoint()
+        return self
+
+    def close(self):
+        """Record the last changes and stop saving.
+
+        :return: null
+        """
+        if self.game is None:
+            return
+        self.record()
+        self._journal.close()
+        self.game.dungeon.remove_listener(self._watch)
+        self.game, self._journal = None, None
+
+
+def load_game(filename, input_source):
+    """Load a save game, replaying its journal over its snapshot.
+
+    A last journal line cut short by a crash is ignored, so a game is recovered up to its last whole record.
+    :param filename: the name of the snapshot file
+    :param input_source: the source of the player's keys in the loaded game
+    :return: the loaded Game, and a dictionary of the depth, seed and generation it was saved with
+    """
+    with open(filename) as file:
+        state = load(file)
+    try:
+        generation, map_name = state['generation'], state['map']
+        actors, player = state['actors'], state['player']
+    except (KeyError, TypeError):
+        raise ValueError("{} is not a save game".format(filename))
+    dungeon = load_map(os.path.join(os.path.dirname(filename), map_name), ArrayDungeon)
+    palette, turns = dungeon.get_palette(), state.get('turns', 0)
+
+    try:
+        with open(filename + '.journal') as file:
+            lines = file.readlines()
+    except FileNotFoundError:
+        lines = []
+    values = []
+    for number, line in enumerate(lines):
+        try:
+            data = loads(line)
+        except ValueError:
+            if number == len(lines)-1:
+                break
+            raise ValueError("Line {} of the journal of {} is damaged".format(number+1, filename))
+        if number == 0:
+            if data.get('generation') != generation:
+                # The journal belongs to an older snapshot, whose changes the snapshot already holds.
+                break
+            continue
+        if 'palette' in data:
+            values.extend(palette.decode(value) for value in data['palette'])
+            continue
+        for x, y, ids in data.get('cells', ()):
+            dungeon._write_rows([[values[value_id] for value_id in ids]], x, y)
+        for actor_id, attributes in data.get('actors', {}).items():
+            if attributes is None:
+                actors.pop(actor_id, None)
+            else:
+                actors[actor_id] = attributes
+        player = data.get('player', player)
+        turns = data.get('turns', turns)
+
+    game = Game(dungeon, input_source, state.get('seed'))
+    for actor_id in sorted(actors, key=int):
+        actor = game.add_actor(decode_actor(actors[actor_id]), 0 if actor_id == player else 1)
+        if actor_id == player:
+            game.player = actor
+    game.turns = turns
+    return game, {'depth': state.get('depth', 1), 'seed': state.get('seed'), 'generation': generation}
+
+if __name__ == "__main__":
+    from tempfile import TemporaryDirectory
+    from engine.game import new_game
+    from engine.input import RandomInput
+    # Short program for showing off capability of module.
+    with TemporaryDirectory() as directory:
+        demo = new_game(RandomInput(seed=1), 200, 100, seed=1)
+        save = SaveGame(os.path.join(directory, 'demo.save'), compact_every=50).start(demo)
+        demo.running = True
+        while demo.running and demo.turns < 120:
+            turns = demo.turns
+            demo.step()
+            if demo.turns != turns:
+                save.record()
+        journal = os.path.getsize(os.path.join(directory, 'demo.save.journal'))
+        save.close()
+        loaded, info = load_game(os.path.join(directory, 'demo.save'), RandomInput(seed=1))
+        print("Saved {} turns in generation {}, with a {} byte journal".format(demo.turns, info['generation'], journal))
+        print("Loaded game matches:", loaded.turns == demo.turns and
+              sorted((actor.x, actor.y, actor.health) for actor in loaded.actors) ==
+              sorted((actor.x, actor.y, actor.health) for actor in demo.actors))
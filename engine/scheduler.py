@@ -0,0 +1,77 @@
+from heapq import heappop, heappush
+from itertools import count
+__author__ = 'Kellan Childers'
+
+# Energy spent by an ordinary action, and energy gained each tick by an actor of ordinary speed.
+ACTION_COST = 100
+NORMAL_SPEED = 10
+
+
+class Scheduler:
+    """Turn order for actors, kept in a priority queue of the times they next act.
+
+    Actors gain energy at their speed every tick and act once they have enough for their
+    next action, so rather than ticking, each actor is queued at the tick its energy will be
+    ready. Actors ready at the same tick act in the order they were scheduled.
+    """
+    def __init__(self):
+        """Create an empty scheduler starting at tick zero.
+
+        :return: null
+        """
+        self.time = 0
+        self._queue = []
+        self._order = count()
+        # Maps each scheduled actor to its live queue entry; other entries were cancelled.
+        self._entries = {}
+
+    def schedule(self, actor, delay=0):
+        """Queue an actor to act after a number of ticks, replacing any earlier entry for it.
+
+        :param actor: the actor to queue
+        :param delay: the number of ticks from now (default 0)
+        :return: a reference to the scheduler
+        """
+        entry = next(self._order)
+        self._entries[actor] = entry
+        heappush(self._queue, (self.time+delay, entry, actor))
+        return self
+
+    def spend(self, actor, cost=ACTION_COST):
+        """Queue an actor to act again once it has regained the energy spent on an action.
+
+        :param actor: the actor that acted; its speed attribute is the energy it gains each tick
+        :param cost: the energy spent (default ACTION_COST)
+        :return: a reference to the scheduler
+        """
+        speed = getattr(actor, 'speed', NORMAL_SPEED)
+        # Round up, so an action never takes less time than it costs.
+        return self.schedule(actor, -(-cost // speed))
+
+    def unschedule(self, actor):
+        """Remove an actor from the turn order.
+
+        :param actor: the actor to remove
+        :return: a reference to the scheduler
+        """
+        self._entries.pop(actor, None)
+        return self
+
+    def next_actor(self):
+        """Advance time to the next actor's turn and take it from the queue.
+
+        :return: the actor, or None if no actor is scheduled
+        """
+        while self._queue:
+            time, entry, actor = heappop(self._queue)
+            if self._entries.get(actor) == entry:
+                del self._entries[actor]
+                self.time = time
+                return actor
+        return None
+
+    def __contains__(self, actor):
+        return actor in self._entries
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,11 +1,134 @@
 #!/usr/bin/python3
 
 from json import dump, load
+from operator import add
 __author__ = 'Kellan Childers'
 
+# Offsets (dx, dy) to the neighbors of a point, sharing an edge or also sharing a corner.
+NEIGHBORS_4 = ((-1, 0), (0, -1), (0, 1), (1, 0))
+NEIGHBORS_8 = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+class Palette:
+    """Two-way table between values and the small integer ids used to store them.
+
+    Ids are handed out in order of first use and never change, so a palette can safely
+    be shared between several graphs. Values must be hashable.
+    """
+    def __init__(self, values=()):
+        """Construct a palette, optionally filling it with an initial set of values.
+
+        :param values: values to add to the palette in order (default empty)
+        :return: null
+        """
+        self._values = []
+        self._ids = {}
+        for value in values:
+            self.index(value)
+
+    def index(self, value):
+        """Get the id for a value, adding the value to the palette if it is new.
+
+        :param value: the value to look up
+        :return: the integer id of the value
+        """
+        try:
+            return self._ids[value]
+        except KeyError:
+            value_id = len(self._values)
+            self._ids[value] = value_id
+            self._values.append(value)
+            return value_id
+
+    def values(self):
+        """Get every value in the palette, ordered by id.
+
+        :return: a list of values where each value's position is its id
+        """
+        return list(self._values)
+
+    def encode(self, value):
+        """Convert a value into a json-compatible form so the palette can be saved.
+
+        :param value: a value in the palette
+        :return: a json-compatible representation of value
+        """
+        return value
+
+    def decode(self, data):
+        """Convert the saved form of a value back into a value, adding it to the palette.
+
+        :param data: a representation created by encode
+        :return: the value
+        """
+        value = data
+        self.index(value)
+        return value
+
+    def __getitem__(self, value_id):
+        return self._values[value_id]
+
+    def __contains__(self, value):
+        return value in self._ids
+
+    def __len__(self):
+        return len(self._values)
+
+
+def neighbor_offsets(connectivity=8):
+    """Get the offsets to the neighbors of a point.
+
+    :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+    :return: a tuple of (dx, dy) pairs
+    """
+    if connectivity == 8:
+        return NEIGHBORS_8
+    elif connectivity == 4:
+        return NEIGHBORS_4
+    raise ValueError("Connectivity must be 4 or 8, not {}".format(connectivity))
+
+
+def count_neighbors(rows, connectivity=8):
+    """Count the neighbors of every cell that are set, using sums of shifted rows.
+
+    :param rows: equal-length rows of 0 or 1, starting from row zero
+    :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+    :return: a list of rows holding the number of set neighbors of each cell
+    """
+    neighbor_offsets(connectivity)
+    if not rows:
+        return []
+    width = len(rows[0])
+    # Sum each cell with its left and right neighbors by adding shifted copies of the row.
+    sides = []
+    across = []
+    for row in rows:
+        padded = [0] + list(row) + [0]
+        side = list(map(add, padded[:width], padded[2:]))
+        sides.append(side)
+        across.append(list(map(add, side, row)))
+    blank = [0] * width
+    # Rows of a cell's vertical neighbors come from the rows above and below.
+    vertical = across if connectivity == 8 else [list(row) for row in rows]
+    above, below = vertical[1:] + [blank], [blank] + vertical[:-1]
+    return [list(map(add, map(add, side, up), down)) for side, up, down in zip(sides, above, below)]
+
+
+def _bounding_box(point_list):
+    """Find the smallest rectangle containing every point in a list.
+
+    :param point_list: a non-empty list of points in the form (x, y)
+    :return: a tuple of (x_start, y_start, x_end, y_end)
+    """
+    x_values, y_values = [x for x, _ in point_list], [y for _, y in point_list]
+    return min(x_values), min(y_values), max(x_values), max(y_values)
+
 
 class Graph:
     """Simple module for representing data as a two-dimensional cartesian graph."""
+    # Callables told about every change; kept as a tuple so copies never share a list.
+    _listeners = ()
+
     def __init__(self, width=10, height=10, default=None):
         """Construct a graph of given width and height.
 
@@ -18,6 +141,88 @@ class Graph:
             raise IndexError("Cannot initialize graph with less than zero dimension")
         self._graph = [[default]*width for _ in range(height)]
 
+    def _new_palette(self):
+        """Create the palette used to give the graph's values small integer ids.
+
+        Subclasses whose values come from a shared table may return that table instead.
+        :return: a Palette
+        """
+        return Palette()
+
+    def add_listener(self, listener):
+        """Register a function to be called after any part of the graph changes.
+
+        The listener is called as listener(graph, x_start, y_start, x_end, y_end) with the
+        rectangle that changed; resizing, clearing, or loading report the whole graph.
+        :param listener: the function to call
+        :return: a reference to the graph
+        """
+        self._listeners = self._listeners + (listener,)
+        return self
+
+    def remove_listener(self, listener):
+        """Stop calling a function registered with add_listener.
+
+        :param listener: the function to stop calling
+        :return: a reference to the graph
+        """
+        self._listeners = tuple(registered for registered in self._listeners if registered != listener)
+        return self
+
+    def _changed(self, x_start, y_start, x_end, y_end):
+        """Tell every listener that a rectangle of the graph has changed.
+
+        :param x_start: the x-element of the start point of the rectangle (bottom left)
+        :param y_start: the y-element of the start point of the rectangle (bottom left)
+        :param x_end: the x-element of the end point of the rectangle (top right)
+        :param y_end: the y-element of the end point of the rectangle (top right)
+        :return: null
+        """
+        for listener in self._listeners:
+            listener(self, x_start, y_start, x_end, y_end)
+
+    def __getstate__(self):
+        """Get the attributes to pickle or copy: everything but the listeners.
+
+        Methods replaced on this graph alone, such as those timed by Recorder.watch_graph,
+        are bound to it, so they are left behind too and the class's methods are used instead.
+        :return: a dictionary of attributes
+        """
+        state = {name: value for name, value in self.__dict__.items()
+                 if not callable(getattr(self.__class__, name, None))}
+        state['_listeners'] = ()
+        return state
+
+    def _copy_attributes(self):
+        """Create a graph of the same class sharing every attribute but the listeners.
+
+        :return: the new graph
+        """
+        new_graph = self.__class__.__new__(self.__class__)
+        new_graph.__dict__.update(self.__getstate__())
+        return new_graph
+
+    def _changed_all(self):
+        """Tell every listener that the whole graph has changed.
+
+        :return: null
+        """
+        if self._listeners:
+            height = self.get_height()
+            self._changed(0, 0, (self.get_width() if height else 0)-1, height-1)
+
+    def _mask_rect(self, mask, x, y):
+        """Find the part of the graph a mask placed at (x, y) could change.
+
+        :param mask: rows of truthy or falsy values, starting from row zero
+        :param x: the x-element where the mask's first column is placed
+        :param y: the y-element where the mask's first row is placed
+        :return: the clipped (x_start, y_start, x_end, y_end), or None if nothing is covered
+        """
+        if not len(mask):
+            return None
+        return self.clip_rect(x, y, x + max(len(mask_row) for mask_row in mask)-1, y + len(mask)-1)
+
     def contains_point(self, x=0, y=0):
         """Test if the point (x, y) can be found in graph.
 
@@ -34,7 +239,7 @@ class Graph:
         :param y: the y component of the point (default 0)
         :return: the element at (x, y)
         """
-        if not self.contains_point():
+        if not self.contains_point(x, y):
             raise IndexError("Element not present in graph")
         return self._graph[y][x]
 
@@ -46,10 +251,12 @@ class Graph:
         :param y: the y component of the point (default 0)
         :return: the original value of the element at point (x, y)
         """
-        if not self.contains_point():
+        if not self.contains_point(x, y):
             raise IndexError("Element not present in graph")
-        old = self.get_elem(x, y)
+        old = self._graph[y][x]
         self._graph[y][x] = val
+        if self._listeners:
+            self._changed(x, y, x, y)
         return old
 
     def surrounding(self, x=0, y=0):
@@ -59,14 +266,49 @@ class Graph:
         :param y: the y component of the point (default 0)
         :return: a list of elements around (x, y)
         """
+        return self.neighbor_values(x, y)
+
+    def neighbors(self, x=0, y=0, connectivity=8):
+        """Find the points next to (x, y) that are in the graph.
+
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+        :return: a list of points in the form (x, y)
+        """
         if not self.contains_point(x, y):
             raise IndexError("Element not present in graph")
-        # Iterates around (x, y) and adds all points
-        tmp = [self.get_elem(x+i, y+j) for i in range(-1, 2) for j in range(-1, 2)
-               if self.contains_point(x+i, y+j)]
-        # Removes (x, y) from tmp.
-        tmp.remove(self.get_elem(x, y))
-        return tmp
+        width, height = self.get_width(), self.get_height()
+        return [(x+dx, y+dy) for dx, dy in neighbor_offsets(connectivity)
+                if 0 <= x+dx < width and 0 <= y+dy < height]
+
+    def neighbor_values(self, x=0, y=0, connectivity=8):
+        """Get the elements next to (x, y).
+
+        :param x: the x component of the point (default 0)
+        :param y: the y component of the point (default 0)
+        :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+        :return: a list of elements, in the same order as neighbors
+        """
+        return [self.get_elem(i, j) for i, j in self.neighbors(x, y, connectivity)]
+
+    def neighbor_counts(self, test, connectivity=8):
+        """Count, for every element, how many of its neighbors pass a test.
+
+        :param test: a function taking an element and returning whether it should be counted
+        :param connectivity: 4 for neighbors sharing an edge, 8 to include corners (default 8)
+        :return: rows of counts starting from row zero, indexed as counts[y][x]
+        """
+        return count_neighbors([[1 if test(val) else 0 for val in self.get_row(y)]
+                                for y in range(self.get_height())], connectivity)
+
+    def mask(self, test):
+        """Mark every element that passes a test.
+
+        :param test: a function taking an element and returning whether it should be marked
+        :return: a bytes object of 0 or 1 per element, indexed by y*width + x
+        """
+        return b''.join(bytes(1 if test(val) else 0 for val in self.get_row(y)) for y in range(self.get_height()))
 
     def get_height(self):
         """Get the height of the graph.
@@ -89,7 +331,14 @@ class Graph:
         :return: a reference to the graph
         """
         with open(filename, 'r') as read_file:
-            self._graph = load(read_file)
+            rows = load(read_file)
+        # Check the shape before replacing anything, so a bad file leaves the graph as it was.
+        if not isinstance(rows, list) or not all(isinstance(row, list) for row in rows):
+            raise ValueError("{} does not hold a list of rows".format(filename))
+        if any(len(row) != len(rows[0]) for row in rows):
+            raise ValueError("Rows in {} are not all the same length".format(filename))
+        self._graph = rows
+        self._changed_all()
         return self
 
     def save_to_file(self, filename):
@@ -116,6 +365,7 @@ class Graph:
             raise IndexError("Unable to resize to negative size")
         self._graph = [[self.get_elem(i, j) if self.contains_point(i, j) else default
                         for i in range(x)] for j in range(y)]
+        self._changed_all()
         return self
 
     def copy(self):
@@ -123,11 +373,28 @@ class Graph:
 
         :return: a copy of the graph
         """
-        new_graph = Graph()
-        new_graph._graph = [[self.get_elem(i, j) for i in range(self.get_width())]
-                            for j in range(self.get_height())]
+        new_graph = self._copy_attributes()
+        new_graph._graph = [list(row) for row in self._graph]
         return new_graph
 
+    def snapshot(self):
+        """Take a copy of the graph to restore later; the copy should not be changed.
+
+        Graphs that can share storage with their copies, such as ChunkedGraph, make this cheap.
+        :return: a graph holding the current state
+        """
+        return self.copy()
+
+    def restore(self, snapshot):
+        """Make the graph match a snapshot again.
+
+        :param snapshot: a graph returned by snapshot() or copy()
+        :return: a reference to the graph
+        """
+        self.resize(snapshot.get_width(), snapshot.get_height())
+        self.blit(snapshot, 0, 0)
+        return self
+
     def clear(self, default=None):
         """Remove all data from the current graph and restore it to default.
 
@@ -136,18 +403,175 @@ class Graph:
         """
         for i in range(self.get_height()):
             self._graph[i] = [default] * self.get_width()
+        self._changed_all()
+        return self
+
+    def clip_rect(self, x_start, y_start, x_end, y_end):
+        """Clip a rectangle to the bounds of the graph.
+
+        :param x_start: the x-element of the start point of the rectangle (bottom left)
+        :param y_start: the y-element of the start point of the rectangle (bottom left)
+        :param x_end: the x-element of the end point of the rectangle (top right)
+        :param y_end: the y-element of the end point of the rectangle (top right)
+        :return: the clipped (x_start, y_start, x_end, y_end), or None if nothing is left
+        """
+        x_start, y_start = max(x_start, 0), max(y_start, 0)
+        x_end, y_end = min(x_end, self.get_width()-1), min(y_end, self.get_height()-1)
+        if x_start > x_end or y_start > y_end:
+            return None
+        return x_start, y_start, x_end, y_end
+
+    def get_row(self, y=0, x_start=0, x_end=None):
+        """Get a copy of part of a row.
+
+        :param y: the row to read (default 0)
+        :param x_start: the first x-element to read (default 0)
+        :param x_end: the last x-element to read (default the end of the row)
+        :return: a list of the elements from x_start to x_end
+        """
+        if not 0 <= y < self.get_height():
+            raise IndexError("Row not present in graph")
+        if x_end is None:
+            x_end = self.get_width()-1
+        return self._graph[y][max(x_start, 0):x_end+1]
+
+    def fill_points(self, val, point_list):
+        """Set every point in a list to the same value, skipping points outside the graph.
+
+        :param val: the new value for the points
+        :param point_list: the list of points in the form (x, y)
+        :return: a reference to the graph
+        """
+        width, height, graph = self.get_width(), self.get_height(), self._graph
+        points = [(x, y) for x, y in point_list if 0 <= x < width and 0 <= y < height]
+        for x, y in points:
+            graph[y][x] = val
+        if points and self._listeners:
+            self._changed(*_bounding_box(points))
         return self
 
+    def fill_rect(self, val, x_start, y_start, x_end, y_end):
+        """Set every element of a rectangle to the same value, clipped to the graph.
+
+        :param val: the new value for the rectangle
+        :param x_start: the x-element of the start point of the rectangle (bottom left)
+        :param y_start: the y-element of the start point of the rectangle (bottom left)
+        :param x_end: the x-element of the end point of the rectangle (top right)
+        :param y_end: the y-element of the end point of the rectangle (top right)
+        :return: a reference to the graph
+        """
+        clipped = self.clip_rect(x_start, y_start, x_end, y_end)
+        if clipped is not None:
+            x_start, y_start, x_end, y_end = clipped
+            span = [val] * (x_end-x_start+1)
+            for row in self._graph[y_start:y_end+1]:
+                row[x_start:x_end+1] = span
+            self._changed(*clipped)
+        return self
+
+    def outline_rect(self, val, x_start, y_start, x_end, y_end):
+        """Set the border of a rectangle to the same value, clipped to the graph.
+
+        :param val: the new value for the border
+        :param x_start: the x-element of the start point of the rectangle (bottom left)
+        :param y_start: the y-element of the start point of the rectangle (bottom left)
+        :param x_end: the x-element of the end point of the rectangle (top right)
+        :param y_end: the y-element of the end point of the rectangle (top right)
+        :return: a reference to the graph
+        """
+        if x_start > x_end or y_start > y_end:
+            return self
+        self.fill_rect(val, x_start, y_start, x_end, y_start)
+        self.fill_rect(val, x_start, y_end, x_end, y_end)
+        self.fill_rect(val, x_start, y_start, x_start, y_end)
+        self.fill_rect(val, x_end, y_start, x_end, y_end)
+        return self
+
+    def fill_mask(self, val, mask, x=0, y=0):
+        """Set the elements selected by a mask to the same value, clipped to the graph.
+
+        :param val: the new value for the selected elements
+        :param mask: rows of truthy or falsy values, starting from row zero
+        :param x: the x-element where the mask's first column is placed (default 0)
+        :param y: the y-element where the mask's first row is placed (default 0)
+        :return: a reference to the graph
+        """
+        for j, mask_row in enumerate(mask, y):
+            if not 0 <= j < self.get_height():
+                continue
+            x_start, x_end = max(x, 0), min(x+len(mask_row), self.get_width())-1
+            if x_start > x_end:
+                continue
+            row = self._graph[j]
+            row[x_start:x_end+1] = [val if selected else old for selected, old in
+                                    zip(mask_row[x_start-x:x_end-x+1], row[x_start:x_end+1])]
+        if self._listeners:
+            changed = self._mask_rect(mask, x, y)
+            if changed is not None:
+                self._changed(*changed)
+        return self
+
+    def blit(self, source, x=0, y=0, src_x=0, src_y=0, width=None, height=None):
+        """Copy a rectangle of another graph into this graph, clipped to both graphs.
+
+        :param source: the graph to copy from
+        :param x: the x-element where the copied rectangle's first column is placed (default 0)
+        :param y: the y-element where the copied rectangle's first row is placed (default 0)
+        :param src_x: the x-element of the rectangle's bottom left in source (default 0)
+        :param src_y: the y-element of the rectangle's bottom left in source (default 0)
+        :param width: the width of the rectangle (default the rest of source)
+        :param height: the height of the rectangle (default the rest of source)
+        :return: a reference to the graph
+        """
+        if width is None:
+            width = source.get_width()-src_x
+        if height is None:
+            height = source.get_height()-src_y
+        # Clip against the source, then against this graph.
+        clipped = source.clip_rect(src_x, src_y, src_x+width-1, src_y+height-1)
+        if clipped is None:
+            return self
+        x, y = x + clipped[0]-src_x, y + clipped[1]-src_y
+        src_x, src_y = clipped[0], clipped[1]
+        clipped = self.clip_rect(x, y, x+clipped[2]-src_x, y+clipped[3]-src_y)
+        if clipped is None:
+            return self
+        x_start, y_start, x_end, y_end = clipped
+        src_x, src_y = src_x + x_start-x, src_y + y_start-y
+        # Read every row before writing so overlapping copies within one graph are safe.
+        rows = [source.get_row(src_y+j, src_x, src_x+x_end-x_start) for j in range(y_end-y_start+1)]
+        self._write_rows(rows, x_start, y_start)
+        self._changed(*clipped)
+        return self
+
+    def _write_rows(self, rows, x, y):
+        """Write rows of values that are already clipped to the graph.
+
+        :param rows: lists of values, starting from row y
+        :param x: the x-element of the first value in each row
+        :param y: the row to write the first list to
+        :return: null
+        """
+        for j, values in enumerate(rows, y):
+            self._graph[j][x:x+len(values)] = values
+
+    def paste(self, sub_graph, x=0, y=0):
+        """Copy all of another graph into this graph, clipped to this graph.
+
+        :param sub_graph: the graph to copy from
+        :param x: the x-element where sub_graph's first column is placed (default 0)
+        :param y: the y-element where sub_graph's first row is placed (default 0)
+        :return: a reference to the graph
+        """
+        return self.blit(sub_graph, x, y)
+
     def print_all(self):
         """Print every row to the command line, starting from row zero.
 
         :return: null
         """
         for line in reversed(self._graph):
-            printable_line = ""
-            for element in line:
-                printable_line = (printable_line + str(element))
-            print(printable_line)
+            print(''.join([str(element) for element in line]))
 
 if __name__ == "__main__":
     # Short program for showing off capability of module.
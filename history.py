@@ -0,0 +1,147 @@
+from chunkedgraph import ChunkedGraph
+__author__ = 'Kellan Childers'
+
+
+def diff(snapshot_a, snapshot_b):
+    """Find the cells that differ between two snapshots of a graph.
+
+    Chunked snapshots only compare the chunks they do not share, so snapshots a few edits
+    apart are compared in time proportional to the edits rather than the graph.
+    Only cells inside both snapshots are compared.
+    :param snapshot_a: the earlier graph or snapshot
+    :param snapshot_b: the later graph or snapshot
+    :return: a list of (x, y, value_a, value_b) for every changed cell, ordered by row and then column
+    """
+    width = min(snapshot_a.get_width(), snapshot_b.get_width())
+    height = min(snapshot_a.get_height(), snapshot_b.get_height())
+    if isinstance(snapshot_a, ChunkedGraph) and isinstance(snapshot_b, ChunkedGraph) and \
+            snapshot_a.get_palette() is snapshot_b.get_palette() and \
+            snapshot_a.get_chunk_size() == snapshot_b.get_chunk_size():
+        changes = _diff_chunks(snapshot_a, snapshot_b, width, height)
+    else:
+        changes = []
+        for y in range(height):
+            row_a, row_b = snapshot_a.get_row(y, 0, width-1), snapshot_b.get_row(y, 0, width-1)
+            if row_a != row_b:
+                changes.extend((x, y, value_a, value_b) for x, (value_a, value_b) in enumerate(zip(row_a, row_b))
+                               if value_a != value_b)
+    changes.sort(key=lambda change: (change[1], change[0]))
+    return changes
+
+
+def _diff_chunks(graph_a, graph_b, width, height):
+    """Compare two chunked graphs sharing a palette, skipping chunks they share.
+
+    :return: an unordered list of (x, y, value_a, value_b)
+    """
+    size, palette = graph_a.get_chunk_size(), graph_a.get_palette()
+    chunks_a, chunks_b = graph_a._chunks, graph_b._chunks
+    defaults = {}
+
+    def chunk_of(graph, chunks, key):
+        chunk = chunks.get(key)
+        if chunk is None:
+            # Unallocated chunks read as the default, which may differ between the graphs.
+            if graph._default_id not in defaults:
+                defaults[graph._default_id] = [graph._default_id] * (size*size)
+            chunk = defaults[graph._default_id]
+        return chunk
+
+    keys = set(chunks_a) | set(chunks_b)
+    same_default = graph_a._default_id == graph_b._default_id
+    if not same_default:
+        # Chunks neither graph has allocated differ too.
+        keys.update((chunk_x, chunk_y) for chunk_y in range(-(-height // size)) for chunk_x in range(-(-width // size)))
+    changes = []
+    for key in keys:
+        shared = chunks_a.get(key)
+        if shared is chunks_b.get(key) and (shared is not None or same_default):
+            continue
+        chunk_a, chunk_b = chunk_of(graph_a, chunks_a, key), chunk_of(graph_b, chunks_b, key)
+        base_x, base_y = key[0]*size, key[1]*size
+        for row in range(min(size, height-base_y)):
+            row_a, row_b = list(chunk_a[row*size:row*size+size]), list(chunk_b[row*size:row*size+size])
+            if row_a != row_b:
+                changes.extend((base_x+column, base_y+row, palette[id_a], palette[id_b])
+                               for column, (id_a, id_b) in enumerate(zip(row_a, row_b))
+                               if id_a != id_b and base_x+column < width)
+    return changes
+
+
+class History:
+    """Undo and redo for a graph, keeping a snapshot of the graph at every commit.
+
+    With a ChunkedGraph each snapshot shares every chunk that did not change, so the
+    history costs memory in proportion to the edits rather than the size of the graph.
+    """
+    def __init__(self, graph, limit=None):
+        """Start a history whose first state is the graph as it is now.
+
+        :param graph: the graph to track
+        :param limit: the most states to keep, dropping the oldest (default None, for no limit)
+        :return: null
+        """
+        self.graph = graph
+        self.limit = limit
+        self._past = [graph.snapshot()]
+        self._future = []
+
+    def commit(self):
+        """Record the graph's current state as a step that can be undone.
+
+        :return: a reference to the history
+        """
+        self._past.append(self.graph.snapshot())
+        self._future = []
+        if self.limit is not None and len(self._past) > self.limit:
+            del self._past[:len(self._past)-self.limit]
+        return self
+
+    def pending(self):
+        """Find the changes made since the last commit.
+
+        :return: a list of (x, y, committed_value, current_value), as returned by diff
+        """
+        return diff(self._past[-1], self.graph)
+
+    def can_undo(self):
+        return len(self._past) > 1
+
+    def can_redo(self):
+        return bool(self._future)
+
+    def undo(self):
+        """Return the graph to the state before the last commit, discarding uncommitted changes.
+
+        :return: a boolean value representing whether there was anything to undo
+        """
+        if not self.can_undo():
+            return False
+        self._future.append(self._past.pop())
+        self.graph.restore(self._past[-1])
+        return True
+
+    def redo(self):
+        """Reapply the last undone commit.
+
+        :return: a boolean value representing whether there was anything to redo
+        """
+        if not self.can_redo():
+            return False
+        self._past.append(self._future.pop())
+        self.graph.restore(self._past[-1])
+        return True
+
+if __name__ == "__main__":
+    # Short program for showing off capability of module.
+    demo = ChunkedGraph(20, 5, '.', chunk_size=4)
+    history = History(demo)
+    demo.fill_rect('#', 2, 1, 6, 3)
+    history.commit()
+    demo.set_elem('@', 15, 2)
+    history.commit()
+    print(diff(history._past[0], demo))
+    history.undo()
+    demo.print_all()
+    history.redo()
+    demo.print_all()
@@ -0,0 +1,445 @@
+import sys
+from contextlib import contextmanager
+from functools import wraps
+from json import dump
+from time import perf_counter
+__author__ = 'Kellan Childers'
+
+# Graph and Dungeon methods timed by Recorder.watch_graph when they exist on the graph.
+MAP_OPERATIONS = ('set_elem', 'set_cells', 'fill_points', 'fill_rect', 'outline_rect', 'fill_mask', 'blit', 'paste',
+                  'resize', 'clear', 'restore', 'read_from_file', 'make_rectangle', 'make_line')
+
+# Window methods whose text argument is counted as cells written by CountingWindow.
+_WRITES = frozenset(('addstr', 'addnstr', 'insstr', 'insnstr', 'addch', 'insch'))
+
+
+class Histogram:
+    """Durations counted in buckets that double in width, from one microsecond up.
+
+    Bucket i holds durations of at least 2**(i-1) and under 2**i microseconds, so a
+    histogram stays a few dozen integers however many durations it counts.
+    """
+    def __init__(self):
+        """Create an empty histogram.
+
+        :return: null
+        """
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = 0.0
+        self.buckets = {}
+
+    def add(self, seconds):
+        """Count a duration.
+
+        :param seconds: the duration
+        :return: null
+        """
+        bucket = int(seconds*1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.minimum = seconds if self.minimum is None else min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Estimate the duration below which a fraction of the durations fall.
+
+        :param fraction: the fraction, from 0 to 1
+        :return: the upper edge of the bucket holding that duration in seconds, or 0.0 if empty
+        """
+        target, seen = fraction*self.count, 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(2**bucket / 1e6, self.maximum)
+        return self.maximum
+
+    def to_dict(self):
+        """Describe the histogram for saving as JSON.
+
+        :return: a dictionary of count, total, mean, min, max, p50, p90, p99 and buckets
+        """
+        return {'count': self.count, 'total': self.total, 'mean': self.mean(), 'min': self.minimum or 0.0,
+                'max': self.maximum, 'p50': self.percentile(0.5), 'p90': self.percentile(0.9),
+                'p99': self.percentile(0.99),
+                'buckets': {"<{}us".format(2**bucket): count for bucket, count in sorted(self.buckets.items())}}
+
+
+class CountingWindow:
+    """Wrapper around a curses window or pad that counts the calls made through it.
+
+    Every call adds to name.calls, and the text written by addstr and similar calls adds to
+    name.cells, in the recorder's totals and the current frame.
+    """
+    def __init__(self, window, recorder, name='curses'):
+        """Wrap a window.
+
+        :param window: the curses window or pad
+        :param recorder: the recorder to count into
+        :param name: the prefix of the counters (default 'curses')
+        :return: null
+        """
+        self._window, self._recorder = window, recorder
+        self._calls, self._cells = name + '.calls', name + '.cells'
+
+    def unwrap(self):
+        """Get the wrapped window.
+
+        :return: the curses window or pad
+        """
+        return self._window
+
+    def __getattr__(self, attribute):
+        value = getattr(self._window, attribute)
+        if not callable(value):
+            return value
+        recorder, calls, cells = self._recorder, self._calls, self._cells
+        writes = attribute in _WRITES
+
+        def call(*arguments):
+            recorder.count(calls)
+            if writes:
+                text = next((argument for argument in arguments if isinstance(argument, str)), ' ')
+                recorder.count(cells, len(text))
+            return value(*arguments)
+        return call
+
+
+class Recorder:
+    """Opt-in timers, histograms and counters for finding where a session spends its time.
+
+    Nothing is recorded until the recorder is enabled, and the disabled checks are a single
+    attribute test, so instrumented code can stay instrumented. Counters are kept both in
+    total and for the current frame; end_frame files the frame's counters with its time.
+    """
+    def __init__(self):
+        """Create a disabled recorder.
+
+        :return: null
+        """
+        self.enabled = False
+        self.histograms = {}
+        self.counters = {}
+        self.frame = {}
+        self.last_frame = {}
+        self._frame_start = None
+
+    def enable(self, enabled=True):
+        """Start or stop recording.
+
+        :param enabled: whether to record (default True)
+        :return: a reference to the recorder
+        """
+        self.enabled = enabled
+        return self
+
+    def reset(self):
+        """Forget everything recorded so far.
+
+        :return: a reference to the recorder
+        """
+        self.histograms, self.counters, self.frame, self.last_frame = {}, {}, {}, {}
+        self._frame_start = None
+        return self
+
+    def add_time(self, name, seconds):
+        """Add a duration to a histogram, creating it if needed.
+
+        :param name: the name of the histogram
+        :param seconds: the duration
+        :return: null
+        """
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(seconds)
+
+    def count(self, name, amount=1):
+        """Add to a counter.
+
+        :param name: the name of the counter
+        :param amount: the amount to add (default 1)
+        :return: null
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            self.frame[name] = self.frame.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        """Time a block of code into a histogram.
+
+        :param name: the name of the histogram
+        :return: a context manager
+        """
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter()-start)
+
+    def timed(self, name):
+        """Time every call of a function into a histogram while the recorder is enabled.
+
+        :param name: the name of the histogram
+        :return: a decorator
+        """
+        def decorate(function):
+            @wraps(function)
+            def timed_function(*arguments, **keywords):
+                if not self.enabled:
+                    return function(*arguments, **keywords)
+                start = perf_counter()
+                try:
+                    return function(*arguments, **keywords)
+                finally:
+                    self.add_time(name, perf_counter()-start)
+            return timed_function
+        return decorate
+
+    def start_frame(self):
+        """Mark the start of drawing a frame.
+
+        :return: null
+        """
+        if self.enabled:
+            self._frame_start = perf_counter()
+
+    def end_frame(self):
+        """Mark the end of drawing a frame, filing its time and every count since the last frame.
+
+        :return: the finished frame's counters and its time in seconds under 'seconds'
+        """
+        if not self.enabled or self._frame_start is None:
+            return self.last_frame
+        seconds = perf_counter() - self._frame_start
+        self.add_time('frame', seconds)
+        self.frame['seconds'] = seconds
+        self.last_frame, self.frame, self._frame_start = self.frame, {}, None
+        return self.last_frame
+
+    def watch_graph(self, graph, name='map'):
+        """Time a graph's mutating methods and count the cells its changes touch.
+
+        Timed wrappers replace the mutating methods of this graph alone, so its class and other
+        graphs of the class are untouched and pay nothing. Copies of the graph are not watched.
+        :param graph: the graph or dungeon to watch
+        :param name: the prefix of its histograms and counters (default 'map')
+        :return: the graph
+        """
+        if any(operation in vars(graph) for operation in MAP_OPERATIONS):
+            # The graph is already watched, and a second listener would count every change twice.
+            return graph
+        cells = name + '.cells'
+
+        def touched(_, x_start, y_start, x_end, y_end):
+            self.count(cells, (x_end-x_start+1) * (y_end-y_start+1))
+        graph.add_listener(touched)
+        for operation in MAP_OPERATIONS:
+            if hasattr(graph, operation):
+                setattr(graph, operation, self.timed("{}.{}".format(name, operation))(getattr(graph, operation)))
+        return graph
+
+    def wrap_window(self, window, name='curses'):
+        """Count the calls made to a curses window.
+
+        :param window: the curses window or pad
+        :param name: the prefix of its counters (default 'curses')
+        :return: a CountingWindow to use in place of the window
+        """
+        return CountingWindow(window, self, name)
+
+    def report(self):
+        """Describe everything recorded, for saving as JSON.
+
+        :return: a dictionary of counters, histograms and last_frame
+        """
+        return {'counters': dict(self.counters), 'last_frame': dict(self.last_frame),
+                'histograms': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}}
+
+    def dump(self, filename):
+        """Save a report to a file as JSON.
+
+        :param filename: the file to write
+        :return: null
+        """
+        with open(filename, 'w') as file:
+            dump(self.report(), file, indent=1)
+
+    def summary(self):
+        """Describe every histogram and counter in a few lines of text.
+
+        :return: a list of lines
+        """
+        lines = ["{:<24}{:>9} calls {:>10.1f} us mean {:>10.1f} us p99 {:>10.1f} us max".format(
+                 name, histogram.count, histogram.mean()*1e6, histogram.percentile(0.99)*1e6, histogram.maximum*1e6)
+                 for name, histogram in sorted(self.histograms.items())]
+        lines.extend("{:<24}{:>9}".format(name, count) for name, count in sorted(self.counters.items()))
+        return lines
+
+    def overlay_text(self, name='curses'):
+        """Describe the last frame in one short line, for drawing over the game.
+
+        :param name: the prefix of the window counters to show (default 'curses')
+        :return: the line of text
+        """
+        frame = self.last_frame
+        return "frame {:.2f}ms  {} calls  {} cells drawn  {} cells changed".format(
+            frame.get('seconds', 0.0)*1e3, frame.get(name + '.calls', 0), frame.get(name + '.cells', 0),
+            sum(count for counter, count in frame.items() if counter.endswith('.cells') and
+                not counter.startswith(name + '.')))
+
+
+def profile(function, filename=None, top=25, stream=None):
+    """Run a function under cProfile, then save and print where its time went.
+
+    The profile is kept even if the function exits the program or raises.
+    :param function: the function to run, taking no arguments
+    :param filename: the file to save the raw profile to, for pstats or snakeviz (default None)
+    :param top: the number of functions to print, by cumulative time (default 25)
+    :param stream: the stream to print to (default sys.stderr)
+    :return: whatever the function returns
+    """
+    # Profiling is rare, and pstats alone takes longer to import than the rest of startup.
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function)
+    finally:
+        if filename:
+            profiler.dump_stats(filename)
+        if top:
+            pstats.Stats(profiler, stream=stream or sys.stderr).sort_stats('cumulative').print_stats(top)
+
+
+class _TimedLoader:
+    """Wrapper around a module loader that reports the time spent running the module to an ImportTimer."""
+    def __init__(self, loader, timer, name):
+        self._loader, self._timer, self._name = loader, timer, name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._timer._begin()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer._end(self._name)
+
+    def __getattr__(self, attribute):
+        return getattr(self._loader, attribute)
+
+
+class ImportTimer:
+    """Times every module imported while it is installed, as python -X importtime does.
+
+    The timer sits first on sys.meta_path and wraps the loader of each module found, so
+    each import's time is split into its own and that of the imports it makes. Named
+    milestones, such as the first frame, are timed from the creation of the timer. Modules
+    imported before the timer is installed, including this module and its own imports,
+    are not timed; python -X importtime covers those.
+    """
+    def __init__(self):
+        """Create a timer that is not installed.
+
+        :return: null
+        """
+        self.started = perf_counter()
+        self.installed = False
+        # Tuples of (depth, name, own seconds, total seconds), in the order imports finish.
+        self.imports = []
+        self.milestones = []
+        # The start time and time spent in nested imports of each import in progress.
+        self._stack = []
+
+    def install(self):
+        """Start timing imports.
+
+        :return: a reference to the timer
+        """
+        if not self.installed:
+            sys.meta_path.insert(0, self)
+            self.installed = True
+        return self
+
+    def uninstall(self):
+        """Stop timing imports.
+
+        :return: a reference to the timer
+        """
+        if self.installed:
+            sys.meta_path.remove(self)
+            self.installed = False
+        return self
+
+    def find_spec(self, name, path=None, target=None):
+        """Find a module with the other finders, wrapping its loader so running it is timed.
+
+        :return: the module's spec, or None if no finder knows the module
+        """
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self, name)
+                return spec
+        return None
+
+    def _begin(self):
+        self._stack.append([perf_counter(), 0.0])
+
+    def _end(self, name):
+        started, nested = self._stack.pop()
+        total = perf_counter() - started
+        if self._stack:
+            self._stack[-1][1] += total
+        self.imports.append((len(self._stack), name, total-nested, total))
+
+    def mark(self, name):
+        """Record that startup has reached a milestone, if the timer is installed.
+
+        :param name: the name of the milestone
+        :return: null
+        """
+        if self.installed:
+            self.milestones.append((name, perf_counter() - self.started))
+
+    def report(self):
+        """Describe every import in the format of python -X importtime, then every milestone.
+
+        :return: a list of lines
+        """
+        lines = ["import time: self [us] | cumulative | imported package"]
+        lines.extend("import time: {:>9} | {:>10} | {}{}".format(int(own*1e6), int(total*1e6), '  '*depth, name)
+                     for depth, name, own, total in self.imports)
+        lines.append("imports: {} modules in {:.1f} ms".format(
+            len(self.imports), sum(total for depth, _, _, total in self.imports if depth == 0)*1e3))
+        lines.extend("startup: {:>9.1f} ms | {}".format(seconds*1e3, name) for name, seconds in self.milestones)
+        return lines
+
+# The recorder shared by the whole program, enabled by ROGUE's --stats and --overlay.
+recorder = Recorder()
+
+if __name__ == "__main__":
+    from dungeon import ArrayDungeon
+    # Short program for showing off capability of module.
+    recorder.enable()
+    demo = recorder.watch_graph(ArrayDungeon(200, 200))
+    for inset in range(0, 100, 5):
+        recorder.start_frame()
+        demo.make_rectangle(inset, inset, 199-inset, 199-inset)
+        recorder.end_frame()
+    print('\n'.join(recorder.summary()))
+    print(recorder.overlay_text())
@@ -0,0 +1,26 @@
+import sys
+__author__ = 'Kellan Childers'
+
+
+def lazy_exports(package, namespace, exports):
+    """Make a package's names import their modules the first time they are used.
+
+    Assign the result to the package's __getattr__ and __dir__, so importing the package
+    stays cheap while every name it exports works as if it had been imported up front.
+    :param package: the name of the package
+    :param namespace: the package's globals()
+    :param exports: a dictionary of each exported name to the module defining it
+    :return: the functions __getattr__ and __dir__ for the package
+    """
+    def __getattr__(name):
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError("module {!r} has no attribute {!r}".format(package, name))
+        # Later uses find the name in the package itself and skip this function.
+        __import__(module)
+        value = namespace[name] = getattr(sys.modules[module], name)
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(exports))
+    return __getattr__, __dir__
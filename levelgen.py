@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+
+import os
+import sys
+from argparse import ArgumentParser
+from json import dump
+from time import perf_counter
+__author__ = 'Kellan Childers'
+
+# The game reads GENERATORS while starting up, so this module imports the generators and
+# everything used to build level packs only when they are first needed.
+
+
+def generate_cave(width, height, seed):
+    from dungeon.cave import CaveGenerator
+    return CaveGenerator(width, height, seed=seed).generate()
+
+
+def generate_bsp(width, height, seed):
+    from dungeon.bsp import BSPGenerator
+    return BSPGenerator(width, height, seed=seed).generate()
+
+# Generators that can be chosen by name, each taking (width, height, seed).
+GENERATORS = {
+    'cave': generate_cave,
+    'bsp': generate_bsp,
+}
+
+# The smallest open-cell ratio of a valid level from each generator. Caves below it are mostly
+# rock, while BSP rooms are carved to fit the map, so any connected BSP level is valid.
+MIN_OPEN = {
+    'cave': 0.3,
+    'bsp': 0.0,
+}
+
+
+def level_stats(dungeon, min_room=9):
+    """Measure a level and check that every open cell can be reached from every other.
+
+    Rooms are counted as the separate areas left after shaving every open cell next to a
+    wall, so rooms joined by narrow passages count separately.
+    :param dungeon: the dungeon to measure
+    :param min_room: the fewest cells a shaved area needs to count as a room (default 9)
+    :return: a dictionary of open_ratio, regions, rooms and connected
+    """
+    from dungeon.pathfinding import is_passable
+    from dungeon.regions import find_regions, region_size
+    width, height = dungeon.get_width(), dungeon.get_height()
+    mask = dungeon.mask(is_passable)
+    open_cells = mask.count(1)
+    regions = find_regions(mask, width, height, 8)
+
+    counts = dungeon.neighbor_counts(is_passable)
+    interior = bytes(1 if mask[y*width + x] and counts[y][x] == 8 else 0
+                     for y in range(height) for x in range(width))
+    rooms = [room for room in find_regions(interior, width, height, 8) if region_size(room) >= min_room]
+    return {
+        'open_ratio': open_cells / (width*height) if width and height else 0.0,
+        'regions': len(regions),
+        'rooms': len(rooms),
+        'connected': len(regions) == 1,
+    }
+
+
+def generate_level(task):
+    """Generate, measure and save one level; run in a worker process.
+
+    Only the level's file name and statistics are sent back, never the level itself.
+    :param task: a tuple of (index, seed, generator, width, height, directory, compress, min_open)
+    :return: a dictionary describing the level
+    """
+    from mapfile import save_map
+    index, seed, generator, width, height, directory, compress, min_open = task
+    start = perf_counter()
+    dungeon = GENERATORS[generator](width, height, seed)
+    stats = level_stats(dungeon)
+    filename = os.path.join(directory, "level_{:05d}.rlmp".format(index))
+    save_map(dungeon, filename, compress)
+    stats.update(index=index, seed=seed, path=filename, width=width, height=height,
+                 valid=stats['connected'] and stats['open_ratio'] >= min_open, seconds=perf_counter()-start)
+    return stats
+
+
+def generate_pack(directory, count, generator='cave', width=80, height=40, seed=0, workers=None,
+                  compress=True, min_open=None):
+    """Generate a pack of levels across worker processes and write an index of them.
+
+    Level i uses seed+i, so a pack can always be regenerated exactly.
+    :param directory: the directory to write levels and index.json into
+    :param count: the number of levels
+    :param generator: the name of the generator in GENERATORS (default 'cave')
+    :param width: the width of each level (default 80)
+    :param height: the height of each level (default 40)
+    :param seed: the seed of the first level (default 0)
+    :param workers: the number of worker processes (default one per processor)
+    :param compress: whether levels are saved compressed (default True)
+    :param min_open: the smallest open-cell ratio of a valid level (default the generator's MIN_OPEN)
+    :return: a list of level descriptions, ordered by index
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    if generator not in GENERATORS:
+        raise ValueError("Unknown generator {}".format(generator))
+    if min_open is None:
+        min_open = MIN_OPEN[generator]
+    os.makedirs(directory, exist_ok=True)
+    tasks = [(index, seed+index, generator, width, height, directory, compress, min_open) for index in range(count)]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as executor:
+        # Batching tasks keeps the cost of handing them out small next to generating levels.
+        levels = list(executor.map(generate_level, tasks, chunksize=max(1, count // (4*workers))))
+    with open(os.path.join(directory, 'index.json'), 'w') as file:
+        dump({'generator': generator, 'width': width, 'height': height, 'seed': seed, 'levels': levels}, file, indent=1)
+    return levels
+
+
+def parse_arguments():
+    parser = ArgumentParser(description="Generate a pack of seeded levels in parallel.")
+    parser.add_argument('directory', help="directory to write the levels and index.json into")
+    parser.add_argument('--count', type=int, default=100, help="number of levels (default 100)")
+    parser.add_argument('--generator', default='cave', choices=sorted(GENERATORS), help="level generator (default cave)")
+    parser.add_argument('--width', type=int, default=80, help="width of each level (default 80)")
+    parser.add_argument('--height', type=int, default=40, help="height of each level (default 40)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first level; level i uses seed+i (default 0)")
+    parser.add_argument('--workers', type=int, help="number of worker processes (default one per processor)")
+    parser.add_argument('--uncompressed', action='store_true', help="save levels without compression")
+    parser.add_argument('--min-open', type=float,
+                        help="smallest open-cell ratio of a valid level (default 0.3 for cave, 0 for bsp)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    started = perf_counter()
+    pack = generate_pack(arguments.directory, arguments.count, arguments.generator, arguments.width, arguments.height,
+                         arguments.seed, arguments.workers, not arguments.uncompressed, arguments.min_open)
+    invalid = [level for level in pack if not level['valid']]
+    print("Generated {} levels in {:.2f}s".format(len(pack), perf_counter()-started))
+    if pack:
+        print("Open ratio {:.3f} to {:.3f}, {:.1f} rooms on average".format(
+            min(level['open_ratio'] for level in pack), max(level['open_ratio'] for level in pack),
+            sum(level['rooms'] for level in pack) / len(pack)))
+    for level in invalid:
+        print("Invalid: {} (seed {}, {} regions, open ratio {:.3f})".format(
+            level['path'], level['seed'], level['regions'], level['open_ratio']))
+    sys.exit(1 if invalid else 0)
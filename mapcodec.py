@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+
+from array import array
+from contextlib import contextmanager
+from itertools import chain
+from json import dumps, loads
+from arraygraph import ArrayGraph
+from chunkedgraph import ChunkedGraph
+from graph import Graph
+__author__ = 'Kellan Childers'
+
+# Text map formats that are read and written a row at a time, so the file never has to fit in memory.
+#
+# ASCII maps hold one line of characters per row, top row first, as print_all shows them.
+# A legend maps each character to the value it stands for.
+#
+# Row maps hold one JSON document per line, starting from row zero:
+#   {"width": W, "height": H}    the first line
+#   {"palette": [...]}           encoded values given the next ids in order, before any row using them
+#   [id, id, ...]                one row of ids
+ROWS_PER_BAND = 64
+
+
+@contextmanager
+def _opened(source, mode):
+    """Open a file by name, or use an open stream as it is.
+
+    :return: a context manager giving the stream
+    """
+    if isinstance(source, str):
+        with open(source, mode, encoding='utf-8') as stream:
+            yield stream
+    else:
+        yield source
+
+
+def _band_size(graph):
+    """Get the number of rows to write at once, matching the chunks of a chunked graph.
+
+    :return: the number of rows
+    """
+    get_chunk_size = getattr(graph, 'get_chunk_size', None)
+    return get_chunk_size() if get_chunk_size is not None else ROWS_PER_BAND
+
+
+def _count_lines(stream):
+    """Count the lines left in a stream that can seek, leaving its position unchanged.
+
+    :return: the number of lines
+    """
+    start = stream.tell()
+    count = sum(1 for _ in stream)
+    stream.seek(start)
+    return count
+
+
+def write_ascii(graph, target):
+    """Write a graph as lines of characters, top row first, one row at a time.
+
+    Every value must print as a single character, as tiles do.
+    :param graph: the graph to write
+    :param target: the name of the file to write, or a text stream
+    :return: null
+    """
+    width = graph.get_width()
+    with _opened(target, 'w') as stream:
+        for y in reversed(range(graph.get_height())):
+            line = ''.join([str(value) for value in graph.get_row(y)])
+            if len(line) != width:
+                raise ValueError("Row {} does not print as one character per value".format(y))
+            stream.write(line)
+            stream.write('\n')
+
+
+def read_ascii(source, graph_class=Graph, legend=None, height=None):
+    """Read a graph from lines of characters, top row first, holding only a band of rows at a time.
+
+    The number of rows is counted in a first pass when the source can seek; otherwise pass
+    height, or the lines are held in memory until the last one is read.
+    :param source: the name of the file to read, or a text stream
+    :param graph_class: the class of graph to create, called with (width, height) (default Graph)
+    :param legend: a dictionary of each character to the value it stands for (default each character stands for itself)
+    :param height: the number of rows, if known (default None)
+    :return: a new graph_class
+    """
+    with _opened(source, 'r') as stream:
+        if height is None:
+            if stream.seekable():
+                height = _count_lines(stream)
+            else:
+                stream = list(stream)
+                height = len(stream)
+        lines = (line.rstrip('\r\n') for line in stream)
+        first = next(lines, None)
+        width = 0 if first is None else len(first)
+        graph = graph_class(width, height)
+        if first is None:
+            return graph
+
+        if legend is None:
+            def decode(line):
+                return list(line)
+        else:
+            def decode(line):
+                return list(map(legend.__getitem__, line))
+        # Graphs storing palette ids take rows of ids translated straight from the text instead.
+        translate = _ascii_translator(graph, legend)
+        cells = graph.get_cells() if translate is not None and isinstance(graph, ArrayGraph) else None
+        write = graph._write_id_rows if translate is not None and cells is None else graph._write_rows
+
+        band_size, band, y = _band_size(graph), [], height
+        for number, line in enumerate(chain([first], lines), 1):
+            y -= 1
+            if y < 0:
+                raise ValueError("Map has more than the expected {} rows".format(height))
+            if len(line) != width:
+                raise ValueError("Line {} has {} characters, expected {}".format(number, len(line), width))
+            try:
+                row = decode(line) if translate is None else translate(line)
+            except KeyError as error:
+                raise ValueError("Line {} has unknown character {!r}".format(number, error.args[0]))
+            if cells is not None:
+                cells[y*width:(y+1)*width] = row if cells.typecode == 'B' else array(cells.typecode, row)
+                continue
+            band.append(row)
+            # Rows arrive from the top, so a band is written once its lowest row is reached.
+            if y % band_size == 0:
+                write(reversed(band), 0, y)
+                band = []
+        if y != 0:
+            raise ValueError("Map has {} rows, expected {}".format(height-y, height))
+    return graph
+
+
+def _ascii_translator(graph, legend):
+    """Make a function turning a line of characters into the ids of an ArrayGraph or ChunkedGraph.
+
+    :return: a function taking a line and returning an array of one-byte ids, or None if the
+             graph or legend cannot be translated this way
+    """
+    if not isinstance(graph, (ArrayGraph, ChunkedGraph)) or legend is None or \
+            any(len(character) != 1 or ord(character) > 255 for character in legend):
+        return None
+    register = graph._id_of if isinstance(graph, ArrayGraph) else graph.get_palette().index
+    ids = {character: register(value) for character, value in legend.items()}
+    # Id 255 marks characters outside the legend, so it must not be a real id.
+    if max(ids.values(), default=0) >= 255:
+        return None
+    table = bytearray(b'\xff' * 256)
+    for character, value_id in ids.items():
+        table[ord(character)] = value_id
+
+    def translate(line):
+        try:
+            row = line.encode('latin-1').translate(table)
+        except UnicodeEncodeError as error:
+            raise KeyError(line[error.start])
+        unknown = row.find(255)
+        if unknown >= 0:
+            raise KeyError(line[unknown])
+        return array('B', row)
+    return translate
+
+
+def write_rows(graph, target):
+    """Write a graph as JSON lines of palette ids, one row at a time.
+
+    :param graph: the graph to write; values must be hashable and encodable by its palette
+    :param target: the name of the file to write, or a text stream
+    :return: null
+    """
+    width, height = graph.get_width(), graph.get_height()
+    palette = graph.get_palette() if hasattr(graph, 'get_palette') else graph._new_palette()
+    with _opened(target, 'w') as stream:
+        stream.write(dumps({'width': width, 'height': height}) + '\n')
+        written = 0
+        for y in range(height):
+            ids = [palette.index(value) for value in graph.get_row(y)]
+            if len(palette) > written:
+                # Values seen for the first time are announced before the row that uses them.
+                stream.write(dumps({'palette': [palette.encode(palette[value_id])
+                                                for value_id in range(written, len(palette))]}) + '\n')
+                written = len(palette)
+            stream.write(dumps(ids, separators=(',', ':')) + '\n')
+
+
+def read_rows(source, graph_class=Graph):
+    """Read a graph from JSON lines of palette ids, holding only a band of rows at a time.
+
+    :param source: the name of the file to read, or a text stream
+    :param graph_class: the class of graph to create, called with (width, height) (default Graph)
+    :return: a new graph_class
+    """
+    with _opened(source, 'r') as stream:
+        header = loads(next(stream, 'null'))
+        if not isinstance(header, dict) or not isinstance(header.get('width'), int) or \
+                not isinstance(header.get('height'), int):
+            raise ValueError("Map does not start with its width and height")
+        width, height = header['width'], header['height']
+        graph = graph_class(width, height)
+        palette = graph._new_palette()
+        values, band_size, band, y = [], _band_size(graph), [], 0
+        for number, line in enumerate(stream, 2):
+            data = loads(line)
+            if isinstance(data, dict):
+                values.extend(palette.decode(value) for value in data.get('palette', ()))
+                continue
+            if y >= height:
+                raise ValueError("Map has more than the expected {} rows".format(height))
+            if not isinstance(data, list) or len(data) != width:
+                raise ValueError("Line {} is not a row of {} ids".format(number, width))
+            try:
+                band.append([values[value_id] for value_id in data])
+            except (IndexError, TypeError):
+                raise ValueError("Line {} uses an id missing from the palette".format(number))
+            y += 1
+            if len(band) == band_size:
+                graph._write_rows(band, 0, y-len(band))
+                band = []
+        if band:
+            graph._write_rows(band, 0, y-len(band))
+        if y != height:
+            raise ValueError("Map has {} rows, expected {}".format(y, height))
+    return graph
+
+if __name__ == "__main__":
+    from io import StringIO
+    # Short program for showing off capability of module.
+    print("Demonstrating mapcodec.py\n")
+    test = Graph(12, 4, '.')
+    test.fill_rect('#', 2, 1, 9, 2)
+    text = StringIO()
+    write_ascii(test, text)
+    print(text.getvalue())
+    text.seek(0)
+    print("Read back the same:", read_ascii(text).get_row(1) == test.get_row(1))
+    rows = StringIO()
+    write_rows(test, rows)
+    print(rows.getvalue())
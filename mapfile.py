@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from itertools import islice
+from json import dumps, loads
+from arraygraph import ArrayGraph, typecode_for
+__author__ = 'Kellan Childers'
+
+# Layout of a map file:
+#   header     magic, version, flags, width, height, bytes per id, rows per chunk, table size
+#   table      json list of the palette's encoded values, where each value's position is its id
+#   padding    zero bytes up to the next multiple of eight
+#   payload    uncompressed: every row of ids, starting from row zero
+#              compressed: an index of (offset, size) pairs, then one zlib stream per chunk of rows
+# All numbers are little-endian.
+MAGIC = b'RLMP'
+VERSION = 1
+COMPRESSED = 1
+_HEADER = struct.Struct('<4sHHIIIII')
+_CHUNK_ENTRY = struct.Struct('<QQ')
+_TYPECODES = {array(typecode).itemsize: typecode for typecode in 'BHI'}
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+def _typecode(cells):
+    return getattr(cells, 'typecode', None) or cells.format
+
+
+def _little_endian(cells):
+    """Get a little-endian copy of an array of ids if the machine is big-endian.
+
+    :param cells: an array or memoryview of ids
+    :return: a buffer of little-endian ids
+    """
+    if sys.byteorder == 'little' or cells.itemsize == 1:
+        return cells
+    swapped = array(_TYPECODES[cells.itemsize], cells)
+    swapped.byteswap()
+    return swapped
+
+
+def save_map(graph, filename, compress=False, rows_per_chunk=64):
+    """Save a graph to a binary map file.
+
+    :param graph: the graph to save; values must be hashable and encodable by its palette
+    :param filename: the name of the file to be written to
+    :param compress: whether to compress each chunk of rows with zlib (default False)
+    :param rows_per_chunk: the number of rows in each compressed chunk (default 64)
+    :return: null
+    """
+    width, height = graph.get_width(), graph.get_height()
+    if isinstance(graph, ArrayGraph):
+        palette = graph.get_palette()
+        cells = graph.get_cells()
+        rows = (cells[y*width:(y+1)*width] for y in range(height))
+    else:
+        palette = graph._new_palette()
+        rows = (array(typecode_for(1 << 16), [palette.index(value) for value in graph.get_row(y)])
+                for y in range(height))
+        # Ids are only final once every row has been seen.
+        rows = list(rows)
+    typecode = typecode_for(len(palette))
+    itemsize = array(typecode).itemsize
+    rows = (row if _typecode(row) == typecode else array(typecode, row) for row in rows)
+
+    table = dumps([palette.encode(value) for value in palette.values()]).encode('utf-8')
+    with open(filename, 'wb') as write_file:
+        write_file.write(_HEADER.pack(MAGIC, VERSION, COMPRESSED if compress else 0, width, height,
+                                      itemsize, rows_per_chunk, len(table)))
+        write_file.write(table)
+        offset = _HEADER.size + len(table)
+        write_file.write(bytes(_aligned(offset) - offset))
+        if not compress:
+            for row in rows:
+                write_file.write(_little_endian(row))
+            return
+
+        # Reserve the chunk index, write the chunks, then go back and fill the index in.
+        chunk_count = (height + rows_per_chunk - 1) // rows_per_chunk
+        index_start = write_file.tell()
+        write_file.write(bytes(chunk_count * _CHUNK_ENTRY.size))
+        index = []
+        for _ in range(chunk_count):
+            compressor = zlib.compressobj()
+            data = [compressor.compress(_little_endian(row)) for row in islice(rows, rows_per_chunk)]
+            data.append(compressor.flush())
+            data = b''.join(data)
+            index.append((write_file.tell(), len(data)))
+            write_file.write(data)
+        write_file.seek(index_start)
+        write_file.write(b''.join(_CHUNK_ENTRY.pack(*entry) for entry in index))
+
+
+class MapFile:
+    """Memory-mapped binary map file.
+
+    Opening a map only parses its header and tile table; rows are paged in by the operating
+    system, or decompressed chunk by chunk, when they are first read.
+    """
+    def __init__(self, filename):
+        """Open a map file created by save_map.
+
+        :param filename: the name of the file to be read
+        :return: null
+        """
+        with open(filename, 'rb') as read_file:
+            # ACCESS_COPY keeps edits made through the map private to this process.
+            self._map = mmap.mmap(read_file.fileno(), 0, access=mmap.ACCESS_COPY)
+        (magic, version, self._flags, self.width, self.height, itemsize,
+         self.rows_per_chunk, table_size) = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError("{} is not a map file".format(filename))
+        if version != VERSION:
+            raise ValueError("{0} uses unsupported map version {1}".format(filename, version))
+        self.typecode = _TYPECODES[itemsize]
+        self.table = loads(self._map[_HEADER.size:_HEADER.size + table_size].decode('utf-8'))
+        self._payload = _aligned(_HEADER.size + table_size)
+        self._chunks = {}
+        # The in-place view of an uncompressed payload, shared by every caller of cells().
+        self._view = None
+
+    def is_compressed(self):
+        """Check whether the rows in the file are compressed.
+
+        :return: a boolean value representing compression
+        """
+        return bool(self._flags & COMPRESSED)
+
+    def _chunk(self, chunk):
+        """Get the decompressed ids of a chunk of rows, decompressing it on first use.
+
+        :param chunk: the number of the chunk
+        :return: an array of ids
+        """
+        if chunk not in self._chunks:
+            offset, size = _CHUNK_ENTRY.unpack_from(self._map, self._payload + chunk*_CHUNK_ENTRY.size)
+            cells = array(self.typecode, zlib.decompress(self._map[offset:offset+size]))
+            if sys.byteorder != 'little':
+                cells.byteswap()
+            self._chunks[chunk] = cells
+        return self._chunks[chunk]
+
+    def read_row(self, y):
+        """Read the ids of a single row.
+
+        :param y: the row to read
+        :return: an array or memoryview of ids
+        """
+        if not 0 <= y < self.height:
+            raise IndexError("Row not present in map")
+        if self.is_compressed():
+            start = (y % self.rows_per_chunk) * self.width
+            return self._chunk(y // self.rows_per_chunk)[start:start+self.width]
+        return self.cells()[y*self.width:(y+1)*self.width]
+
+    def cells(self):
+        """Get every id in the file, indexed by y*width + x.
+
+        Uncompressed files are viewed in place on little-endian machines, so no rows are
+        read until they are used; compressed files are decompressed in full.
+        :return: an array or writable memoryview of ids
+        """
+        if self.is_compressed():
+            cells = array(self.typecode)
+            for chunk in range((self.height + self.rows_per_chunk - 1) // self.rows_per_chunk):
+                cells.extend(self._chunk(chunk))
+            return cells
+        if self._view is None:
+            size = self.width * self.height * array(self.typecode).itemsize
+            self._view = memoryview(self._map)[self._payload:self._payload + size].cast(self.typecode)
+        return self._view if sys.byteorder == 'little' else _little_endian(self._view)
+
+    def load(self, graph_class=ArrayGraph):
+        """Build a graph from the file.
+
+        The graph's cells stay backed by the file when the file's ids already match the
+        graph's palette, which is always the case for maps saved from the same palette.
+        :param graph_class: a subclass of ArrayGraph to create (default ArrayGraph)
+        :return: a new graph_class
+        """
+        graph = graph_class(0, 0)
+        palette = graph.get_palette()
+        ids = [palette.index(palette.decode(data)) for data in self.table]
+        cells = self.cells()
+        if ids != list(range(len(ids))) or typecode_for(len(palette)) != self.typecode:
+            typecode = typecode_for(len(palette))
+            if self.typecode == typecode == 'B':
+                cells = array('B', bytes(cells).translate(bytes(ids + [0] * (256-len(ids)))))
+            else:
+                cells = array(typecode, [ids[value_id] for value_id in cells])
+        return graph.set_cells(cells, self.width, self.height)
+
+    def close(self):
+        """Release the memory map, and the cells of graphs loaded from it in place.
+
+        A graph loaded in place raises ValueError once its file is closed, so copy it first to
+        keep it. Slices of its cells still in use hold the map open until they are collected.
+        :return: null
+        """
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        try:
+            self._map.close()
+        except BufferError:
+            # Closing now would pull the pages out from under the slices; the map is unmapped
+            # when the last of them is freed.
+            pass
+
+
+def load_map(filename, graph_class=ArrayGraph):
+    """Load a graph from a binary map file, memory-mapping it where possible.
+
+    :param filename: the name of the file to be read
+    :param graph_class: a subclass of ArrayGraph to create (default ArrayGraph)
+    :return: a new graph_class
+    """
+    return MapFile(filename).load(graph_class)
+
+if __name__ == "__main__":
+    from os import path
+    from tempfile import TemporaryDirectory
+    # Short program for showing off capability of module.
+    print("Demonstrating mapfile.py\n")
+    test = ArrayGraph(40, 5, 0)
+    test.fill_rect(1, 5, 1, 34, 3)
+    with TemporaryDirectory() as directory:
+        for compressed in (False, True):
+            save_map(test, path.join(directory, 'demo.rlmap'), compress=compressed)
+            print("Saved {0} map of {1} bytes".format("compressed" if compressed else "uncompressed",
+                                                     path.getsize(path.join(directory, 'demo.rlmap'))))
+        load_map(path.join(directory, 'demo.rlmap')).print_all()